@@ -61,6 +61,12 @@ MESES: List[str] = [
     "Setembro", "Outubro", "Novembro", "Dezembro"
 ]
 
+# Como o dono do app aparece nos pagadores e nos acertos
+NOME_DONO = "Você"
+
+# Horizontes (em meses) da projeção de compromissos no dashboard
+MESES_PROJECAO: Tuple[int, ...] = (12, 24, 36, 48)
+
 # Anos disponíveis para seleção
 ANOS_DISPONIVEIS: List[int] = list(range(2020, 2035))
 
@@ -73,3 +79,32 @@ FORMATO_DATA_HORA_BR = "%d/%m/%Y %H:%M"
 MAX_PARCELAS = 48
 MAX_DESCRICAO = 200
 MAX_OBSERVACAO = 500
+
+# Paginação das listagens
+TAMANHO_PAGINA = 50
+
+# Linhas lidas por vez nas consultas em streaming (Database.iter_query)
+TAMANHO_LOTE = 1000
+
+# Linhas por INSERT de várias linhas (abaixo do limite de 999 parâmetros do SQLite)
+LINHAS_POR_INSERT = 100
+
+# Espera após a última tecla antes de executar a busca (milissegundos)
+ATRASO_BUSCA_MS = 250
+
+# Varredura de contas atrasadas (intervalo em milissegundos)
+INTERVALO_VARREDURA_ATRASADAS_MS = 60 * 60 * 1000
+
+# Consultas SQL mantidas em cache (formas de filtro e statements compilados)
+TAMANHO_CACHE_SQL = 128
+
+# Estatísticas do planejador de consultas (ANALYZE)
+INTERVALO_ESTATISTICAS_DIAS = 7
+LIMITE_ANALISE = 1000  # linhas amostradas por índice (PRAGMA analysis_limit)
+
+# Instrumentação das consultas (src/data/instrumentacao.py)
+AMOSTRAS_LATENCIA = 1000  # últimas execuções usadas nos percentis de cada comando
+MAX_CONSULTAS_LENTAS = 100  # entradas mantidas no log de consultas lentas
+
+# Resultados de relatórios mantidos em cache (RelatorioService)
+TAMANHO_CACHE_RELATORIOS = 64
@@ -13,6 +13,8 @@ import json
 class DatabaseConfig:
     """Configurações do banco de dados."""
     name: str = "financas.db"
+    instrumentar: bool = True  # mede as consultas (ver src/data/instrumentacao.py)
+    limite_consulta_lenta_ms: float = 100.0  # consultas acima disso vão para o log
     
     @property
     def path(self) -> Path:
@@ -94,6 +96,12 @@ class Settings:
                     data = json.load(f)
                     if 'theme' in data:
                         self.theme.mode = data['theme'].get('mode', self.theme.mode)
+                    if 'database' in data:
+                        db = data['database']
+                        self.database.instrumentar = db.get('instrumentar', self.database.instrumentar)
+                        self.database.limite_consulta_lenta_ms = db.get(
+                            'limite_consulta_lenta_ms', self.database.limite_consulta_lenta_ms
+                        )
             except Exception:
                 pass
     
@@ -103,6 +111,10 @@ class Settings:
         data = {
             'theme': {
                 'mode': self.theme.mode
+            },
+            'database': {
+                'instrumentar': self.database.instrumentar,
+                'limite_consulta_lenta_ms': self.database.limite_consulta_lenta_ms
             }
         }
         try:
@@ -255,6 +255,7 @@ class ResumoGeral:
     valor_total: float = 0.0
     valor_pago: float = 0.0
     valor_pendente: float = 0.0
+    valor_atrasado: float = 0.0
 
     @property
     def percentual_pago(self) -> float:
@@ -269,5 +270,6 @@ class ResumoGeral:
             total_contas=data.get('total_contas', 0),
             valor_total=data.get('valor_total', 0.0),
             valor_pago=data.get('valor_pago', 0.0),
-            valor_pendente=data.get('valor_pendente', 0.0)
+            valor_pendente=data.get('valor_pendente', 0.0),
+            valor_atrasado=data.get('valor_atrasado', 0.0)
         )
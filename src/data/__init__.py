@@ -3,18 +3,31 @@ Módulo de acesso a dados (Data Access Layer).
 """
 
 from .database import Database, get_database
+from .filtros import FiltroContas, compilar_filtro, intervalo_mes
+from .linhas import Linha, tipo_linha
 from .repositories import (
     PessoaRepository,
     CategoriaRepository,
     ContaRepository,
-    DivisaoRepository
+    DivisaoRepository,
+    PlanoParcelaRepository,
+    RecorrenciaRepository,
+    MetadadosRepository
 )
 
 __all__ = [
     'Database',
     'get_database',
+    'FiltroContas',
+    'compilar_filtro',
+    'intervalo_mes',
+    'Linha',
+    'tipo_linha',
     'PessoaRepository',
     'CategoriaRepository', 
     'ContaRepository',
-    'DivisaoRepository'
+    'DivisaoRepository',
+    'PlanoParcelaRepository',
+    'RecorrenciaRepository',
+    'MetadadosRepository'
 ]
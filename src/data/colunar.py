@@ -0,0 +1,422 @@
+"""
+Base colunar para análises - contas e divisões em arrays NumPy.
+
+As contas (físicas e parcelas virtuais) e as divisões são lidas uma vez
+em arrays estruturados: datas como dias desde 1970-01-01, meses como
+ano * 12 + mes - 1, categorias e pessoas pelos próprios IDs (int32) e
+valores em centavos (int64). Agrupamentos, pivôs, somas móveis e
+percentis rodam vetorizados sobre esses arrays (funções abaixo), sem SQL
+por relatório nem laços em Python sobre dicts.
+
+Os arrays são atualizados aos poucos pelos eventos de alteração: as
+contas dos IDs publicados (e suas divisões) são removidas e lidas de
+novo na próxima consulta. Escritas de outros processos (PRAGMA
+data_version) são relidas pelo log de alterações do banco; eventos sem
+IDs recarregam tudo. Com uma transação aberta, os eventos ainda não
+chegaram: os arrays são lidos do banco só para aquela consulta.
+
+Ao fechar o app, os arrays são gravados em disco (.npy em
+Settings.get_data_dir()/analises) com o seq do log que refletem. Na
+abertura seguinte eles são mapeados em memória (np.load com mmap_mode,
+um np.memmap) em vez de lidos do SQLite, e só as contas alteradas depois
+daquele seq são relidas.
+
+Os arrays retornados são compartilhados: não devem ser alterados.
+"""
+
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from src.config.settings import Settings
+from .database import get_database
+from .eventos import ContaAlterada, DivisaoAlterada, Evento, Periodo
+
+NUMPY_DISPONIVEL = np is not None
+
+# Data ou mês ausente (conta sem vencimento) e categoria ausente
+SEM_DATA = -2 ** 31
+SEM_CATEGORIA = -1
+
+# Código do status no array de contas (posição na tupla)
+STATUS = ('pendente', 'pago', 'atrasado')
+PAGO = STATUS.index('pago')
+
+# IDs por comando ao recarregar contas alteradas
+LOTE_IDS = 500
+
+# Instantâneo em disco (ver BaseColunar.salvar_instantaneo)
+PASTA_INSTANTANEO = "analises"
+FORMATO_INSTANTANEO = 1  # muda quando os dtypes mudam
+
+if np is not None:
+    DTYPE_CONTAS = np.dtype([
+        ('id', 'i8'), ('data', 'i4'), ('mes', 'i4'), ('categoria', 'i4'),
+        ('status', 'i1'), ('centavos', 'i8'),
+    ])
+    DTYPE_DIVISOES = np.dtype([
+        ('conta_id', 'i8'), ('pessoa', 'i4'), ('data', 'i4'), ('mes', 'i4'),
+        ('categoria', 'i4'), ('pago', '?'), ('centavos', 'i8'),
+    ])
+
+# Colunas comuns das contas (alias "c"): data, mês, categoria, centavos
+_DATA = f"COALESCE(CAST(julianday(c.data_vencimento) - 2440587.5 AS INTEGER), {SEM_DATA})"
+_MES = f"""COALESCE(CAST(strftime('%Y', c.data_vencimento) AS INTEGER) * 12
+                   + CAST(strftime('%m', c.data_vencimento) AS INTEGER) - 1, {SEM_DATA})"""
+_CATEGORIA = f"COALESCE(c.categoria_id, {SEM_CATEGORIA})"
+_STATUS = "CASE c.status " + " ".join(
+    f"WHEN '{status}' THEN {codigo}" for codigo, status in enumerate(STATUS)
+) + " ELSE 0 END"
+
+
+def indice_mes(periodo: Periodo) -> int:
+    """Mês (mes, ano) no formato da coluna 'mes' (ano * 12 + mes - 1)."""
+    mes, ano = periodo
+    return ano * 12 + mes - 1
+
+
+def periodo_do_indice(indice: int) -> Periodo:
+    """Inverso de indice_mes."""
+    ano, mes = divmod(int(indice), 12)
+    return mes + 1, ano
+
+
+class BaseColunar:
+    """Contas e divisões em arrays estruturados, atualizados pelos eventos."""
+    
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("Análises indisponíveis: o NumPy não está instalado.")
+        self.db = get_database()
+        self._contas = None
+        self._divisoes = None
+        self._versao = None
+        self._pendentes: Set[int] = set()  # contas a reler
+        self._recarregar = True
+        self._seq = 0  # última entrada do log de alterações refletida nos arrays
+        self._seq_instantaneo: Optional[int] = None  # seq do instantâneo em disco
+        self._dia: Optional[date] = None  # dia do status das parcelas virtuais
+        self.db.eventos.inscrever(ContaAlterada, self._ao_alterar)
+        self.db.eventos.inscrever(DivisaoAlterada, self._ao_alterar)
+    
+    @property
+    def contas(self) -> 'np.ndarray':
+        """Contas (DTYPE_CONTAS), em ordem qualquer."""
+        return self._arrays()[0]
+    
+    @property
+    def divisoes(self) -> 'np.ndarray':
+        """Divisões (DTYPE_DIVISOES) com data, mês e categoria da conta."""
+        return self._arrays()[1]
+    
+    def abrir(self):
+        """Prepara os arrays (do instantâneo, se houver) antes da primeira consulta."""
+        self._arrays()
+    
+    def limpar(self):
+        """Descarta os arrays (lidos de novo na próxima consulta)."""
+        self._contas = self._divisoes = None
+        self._pendentes.clear()
+        self._recarregar = True
+    
+    # ==================== ATUALIZAÇÃO ====================
+    
+    def _ao_alterar(self, evento: Evento):
+        if evento.ids is None:
+            self._recarregar = True
+        else:
+            self._pendentes.update(evento.ids)
+    
+    def _arrays(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        if self.db.alteracoes_pendentes:
+            return self._ler_contas(), self._ler_divisoes()
+        
+        versao = self.db.versao_dados()
+        if self._contas is None:
+            self._versao = versao
+            self._abrir_instantaneo()
+        elif versao != self._versao:
+            # Escrita de outro processo: relê o que o log registrou
+            self._versao = versao
+            self._sincronizar()
+        
+        if self._recarregar:
+            self._ler_tudo()
+        elif self._pendentes:
+            self._aplicar(sorted(self._pendentes))
+            self._pendentes.clear()
+        
+        if self._dia != date.today():
+            # O status "atrasado" das parcelas virtuais depende do dia
+            self._aplicar(virtuais=True)
+            self._dia = date.today()
+        return self._contas, self._divisoes
+    
+    def _ler_tudo(self):
+        # seq lido antes dos dados: o que mudar no meio volta pelo log
+        self._seq = self.db.seq_alteracoes()
+        self._contas, self._divisoes = self._ler_contas(), self._ler_divisoes()
+        self._dia = date.today()
+        self._pendentes.clear()
+        self._recarregar = False
+    
+    def _sincronizar(self):
+        """Aplica as entradas do log de alterações posteriores a self._seq."""
+        entradas = self.db.alteracoes_desde(self._seq)
+        if entradas is None:
+            self._recarregar = True
+            return
+        if entradas:
+            self._aplicar(
+                sorted({conta for _, conta, _ in entradas if conta is not None}),
+                sorted({plano for _, _, plano in entradas if plano is not None})
+            )
+            self._seq = entradas[-1][0]
+    
+    def _aplicar(self, ids: Sequence[int] = (), planos: Sequence[int] = (),
+                 virtuais: bool = False):
+        """
+        Troca as linhas das contas alteradas (ids, parcelas virtuais dos
+        planos ou, com virtuais, todas as parcelas virtuais) pelas lidas
+        agora do banco.
+        """
+        def manter(conta_ids: 'np.ndarray') -> 'np.ndarray':
+            alteradas = np.isin(conta_ids, np.array(ids, dtype='i8'))
+            if virtuais:
+                alteradas |= conta_ids < 0
+            elif planos:
+                alteradas |= (conta_ids < 0) & np.isin(-conta_ids // 100, np.array(planos, dtype='i8'))
+            return ~alteradas
+        
+        contas = [self._contas[manter(self._contas['id'])]]
+        divisoes = [self._divisoes[manter(self._divisoes['conta_id'])]]
+        
+        # (WHERE, parâmetros) de cada leitura; o plano de uma parcela virtual
+        # sai do próprio ID: -(plano_id * 100 + parcela)
+        filtros = [("c.id < 0", ())] if virtuais else []
+        for chaves, condicao in ((ids, "c.id IN"), (() if virtuais else planos, "c.id < 0 AND -c.id / 100 IN")):
+            for inicio in range(0, len(chaves), LOTE_IDS):
+                lote = tuple(chaves[inicio:inicio + LOTE_IDS])
+                filtros.append((f"{condicao} ({', '.join('?' * len(lote))})", lote))
+        for where, params in filtros:
+            contas.append(self._ler_contas(where, params))
+            divisoes.append(self._ler_divisoes(where, params))
+        
+        self._contas = np.concatenate(contas)
+        self._divisoes = np.concatenate(divisoes)
+    
+    # ==================== INSTANTÂNEO ====================
+    
+    def salvar_instantaneo(self) -> bool:
+        """
+        Grava os arrays em disco (.npy) com o seq do log de alterações que
+        eles refletem, e poda o log até esse seq. Retorna False se não havia
+        o que gravar (arrays não carregados ou iguais ao instantâneo).
+        """
+        if self._contas is None or self.db.alteracoes_pendentes:
+            return False
+        
+        self._sincronizar()
+        contas, divisoes = self._arrays()
+        if self._seq == self._seq_instantaneo:
+            return False
+        
+        pasta, nome = self._caminho_instantaneo()
+        pasta.mkdir(parents=True, exist_ok=True)
+        for tabela, array in (('contas', contas), ('divisoes', divisoes)):
+            destino = pasta / f"{nome}_{tabela}.npy"
+            temporario = destino.with_suffix('.tmp')
+            with open(temporario, 'wb') as f:
+                np.save(f, array)
+            os.replace(temporario, destino)
+        
+        # Metadados por último: arrays mais novos que o seq só repetem alterações
+        metadados = {
+            'formato': FORMATO_INSTANTANEO,
+            'banco': str(Path(self.db.db_path).resolve()),
+            'seq': self._seq,
+            'dia': self._dia.isoformat(),
+        }
+        temporario = pasta / f"{nome}.tmp"
+        temporario.write_text(json.dumps(metadados), encoding='utf-8')
+        os.replace(temporario, pasta / f"{nome}.json")
+        
+        self.db.podar_log_alteracoes(self._seq)
+        self._seq_instantaneo = self._seq
+        return True
+    
+    def _abrir_instantaneo(self):
+        """
+        Abre os arrays do instantâneo em disco como memmap (sem lê-los) e
+        aplica as alterações registradas no log depois dele. Sem instantâneo
+        válido, os arrays são lidos do banco e o log é podado: nenhuma das
+        entradas dele seria usada (sem isso, o log só diminuiria ao gravar
+        um instantâneo, no fechamento normal do app).
+        """
+        instantaneo = self._ler_instantaneo()
+        if instantaneo is None:
+            self._ler_tudo()
+            self.db.podar_log_alteracoes(self._seq)
+            return
+        
+        self._contas, self._divisoes, metadados = instantaneo
+        self._seq = self._seq_instantaneo = metadados['seq']
+        self._dia = date.fromisoformat(metadados['dia'])
+        self._pendentes.clear()
+        self._recarregar = False
+        self._sincronizar()
+    
+    def _ler_instantaneo(self) -> Optional[Tuple['np.ndarray', 'np.ndarray', dict]]:
+        """(contas, divisoes, metadados) do instantâneo em disco, ou None se inválido."""
+        pasta, nome = self._caminho_instantaneo()
+        try:
+            metadados = json.loads((pasta / f"{nome}.json").read_text(encoding='utf-8'))
+            if (metadados['formato'] != FORMATO_INSTANTANEO
+                    or metadados['banco'] != str(Path(self.db.db_path).resolve())
+                    or metadados['seq'] > self.db.seq_alteracoes()):
+                return None
+            contas = np.load(pasta / f"{nome}_contas.npy", mmap_mode='r')
+            divisoes = np.load(pasta / f"{nome}_divisoes.npy", mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+        if contas.dtype != DTYPE_CONTAS or divisoes.dtype != DTYPE_DIVISOES:
+            return None
+        return contas, divisoes, metadados
+    
+    def _caminho_instantaneo(self) -> Tuple[Path, str]:
+        """Pasta do instantâneo e prefixo dos arquivos (nome do banco)."""
+        return Settings.get_data_dir() / PASTA_INSTANTANEO, Path(self.db.db_path).stem
+    
+    # ==================== LEITURA ====================
+    
+    def _ler_contas(self, where: str = "1=1", params: tuple = ()) -> 'np.ndarray':
+        return self._ler(f"""
+            SELECT c.id, {_DATA}, {_MES}, {_CATEGORIA}, {_STATUS},
+                   CAST(ROUND(c.valor_total * 100) AS INTEGER)
+            FROM v_contas c
+            WHERE {where}
+        """, params, DTYPE_CONTAS)
+    
+    def _ler_divisoes(self, where: str = "1=1", params: tuple = ()) -> 'np.ndarray':
+        # Divisões das parcelas virtuais direto do plano (ver iterar_com_divisoes)
+        partes = [
+            f"""
+                SELECT c.id, dc.pessoa_id, {_DATA}, {_MES}, {_CATEGORIA}, {pago},
+                       CAST(ROUND(dc.valor * 100) AS INTEGER)
+                FROM {fonte} c
+                JOIN {divisoes} dc ON {juncao}
+                WHERE {where}
+            """
+            for fonte, divisoes, juncao, pago in (
+                ('contas', 'divisao_contas', 'dc.conta_id = c.id', 'dc.pago'),
+                ('contas_virtuais', 'planos_parcela_divisoes', 'dc.plano_id = c.plano_id', '0'),
+            )
+        ]
+        return self._ler(" UNION ALL ".join(partes), params * 2, DTYPE_DIVISOES)
+    
+    def _ler(self, query: str, params: tuple, dtype) -> 'np.ndarray':
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params)
+            return np.fromiter(cursor, dtype=dtype)
+
+
+_base: Optional[BaseColunar] = None
+
+
+def get_base_colunar() -> BaseColunar:
+    """Retorna a base colunar única (compartilhada pelos relatórios)."""
+    global _base
+    if _base is None:
+        _base = BaseColunar()
+    return _base
+
+
+# ==================== OPERAÇÕES VETORIZADAS ====================
+
+def somar_por(chaves: 'np.ndarray', centavos: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """Soma os centavos por chave: (chaves distintas ordenadas, somas)."""
+    unicas, posicoes = np.unique(chaves, return_inverse=True)
+    return unicas, _somar(posicoes, centavos, len(unicas))
+
+
+def somar_nos(chaves: 'np.ndarray', centavos: 'np.ndarray',
+              rotulos: Iterable[int]) -> 'np.ndarray':
+    """Soma dos centavos em cada rótulo informado (zero nos que não aparecem)."""
+    rotulos, posicoes = _posicoes(chaves, rotulos)
+    validas = posicoes >= 0
+    return _somar(posicoes[validas], centavos[validas], len(rotulos))
+
+
+def contar_por(chaves: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """Quantidade de linhas por chave: (chaves distintas ordenadas, contagens)."""
+    return np.unique(chaves, return_counts=True)
+
+
+def pivotar(linhas: 'np.ndarray', colunas: 'np.ndarray', centavos: 'np.ndarray',
+            rotulos_linhas: Iterable[int] = None, rotulos_colunas: Iterable[int] = None
+            ) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    Tabela cruzada das somas: (rótulos das linhas, rótulos das colunas,
+    matriz int64 de centavos). Rótulos informados fixam as linhas/colunas
+    (ex: todos os meses do período, mesmo sem valores); os valores com
+    chaves fora deles são ignorados.
+    """
+    rot_l, pos_l = _posicoes(linhas, rotulos_linhas)
+    rot_c, pos_c = _posicoes(colunas, rotulos_colunas)
+    validas = (pos_l >= 0) & (pos_c >= 0)
+    celulas = pos_l[validas] * len(rot_c) + pos_c[validas]
+    matriz = _somar(celulas, centavos[validas], len(rot_l) * len(rot_c))
+    return rot_l, rot_c, matriz.reshape(len(rot_l), len(rot_c))
+
+
+def soma_movel(valores: 'np.ndarray', janela: int) -> 'np.ndarray':
+    """Soma das últimas `janela` posições (as primeiras somam o que houver)."""
+    acumulado = np.cumsum(valores, dtype=valores.dtype)
+    resultado = acumulado.copy()
+    resultado[janela:] -= acumulado[:-janela]
+    return resultado
+
+
+def percentis(valores: 'np.ndarray', ps: Sequence[float]) -> 'np.ndarray':
+    """Percentis (0-100) dos valores; zeros se não houver valores."""
+    if len(valores) == 0:
+        return np.zeros(len(ps))
+    return np.percentile(valores, ps)
+
+
+def _posicoes(chaves: 'np.ndarray', rotulos: Optional[Iterable[int]]
+              ) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Rótulos e a posição de cada chave neles (-1 quando não está)."""
+    if rotulos is None:
+        return np.unique(chaves, return_inverse=True)
+    rotulos = np.asarray(list(rotulos), dtype=chaves.dtype)
+    if len(rotulos) == 0:
+        return rotulos, np.full(len(chaves), -1)
+    
+    inicio = int(rotulos[0])
+    if np.array_equal(rotulos, np.arange(inicio, inicio + len(rotulos))):
+        # Rótulos consecutivos (meses de um intervalo, False/True): posição direta
+        posicoes = chaves.astype('i8') - inicio
+        return rotulos, np.where((posicoes >= 0) & (posicoes < len(rotulos)), posicoes, -1)
+    
+    ordem = np.argsort(rotulos)
+    indices = np.searchsorted(rotulos, chaves, sorter=ordem).clip(max=len(rotulos) - 1)
+    posicoes = ordem[indices]
+    return rotulos, np.where(rotulos[posicoes] == chaves, posicoes, -1)
+
+
+def _somar(posicoes: 'np.ndarray', centavos: 'np.ndarray', tamanho: int) -> 'np.ndarray':
+    """
+    Soma dos centavos em cada posição. bincount soma em float64, exato
+    para inteiros até 2**53 centavos, e volta para int64.
+    """
+    return np.rint(np.bincount(posicoes, weights=centavos, minlength=tamanho)).astype('i8')
@@ -2,13 +2,26 @@
 Gerenciador de conexão com o banco de dados SQLite.
 """
 
+import re
 import sqlite3
+from datetime import date
 from pathlib import Path
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Iterator
 from contextlib import contextmanager
+from functools import wraps
 
 from src.config.settings import settings
-from src.config.constants import CATEGORIAS_PADRAO
+from src.config.constants import (
+    CATEGORIAS_PADRAO, MAX_PARCELAS, TAMANHO_CACHE_SQL, TAMANHO_LOTE,
+    INTERVALO_ESTATISTICAS_DIAS, LIMITE_ANALISE
+)
+from .linhas import Linha, tipo_linha
+from .instrumentacao import ConexaoInstrumentada, ContagemConsultas, EstatisticasConsultas
+from .eventos import BarramentoEventos, Evento, mesclar_eventos
+from .identidade import MapaIdentidade
+
+# Comandos de controle de transação (não contam em contar_consultas)
+CONTROLE_TRANSACAO = re.compile(r'\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b', re.I)
 
 
 class Database:
@@ -27,8 +40,20 @@ class Database:
             return
         
         self.db_path = settings.database.path
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._conexao_transacao: Optional[sqlite3.Connection] = None
+        self._em_transacao = False
+        self._contagens: List[ContagemConsultas] = []
+        self._ultimo_comando: Optional[str] = None
+        self._profundidade = 0
+        self._geracao = 0  # conexões abertas (ver versao_dados)
+        self._eventos_pendentes: List[Evento] = []
+        self.eventos = BarramentoEventos()
+        self.mapa_identidade: Optional[MapaIdentidade] = None
+        self.estatisticas = EstatisticasConsultas(settings.database.limite_consulta_lenta_ms)
         self._ensure_data_dir()
         self._create_tables()
+        self.atualizar_estatisticas()
         self._initialized = True
     
     def _ensure_data_dir(self):
@@ -37,18 +62,224 @@ class Database:
     
     @contextmanager
     def get_connection(self):
-        """Context manager para conexão com o banco."""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
+        """
+        Context manager para conexão com o banco.
+        Dentro de uma transação aberta com transacao(), reutiliza a mesma
+        conexão e deixa o commit para o final da transação.
+        """
+        if not self._em_transacao:
+            self._contar_conexao()
+        
+        if self._conexao_transacao is not None:
+            yield self._conexao_transacao
+            return
+        
+        with self._usar_conexao() as conn:
+            yield conn
+    
+    @contextmanager
+    def transacao(self):
+        """
+        Agrupa várias operações (inclusive de repositories diferentes)
+        em uma única conexão e um único commit.
+        """
+        if self._em_transacao:
+            yield self._conexao_transacao
+            return
+        
+        self._contar_conexao()
+        self._em_transacao = True
+        try:
+            if self._conexao_transacao is not None:
+                # Dentro de simulacao(): a conexão já está em uso
+                yield self._conexao_transacao
+                return
+            
+            with self._usar_conexao() as conn:
+                self._conexao_transacao = conn
+                try:
+                    yield conn
+                finally:
+                    self._conexao_transacao = None
+        finally:
+            self._em_transacao = False
+    
+    @contextmanager
+    def unidade_de_trabalho(self):
+        """
+        Agrupa as leituras de uma operação lógica: cada entidade lida por ID
+        nos repositories é carregada uma única vez (ver identidade.py).
+        Dentro de outra unidade, usa o mesmo mapa.
+        """
+        if self.mapa_identidade is not None:
+            yield self.mapa_identidade
+            return
+        
+        self.mapa_identidade = MapaIdentidade()
+        try:
+            yield self.mapa_identidade
+        finally:
+            self.mapa_identidade = None
+    
+    @contextmanager
+    def contar_consultas(self):
+        """
+        Conta os comandos SQL e os usos de conexão (get_connection ou
+        transacao, que no uso normal terminam em um commit) executados no
+        bloco. Controle de transação (BEGIN, COMMIT...) e comandos de
+        triggers não entram na contagem. Usado em src/verificacao_orcamento.py.
+        """
+        self._ultimo_comando = None
+        contagem = ContagemConsultas()
+        self._contagens.append(contagem)
+        self._rastrear_comandos()
+        try:
+            yield contagem
+        finally:
+            self._contagens.remove(contagem)
+            self._rastrear_comandos()
+    
+    def _contar_conexao(self):
+        for contagem in self._contagens:
+            contagem.conexoes += 1
+    
+    def _rastrear_comandos(self):
+        """Liga o rastreamento de comandos só enquanto houver contagens."""
+        if self._conexao is not None:
+            self._conexao.set_trace_callback(self._registrar_comando if self._contagens else None)
+    
+    def _registrar_comando(self, sql: str):
+        if sql.startswith('--') or CONTROLE_TRANSACAO.match(sql):
+            return
+        # O trace do sqlite3 repete o texto do comando externo para cada
+        # comando executado pelos triggers que ele dispara
+        if sql == self._ultimo_comando:
+            return
+        self._ultimo_comando = sql
+        for contagem in self._contagens:
+            contagem.comandos.append(sql)
+    
+    @contextmanager
+    def simulacao(self):
+        """
+        Como transacao(), mas desfaz tudo no final. Usado para inspecionar
+        o que as operações fariam (ex: planos de consulta) sem alterar dados.
+        Dentro de outra simulação, desfaz só o próprio bloco (savepoint).
+        """
+        if self._em_transacao:
+            raise RuntimeError("simulacao() não pode ser aberta dentro de uma transação")
+        
+        # Eventos publicados na simulação são descartados com ela
+        pendentes = len(self._eventos_pendentes)
+        
+        if self._conexao_transacao is not None:
+            conn = self._conexao_transacao
+            conn.execute("SAVEPOINT simulacao")
+            try:
+                yield conn
+            finally:
+                conn.execute("ROLLBACK TO simulacao")
+                conn.execute("RELEASE simulacao")
+                self._desfazer_eventos(pendentes)
+            return
+        
+        with self._usar_conexao() as conn:
+            # BEGIN explícito: também comandos que não são DML (ex: ANALYZE)
+            # ficam dentro da transação desfeita
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            self._conexao_transacao = conn
+            try:
+                yield conn
+            finally:
+                self._conexao_transacao = None
+                conn.rollback()
+                self._desfazer_eventos(pendentes)
+    
+    @contextmanager
+    def _usar_conexao(self):
+        """
+        Usa a conexão do banco, com commit/rollback automático.
+        A conexão é aberta uma vez e mantida entre as chamadas, para que o
+        cache de statements do SQLite reaproveite as consultas já compiladas.
+        Com settings.database.instrumentar, todo comando executado nela é
+        medido em self.estatisticas.
+        Os eventos publicados no bloco são entregues depois do commit do
+        uso mais externo e descartados no rollback.
+        """
+        if self._conexao is None:
+            instrumentar = settings.database.instrumentar
+            self._conexao = sqlite3.connect(
+                str(self.db_path), cached_statements=TAMANHO_CACHE_SQL,
+                factory=ConexaoInstrumentada if instrumentar else sqlite3.Connection
+            )
+            self._geracao += 1
+            if instrumentar:
+                self._conexao.estatisticas = self.estatisticas
+            self._conexao.row_factory = sqlite3.Row
+            self._conexao.execute("PRAGMA foreign_keys = ON")
+            self._rastrear_comandos()
+        
+        conn = self._conexao
+        self._profundidade += 1
         try:
             yield conn
             conn.commit()
         except Exception:
             conn.rollback()
+            self._desfazer_eventos(0)
             raise
         finally:
-            conn.close()
+            self._profundidade -= 1
+        
+        if self._profundidade == 0:
+            self._entregar_eventos()
+    
+    @property
+    def alteracoes_pendentes(self) -> bool:
+        """Indica se há uma transação aberta (escritas ainda não confirmadas)."""
+        return self._conexao is not None and self._conexao.in_transaction
+    
+    def versao_dados(self) -> tuple:
+        """
+        Versão dos dados gravados por outras conexões (PRAGMA data_version):
+        muda quando outro processo altera o banco, o que não gera eventos.
+        """
+        with self.get_connection() as conn:
+            return self._geracao, conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def publicar(self, evento: Evento):
+        """
+        Publica um evento de alteração. Com uma conexão em uso, o evento
+        fica pendente até o commit; fora dela, é entregue na hora.
+        O mapa de identidade da unidade de trabalho é atualizado na hora.
+        """
+        if self.mapa_identidade is not None:
+            self.mapa_identidade.descartar(evento)
+        self._eventos_pendentes.append(evento)
+        if self._profundidade == 0:
+            self._entregar_eventos()
+    
+    def _desfazer_eventos(self, pendentes: int):
+        """Descarta os eventos de escritas desfeitas (a partir de pendentes)."""
+        if len(self._eventos_pendentes) > pendentes and self.mapa_identidade is not None:
+            # Entidades lidas depois dessas escritas também foram desfeitas
+            self.mapa_identidade.limpar()
+        del self._eventos_pendentes[pendentes:]
+    
+    def _entregar_eventos(self):
+        eventos = mesclar_eventos(self._eventos_pendentes)
+        self._eventos_pendentes.clear()
+        for evento in eventos:
+            self.eventos.publicar(evento)
+    
+    def fechar(self):
+        """Fecha a conexão persistente (é reaberta no próximo uso)."""
+        if self._conexao is not None:
+            # Reanalisa só o que as consultas desta sessão indicaram
+            self._conexao.execute("PRAGMA optimize")
+            self._conexao.close()
+            self._conexao = None
     
     def execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
         """Executa uma query e retorna o cursor."""
@@ -74,6 +305,40 @@ class Database:
             cursor = conn.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    def fetch_linhas(self, query: str, params: tuple = ()) -> List[Linha]:
+        """
+        Executa query e retorna linhas leves (tuplas com acesso por nome),
+        sem criar um dict por registro. Indicado para listagens grandes.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params)
+            tipo = tipo_linha(tuple(coluna[0] for coluna in cursor.description))
+            return list(map(tipo, cursor.fetchall()))
+    
+    def iter_query(self, query: str, params: tuple = (),
+                   batch_size: int = TAMANHO_LOTE) -> Iterator[Linha]:
+        """
+        Executa query e devolve as linhas aos poucos (fetchmany), sem
+        carregar o resultado inteiro: a memória usada fica limitada a um
+        lote, qualquer que seja o número de registros.
+        A conexão fica em uso até o gerador terminar (ou ser fechado).
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            try:
+                cursor.execute(query, params)
+                tipo = tipo_linha(tuple(coluna[0] for coluna in cursor.description))
+                while True:
+                    lote = cursor.fetchmany(batch_size)
+                    if not lote:
+                        break
+                    yield from map(tipo, lote)
+            finally:
+                cursor.close()
+    
     def insert(self, query: str, params: tuple = ()) -> int:
         """Insere um registro e retorna o ID."""
         with self.get_connection() as conn:
@@ -118,10 +383,27 @@ class Database:
                     observacao TEXT,
                     grupo_parcela_id TEXT,
                     criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (categoria_id) REFERENCES categorias(id)
+                    pagador_id INTEGER,
+                    recorrencia_id INTEGER,
+                    FOREIGN KEY (categoria_id) REFERENCES categorias(id),
+                    FOREIGN KEY (pagador_id) REFERENCES pessoas(id),
+                    FOREIGN KEY (recorrencia_id) REFERENCES recorrencias(id) ON DELETE SET NULL
                 )
             """)
             
+            # Quem pagou a conta (NULL: o dono do app) e a regra recorrente
+            # que a gerou; bancos anteriores às colunas as recebem no fim da tabela
+            colunas = {row['name'] for row in conn.execute("PRAGMA table_info(contas)")}
+            if 'pagador_id' not in colunas:
+                conn.execute(
+                    "ALTER TABLE contas ADD COLUMN pagador_id INTEGER REFERENCES pessoas(id)"
+                )
+            if 'recorrencia_id' not in colunas:
+                conn.execute(
+                    "ALTER TABLE contas ADD COLUMN recorrencia_id INTEGER "
+                    "REFERENCES recorrencias(id) ON DELETE SET NULL"
+                )
+            
             # Tabela de divisão de contas
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS divisao_contas (
@@ -138,22 +420,142 @@ class Database:
                 )
             """)
             
-            # Índices para performance
+            # Planos de parcelamento (parcelas virtuais, geradas sob demanda)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS planos_parcela (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    grupo_parcela_id TEXT NOT NULL UNIQUE,
+                    descricao TEXT NOT NULL,
+                    valor_parcela REAL NOT NULL,
+                    parcela_inicial INTEGER DEFAULT 1,
+                    total_parcelas INTEGER NOT NULL,
+                    data_inicio TEXT NOT NULL,
+                    categoria_id INTEGER,
+                    observacao TEXT,
+                    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (categoria_id) REFERENCES categorias(id)
+                )
+            """)
+            
+            # Divisão padrão de cada parcela de um plano
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS planos_parcela_divisoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    plano_id INTEGER NOT NULL,
+                    pessoa_id INTEGER NOT NULL,
+                    valor REAL NOT NULL,
+                    percentual REAL,
+                    FOREIGN KEY (plano_id) REFERENCES planos_parcela(id) ON DELETE CASCADE,
+                    FOREIGN KEY (pessoa_id) REFERENCES pessoas(id),
+                    UNIQUE(plano_id, pessoa_id)
+                )
+            """)
+            
+            # Parcelas de um plano que já viraram linhas em contas
+            # (conta_id fica NULL quando a parcela foi excluída)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS planos_parcela_materializadas (
+                    plano_id INTEGER NOT NULL,
+                    parcela_atual INTEGER NOT NULL,
+                    conta_id INTEGER,
+                    PRIMARY KEY (plano_id, parcela_atual),
+                    FOREIGN KEY (plano_id) REFERENCES planos_parcela(id) ON DELETE CASCADE,
+                    FOREIGN KEY (conta_id) REFERENCES contas(id) ON DELETE SET NULL
+                )
+            """)
+            
+            # Contas recorrentes (aluguel, luz...): cada regra vira uma conta
+            # por mês, gravada sob demanda até o mês em gerada_ate (1º dia)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recorrencias (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    descricao TEXT NOT NULL,
+                    valor REAL NOT NULL,
+                    dia INTEGER NOT NULL CHECK (dia BETWEEN 1 AND 31),
+                    data_inicio TEXT NOT NULL,
+                    data_fim TEXT,
+                    categoria_id INTEGER,
+                    observacao TEXT,
+                    pagador_id INTEGER,
+                    gerada_ate TEXT,
+                    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (categoria_id) REFERENCES categorias(id),
+                    FOREIGN KEY (pagador_id) REFERENCES pessoas(id)
+                )
+            """)
+            
+            # Divisão aplicada a cada conta gerada por uma regra recorrente
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recorrencias_divisoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recorrencia_id INTEGER NOT NULL,
+                    pessoa_id INTEGER NOT NULL,
+                    valor REAL NOT NULL,
+                    percentual REAL,
+                    FOREIGN KEY (recorrencia_id) REFERENCES recorrencias(id) ON DELETE CASCADE,
+                    FOREIGN KEY (pessoa_id) REFERENCES pessoas(id),
+                    UNIQUE(recorrencia_id, pessoa_id)
+                )
+            """)
+            
+            # Metadados internos (ex: data da última varredura de atrasadas)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadados (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT
+                )
+            """)
+            
+            self._create_views(conn)
+            self._create_busca(conn)
+            self._create_log_alteracoes(conn)
+            
+            # Índices para performance, derivados das consultas dos
+            # repositories (verificados por src/data/verificacao_indices.py)
+            for antigo in ('idx_contas_grupo', 'idx_contas_categoria_data',
+                           'idx_contas_data_resumo', 'idx_divisao_conta',
+                           'idx_divisao_pessoa', 'idx_divisao_pessoa_valor'):
+                conn.execute(f"DROP INDEX IF EXISTS {antigo}")
+            
+            # Listagem paginada: ordem (data_vencimento, id) do keyset
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_contas_data 
                 ON contas(data_vencimento)
             """)
+            # Parcelas de um grupo (edição, quitação e exclusão em lote)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_contas_grupo_parcela 
+                ON contas(grupo_parcela_id, parcela_atual)
+            """)
+            # Resumo e totais do mês, pagar mês: cobre todas as colunas lidas
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_contas_vencimento_resumo 
+                ON contas(data_vencimento, status, categoria_id, valor_total)
+            """)
+            # Gastos por categoria e filtros por categoria
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_contas_categoria_data_valor 
+                ON contas(categoria_id, data_vencimento, valor_total)
+            """)
+            # Varredura de atrasadas e filtro por status
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_contas_grupo 
-                ON contas(grupo_parcela_id)
+                CREATE INDEX IF NOT EXISTS idx_contas_status_vencimento 
+                ON contas(status, data_vencimento)
             """)
+            # Contas geradas por uma regra recorrente (encerrar a regra)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_divisao_conta 
-                ON divisao_contas(conta_id)
+                CREATE INDEX IF NOT EXISTS idx_contas_recorrencia 
+                ON contas(recorrencia_id, data_vencimento)
             """)
+            # Divisões de uma conta e totais por pessoa a partir das contas
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_divisao_pessoa 
-                ON divisao_contas(pessoa_id)
+                CREATE INDEX IF NOT EXISTS idx_divisao_conta_valor 
+                ON divisao_contas(conta_id, pessoa_id, valor, pago)
+            """)
+            # Divisões (pendentes) de uma pessoa: detalhes e quitação
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_divisao_pessoa_pago 
+                ON divisao_contas(pessoa_id, pago, conta_id, valor)
             """)
             
             # Inserir categorias padrão
@@ -165,6 +567,235 @@ class Database:
                     )
                 except sqlite3.IntegrityError:
                     pass
+    
+    def atualizar_estatisticas(self, forcar: bool = False) -> bool:
+        """
+        Atualiza as estatísticas do planejador (sqlite_stat1) com ANALYZE,
+        no máximo a cada INTERVALO_ESTATISTICAS_DIAS. As estatísticas são
+        amostradas (analysis_limit), então o custo não cresce com o banco.
+        Bancos sem contas não são analisados: estatísticas de tabelas vazias
+        levariam o planejador a preferir varreduras quando os dados chegarem.
+        Retorna True se a análise foi executada.
+        """
+        hoje = date.today()
+        with self.get_connection() as conn:
+            if not forcar:
+                if not conn.execute("SELECT 1 FROM contas LIMIT 1").fetchone():
+                    return False
+                row = conn.execute(
+                    "SELECT valor FROM metadados WHERE chave = 'estatisticas_em'"
+                ).fetchone()
+                if row and (hoje - date.fromisoformat(row['valor'])).days < INTERVALO_ESTATISTICAS_DIAS:
+                    return False
+            
+            conn.execute(f"PRAGMA analysis_limit = {LIMITE_ANALISE}")
+            conn.execute("ANALYZE")
+            conn.execute(
+                "INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('estatisticas_em', ?)",
+                (hoje.isoformat(),)
+            )
+        return True
+    
+    def _create_busca(self, conn: sqlite3.Connection):
+        """
+        Cria os índices de busca textual (FTS5) de contas e planos de
+        parcelas, mantidos em sincronia por triggers.
+        O tokenizador ignora acentos e o índice de prefixos atende buscas
+        enquanto o usuário digita ("merc" encontra "Mercadão").
+        """
+        for tabela in ('contas', 'planos_parcela'):
+            fts = f"{tabela}_fts"
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+            ).fetchone()
+            
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    descricao, observacao,
+                    content='{tabela}', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN
+                    INSERT INTO {fts}(rowid, descricao, observacao)
+                    VALUES (new.id, new.descricao, new.observacao);
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, descricao, observacao)
+                    VALUES ('delete', old.id, old.descricao, old.observacao);
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au
+                AFTER UPDATE OF descricao, observacao ON {tabela} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, descricao, observacao)
+                    VALUES ('delete', old.id, old.descricao, old.observacao);
+                    INSERT INTO {fts}(rowid, descricao, observacao)
+                    VALUES (new.id, new.descricao, new.observacao);
+                END
+            """)
+            
+            # Bancos criados antes da busca: indexa o que já existe
+            if not existe:
+                conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    
+    def _create_log_alteracoes(self, conn: sqlite3.Connection):
+        """
+        Cria o log de alterações, mantido por triggers: cada escrita em
+        contas/divisões registra a conta e cada escrita em um plano de
+        parcelas (ou suas divisões e materializações) registra o plano.
+        O seq crescente funciona como contador de alterações do banco: quem
+        guarda dados derivados (ex: o instantâneo da base colunar) relê só o
+        que mudou depois do seq em que foi gerado, inclusive alterações de
+        outros processos.
+        As entradas já aplicadas são podadas com podar_log_alteracoes().
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                conta_id INTEGER,
+                plano_id INTEGER
+            )
+        """)
+        
+        for tabela, coluna, chave in (
+            ('contas', 'conta_id', 'id'),
+            ('divisao_contas', 'conta_id', 'conta_id'),
+            ('planos_parcela', 'plano_id', 'id'),
+            ('planos_parcela_divisoes', 'plano_id', 'plano_id'),
+            ('planos_parcela_materializadas', 'plano_id', 'plano_id'),
+        ):
+            for operacao, linha in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS log_{tabela}_{operacao.lower()}
+                    AFTER {operacao} ON {tabela} BEGIN
+                        INSERT INTO log_alteracoes ({coluna}) VALUES ({linha}.{chave});
+                    END
+                """)
+    
+    def seq_alteracoes(self) -> int:
+        """Seq da última alteração registrada no log (mantido após a poda)."""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'log_alteracoes'"
+            ).fetchone()
+            return row[0] if row else 0
+    
+    def alteracoes_desde(self, seq: int) -> Optional[List[tuple]]:
+        """
+        Entradas (seq, conta_id, plano_id) do log posteriores a seq, ou None
+        se parte delas já foi podada (quem pediu precisa reler tudo).
+        """
+        with self.get_connection() as conn:
+            podado = conn.execute(
+                "SELECT valor FROM metadados WHERE chave = 'log_alteracoes_podado_ate'"
+            ).fetchone()
+            if podado and int(podado[0]) > seq:
+                return None
+            return [tuple(r) for r in conn.execute(
+                "SELECT seq, conta_id, plano_id FROM log_alteracoes WHERE seq > ? ORDER BY seq",
+                (seq,)
+            )]
+    
+    def podar_log_alteracoes(self, ate_seq: int):
+        """Remove as entradas do log até ate_seq (já refletidas por quem as usa)."""
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM log_alteracoes WHERE seq <= ?", (ate_seq,))
+            conn.execute(
+                "INSERT OR REPLACE INTO metadados (chave, valor) "
+                "VALUES ('log_alteracoes_podado_ate', ?)",
+                (str(ate_seq),)
+            )
+    
+    def _create_views(self, conn: sqlite3.Connection):
+        """
+        Cria as views que juntam contas físicas e parcelas virtuais.
+        As views são recriadas a cada inicialização para acompanhar o schema.
+        
+        Parcelas virtuais recebem ID negativo: -(plano_id * 100 + parcela).
+        """
+        for view in ('v_divisao_contas', 'v_contas', 'divisoes_virtuais', 'contas_virtuais'):
+            conn.execute(f"DROP VIEW IF EXISTS {view}")
+        
+        conn.execute(f"""
+            CREATE VIEW contas_virtuais AS
+            WITH RECURSIVE seq(n) AS (
+                SELECT 0
+                UNION ALL
+                SELECT n + 1 FROM seq WHERE n < {MAX_PARCELAS - 1}
+            ),
+            meses AS (
+                SELECT p.*,
+                       p.parcela_inicial + s.n AS parcela,
+                       date(p.data_inicio, 'start of month', '+' || s.n || ' months') AS inicio_mes
+                FROM planos_parcela p
+                JOIN seq s ON s.n <= p.total_parcelas - p.parcela_inicial
+            ),
+            parcelas AS (
+                SELECT m.*,
+                       min(
+                           date(m.inicio_mes, '+' || (CAST(strftime('%d', m.data_inicio) AS INTEGER) - 1) || ' days'),
+                           date(m.inicio_mes, '+1 month', '-1 day')
+                       ) AS data_vencimento_calc
+                FROM meses m
+            )
+            SELECT -(pp.id * 100 + pp.parcela) AS id,
+                   pp.descricao,
+                   pp.valor_parcela AS valor_total,
+                   pp.parcela AS parcela_atual,
+                   pp.total_parcelas,
+                   pp.data_vencimento_calc AS data_vencimento,
+                   pp.categoria_id,
+                   CASE
+                       WHEN pp.data_vencimento_calc < date('now', 'localtime') THEN 'atrasado'
+                       ELSE 'pendente'
+                   END AS status,
+                   pp.observacao,
+                   pp.grupo_parcela_id,
+                   pp.criado_em,
+                   NULL AS pagador_id,
+                   NULL AS recorrencia_id,
+                   pp.id AS plano_id
+            FROM parcelas pp
+            WHERE NOT EXISTS (
+                SELECT 1 FROM planos_parcela_materializadas m
+                WHERE m.plano_id = pp.id AND m.parcela_atual = pp.parcela
+            )
+        """)
+        
+        conn.execute("""
+            CREATE VIEW divisoes_virtuais AS
+            SELECT NULL AS id, cv.id AS conta_id, d.pessoa_id, d.valor,
+                   d.percentual, 0 AS pago, NULL AS data_pagamento
+            FROM contas_virtuais cv
+            JOIN planos_parcela_divisoes d ON d.plano_id = cv.plano_id
+        """)
+        
+        conn.execute("""
+            CREATE VIEW v_contas AS
+            SELECT id, descricao, valor_total, parcela_atual, total_parcelas,
+                   data_vencimento, categoria_id, status, observacao,
+                   grupo_parcela_id, criado_em, pagador_id, recorrencia_id
+            FROM contas
+            UNION ALL
+            SELECT id, descricao, valor_total, parcela_atual, total_parcelas,
+                   data_vencimento, categoria_id, status, observacao,
+                   grupo_parcela_id, criado_em, pagador_id, recorrencia_id
+            FROM contas_virtuais
+        """)
+        
+        conn.execute("""
+            CREATE VIEW v_divisao_contas AS
+            SELECT id, conta_id, pessoa_id, valor, percentual, pago, data_pagamento
+            FROM divisao_contas
+            UNION ALL
+            SELECT id, conta_id, pessoa_id, valor, percentual, pago, data_pagamento
+            FROM divisoes_virtuais
+        """)
 
 
 # Singleton global
@@ -177,3 +808,12 @@ def get_database() -> Database:
     if _db_instance is None:
         _db_instance = Database()
     return _db_instance
+
+
+def em_unidade_de_trabalho(metodo):
+    """Executa o método (de um service) em uma unidade de trabalho."""
+    @wraps(metodo)
+    def wrapper(*args, **kwargs):
+        with get_database().unidade_de_trabalho():
+            return metodo(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,180 @@
+"""
+Eventos de alteração dos dados - publicados pelos repositories.
+
+Cada escrita de um repository publica um evento tipado dizendo o que mudou
+(IDs e meses afetados). Os eventos publicados dentro de uma transação só
+são entregues depois do commit (e descartados no rollback ou em uma
+simulação), então quem assina recebe apenas alterações que persistiram.
+
+Os assinantes (caches, agregados, páginas da GUI) usam os IDs e os
+períodos para invalidar só o que foi afetado, em vez de recarregar tudo.
+"""
+
+import logging
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (mes, ano)
+Periodo = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class Evento:
+    """
+    Alteração de dados já confirmada no banco.
+    
+    ids: IDs afetados (None quando não se sabe quais).
+    periodos: meses de vencimento afetados (None quando pode ser qualquer
+    mês; vazio quando só contas sem vencimento foram afetadas).
+    """
+    ids: Optional[FrozenSet[int]] = None
+    periodos: Optional[FrozenSet[Periodo]] = None
+    
+    @property
+    def chave(self) -> tuple:
+        """Eventos com a mesma chave são mesclados em uma transação."""
+        return (type(self),)
+    
+    def afeta_periodo(self, mes: Optional[int], ano: Optional[int]) -> bool:
+        """Indica se o evento altera dados do mês (sem mês: sempre)."""
+        if self.periodos is None or not (mes and ano):
+            return True
+        return (mes, ano) in self.periodos
+    
+    def mesclar(self, outro: 'Evento') -> 'Evento':
+        """Une IDs e períodos de dois eventos de mesma chave."""
+        return replace(
+            self,
+            ids=_unir(self.ids, outro.ids),
+            periodos=_unir(self.periodos, outro.periodos)
+        )
+
+
+@dataclass(frozen=True)
+class ContaAlterada(Evento):
+    """
+    Contas (ou parcelas virtuais) criadas, editadas, pagas ou excluídas.
+    Vale também para as divisões dessas contas (ex: excluídas junto).
+    """
+
+
+@dataclass(frozen=True)
+class DivisaoAlterada(Evento):
+    """Divisões criadas, editadas ou excluídas (ids são das contas)."""
+
+
+@dataclass(frozen=True)
+class DivisaoPaga(DivisaoAlterada):
+    """Divisões de uma pessoa marcadas como pagas (ids são das contas)."""
+    pessoa_id: Optional[int] = None
+    
+    @property
+    def chave(self) -> tuple:
+        return (type(self), self.pessoa_id)
+
+
+@dataclass(frozen=True)
+class PessoaAlterada(Evento):
+    """Pessoas criadas, editadas, desativadas ou reativadas."""
+
+
+@dataclass(frozen=True)
+class CategoriaAlterada(Evento):
+    """Categorias criadas, editadas ou excluídas."""
+
+
+def periodo_de(data: Optional[str]) -> Optional[Periodo]:
+    """Mês (mes, ano) de uma data 'YYYY-MM-DD'."""
+    if not data:
+        return None
+    return int(data[5:7]), int(data[:4])
+
+
+def periodos_de(datas: Iterable[Optional[str]]) -> FrozenSet[Periodo]:
+    """Meses das datas informadas (datas vazias são ignoradas)."""
+    return frozenset(p for p in map(periodo_de, datas) if p is not None)
+
+
+def periodos_plano(data_inicio: str, parcela_inicial: int,
+                   total_parcelas: int) -> FrozenSet[Periodo]:
+    """Meses em que vencem as parcelas de um plano (ver contas_virtuais)."""
+    mes, ano = periodo_de(data_inicio)
+    periodos = set()
+    for n in range(max(total_parcelas - parcela_inicial + 1, 0)):
+        indice = mes - 1 + n
+        periodos.add((indice % 12 + 1, ano + indice // 12))
+    return frozenset(periodos)
+
+
+def periodos_recorrencia(data_inicio: str, data_fim: Optional[str],
+                         meses: int) -> FrozenSet[Periodo]:
+    """
+    Meses em que vence uma regra recorrente, do mês atual até `meses`
+    meses à frente (o horizonte da projeção): os meses futuros ainda não
+    gerados só existem nos relatórios que calculam a regra.
+    """
+    hoje = date.today()
+    inicio = max(periodo_de(data_inicio)[::-1], (hoje.year, hoje.month))
+    fim = periodo_de(data_fim)[::-1] if data_fim else (9999, 12)
+    periodos = set()
+    for n in range(meses):
+        ano, mes = divmod(inicio[0] * 12 + inicio[1] - 1 + n, 12)
+        if (ano, mes + 1) > fim:
+            break
+        periodos.add((mes + 1, ano))
+    return frozenset(periodos)
+
+
+def ids_plano(plano_id: int, parcela_inicial: int, total_parcelas: int) -> FrozenSet[int]:
+    """IDs das parcelas virtuais de um plano: -(plano_id * 100 + parcela)."""
+    return frozenset(-(plano_id * 100 + p) for p in range(parcela_inicial, total_parcelas + 1))
+
+
+def mesclar_eventos(eventos: Iterable[Evento]) -> List[Evento]:
+    """Mescla os eventos de mesma chave, na ordem da primeira ocorrência."""
+    por_chave: Dict[tuple, Evento] = {}
+    for evento in eventos:
+        anterior = por_chave.get(evento.chave)
+        por_chave[evento.chave] = evento if anterior is None else anterior.mesclar(evento)
+    return list(por_chave.values())
+
+
+class BarramentoEventos:
+    """
+    Barramento síncrono, no próprio processo. Quem assina um tipo recebe
+    também os eventos das subclasses (ex: DivisaoAlterada recebe DivisaoPaga
+    e Evento recebe todos). Um assinante que falha não impede os demais.
+    """
+    
+    def __init__(self):
+        self._assinantes: Dict[type, List[Callable[[Evento], None]]] = {}
+    
+    def inscrever(self, tipo: type, callback: Callable[[Evento], None]) -> Callable[[], None]:
+        """Inscreve callback para o tipo de evento; retorna a função que cancela."""
+        self._assinantes.setdefault(tipo, []).append(callback)
+        return lambda: self.cancelar(tipo, callback)
+    
+    def cancelar(self, tipo: type, callback: Callable[[Evento], None]):
+        assinantes = self._assinantes.get(tipo, [])
+        if callback in assinantes:
+            assinantes.remove(callback)
+    
+    def publicar(self, evento: Evento):
+        """Entrega o evento a todos os assinantes do tipo e dos tipos base."""
+        for tipo in type(evento).__mro__:
+            # Cópia: um assinante pode se cancelar durante a entrega
+            for callback in list(self._assinantes.get(tipo, ())):
+                try:
+                    callback(evento)
+                except Exception:
+                    logger.exception("Erro ao entregar %s", type(evento).__name__)
+
+
+def _unir(a: Optional[FrozenSet], b: Optional[FrozenSet]) -> Optional[FrozenSet]:
+    """União em que None (desconhecido/todos) prevalece."""
+    if a is None or b is None:
+        return None
+    return a | b
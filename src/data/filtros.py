@@ -0,0 +1,227 @@
+"""
+Filtros de contas - monta cláusulas WHERE canônicas a partir de critérios.
+
+Filtros com a mesma "forma" (os mesmos critérios preenchidos, com a mesma
+quantidade de valores em cada lista) geram exatamente o mesmo SQL. Assim a
+montagem é feita uma vez por forma e o SQLite reaproveita o statement já
+compilado no cache da conexão.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from src.config.constants import FORMATO_DATA_DB, TAMANHO_CACHE_SQL
+
+# Tabela de divisões correspondente a cada fonte de contas (filtro por pessoa)
+DIVISOES_DA_FONTE = {
+    'v_contas': 'v_divisao_contas',
+    'contas': 'divisao_contas',
+    'contas_virtuais': 'divisoes_virtuais',
+}
+
+# Busca textual de cada fonte: contas físicas usam contas_fts e parcelas
+# virtuais usam o índice do plano de onde vêm a descrição e a observação
+BUSCA_CONTAS = "c.id IN (SELECT rowid FROM contas_fts WHERE contas_fts MATCH ?)"
+BUSCA_PLANOS = "SELECT rowid FROM planos_parcela_fts WHERE planos_parcela_fts MATCH ?"
+BUSCA_DA_FONTE = {
+    'v_contas': (
+        f"({BUSCA_CONTAS} OR c.id < 0 AND c.grupo_parcela_id IN ("
+        f"SELECT grupo_parcela_id FROM planos_parcela WHERE id IN ({BUSCA_PLANOS})))"
+    ),
+    'contas': BUSCA_CONTAS,
+    'contas_virtuais': f"c.plano_id IN ({BUSCA_PLANOS})",
+}
+
+
+def intervalo_mes(mes: int, ano: int) -> Tuple[str, str]:
+    """
+    Retorna o intervalo [início, fim) de um mês no formato do banco.
+    Comparar data_vencimento com um intervalo permite usar os índices.
+    """
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio.strftime(FORMATO_DATA_DB), fim.strftime(FORMATO_DATA_DB)
+
+
+@dataclass(frozen=True)
+class FiltroContas:
+    """
+    Critérios de filtragem de contas. Critérios vazios não filtram.
+    
+    data_inicio é inclusiva e data_fim exclusiva (como em intervalo_mes).
+    status e categorias aceitam um valor ou uma coleção de valores.
+    texto é buscado por palavras (prefixo, sem acento) na descrição e na
+    observação.
+    """
+    status: Tuple[str, ...] = ()
+    categorias: Tuple[int, ...] = ()
+    pessoa_id: Optional[int] = None
+    data_inicio: Optional[str] = None
+    data_fim: Optional[str] = None
+    valor_min: Optional[float] = None
+    valor_max: Optional[float] = None
+    apenas_parceladas: bool = False
+    texto: str = ''
+    
+    def __post_init__(self):
+        # Normaliza para que filtros equivalentes tenham a mesma forma
+        object.__setattr__(self, 'status', _normalizar(self.status))
+        object.__setattr__(self, 'categorias', _normalizar(self.categorias))
+        object.__setattr__(self, 'texto', (self.texto or '').strip())
+    
+    @classmethod
+    def do_mes(cls, mes: int = None, ano: int = None, **criterios) -> 'FiltroContas':
+        """Cria um filtro restrito ao mês informado (se mes e ano forem dados)."""
+        if mes and ano:
+            criterios['data_inicio'], criterios['data_fim'] = intervalo_mes(mes, ano)
+        return cls(**criterios)
+    
+    @property
+    def forma(self) -> Tuple:
+        """Critérios preenchidos, em ordem canônica (chave do cache de SQL)."""
+        forma = []
+        if self.status:
+            forma.append(('status', len(self.status)))
+        if self.categorias:
+            forma.append(('categorias', len(self.categorias)))
+        if self.pessoa_id is not None:
+            forma.append('pessoa')
+        if self.data_inicio:
+            forma.append('data_inicio')
+        if self.data_fim:
+            forma.append('data_fim')
+        if self.valor_min is not None:
+            forma.append('valor_min')
+        if self.valor_max is not None:
+            forma.append('valor_max')
+        if self.apenas_parceladas:
+            forma.append('parceladas')
+        if self.consulta_texto:
+            forma.append('texto')
+        return tuple(forma)
+    
+    @property
+    def parametros(self) -> tuple:
+        """
+        Parâmetros na mesma ordem dos placeholders de forma, exceto os da
+        busca textual (que dependem da fonte e vêm por último).
+        """
+        params = list(self.status) + list(self.categorias)
+        if self.pessoa_id is not None:
+            params.append(self.pessoa_id)
+        if self.data_inicio:
+            params.append(self.data_inicio)
+        if self.data_fim:
+            params.append(self.data_fim)
+        if self.valor_min is not None:
+            params.append(self.valor_min)
+        if self.valor_max is not None:
+            params.append(self.valor_max)
+        return tuple(params)
+    
+    @property
+    def consulta_texto(self) -> str:
+        """
+        Converte o texto em uma consulta FTS5: cada palavra vira um prefixo
+        entre aspas ("mer"* "liv"*), todas obrigatórias. Aspas e operadores
+        digitados pelo usuário não são interpretados.
+        """
+        return ' '.join(f'"{palavra}"*' for palavra in re.findall(r'\w+', self.texto))
+
+
+# Campos de conta que podem ser projetados nas listagens (ver projecao_contas)
+CAMPOS_CONTA = (
+    'id', 'descricao', 'valor_total', 'parcela_atual', 'total_parcelas',
+    'data_vencimento', 'categoria_id', 'status', 'observacao',
+    'grupo_parcela_id', 'criado_em', 'pagador_id', 'recorrencia_id',
+)
+CAMPOS_CATEGORIA = {'categoria_nome': 'cat.nome', 'categoria_icone': 'cat.icone'}
+CAMPOS_LISTAGEM = CAMPOS_CONTA + tuple(CAMPOS_CATEGORIA)
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_SQL)
+def projecao_contas(campos: Tuple[str, ...] = CAMPOS_LISTAGEM) -> Tuple[str, bool]:
+    """
+    Monta a lista de colunas de um SELECT sobre contas (alias "c").
+    Retorna (colunas, precisa_categoria); o JOIN com categorias só é
+    necessário quando um campo da categoria foi pedido.
+    """
+    colunas = []
+    for campo in campos:
+        if campo in CAMPOS_CATEGORIA:
+            colunas.append(f"{CAMPOS_CATEGORIA[campo]} AS {campo}")
+        elif campo in CAMPOS_CONTA:
+            colunas.append(f"c.{campo}")
+        else:
+            raise ValueError(f"Campo de conta desconhecido: {campo}")
+    
+    return ", ".join(colunas), any(campo in CAMPOS_CATEGORIA for campo in campos)
+
+
+def compilar_filtro(filtro: Optional[FiltroContas], fonte: str = 'v_contas',
+                    alias_divisao: str = None) -> Tuple[str, tuple]:
+    """
+    Converte um filtro em (cláusula WHERE, parâmetros) sobre o alias "c".
+    
+    fonte é de onde vêm as contas (v_contas, contas ou contas_virtuais);
+    ela define as tabelas usadas nos filtros por pessoa e por texto, para
+    que uma consulta só sobre contas não expanda as parcelas virtuais.
+    Se a consulta já junta as divisões, informe alias_divisao para filtrar
+    a pessoa diretamente nela.
+    """
+    if filtro is None:
+        return "1=1", ()
+    
+    forma = filtro.forma
+    params = filtro.parametros
+    if 'texto' in forma:
+        consulta = filtro.consulta_texto
+        params += (consulta,) * BUSCA_DA_FONTE[fonte].count('?')
+    return _sql_forma(forma, fonte, alias_divisao), params
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_SQL)
+def _sql_forma(forma: Tuple, fonte: str, alias_divisao: Optional[str]) -> str:
+    """Monta (uma vez por forma) a cláusula WHERE de um filtro."""
+    clausulas = []
+    
+    for criterio in forma:
+        if isinstance(criterio, tuple):
+            nome, quantidade = criterio
+            coluna = 'c.status' if nome == 'status' else 'c.categoria_id'
+            if quantidade == 1:
+                clausulas.append(f"{coluna} = ?")
+            else:
+                clausulas.append(f"{coluna} IN ({', '.join('?' * quantidade)})")
+        elif criterio == 'pessoa':
+            if alias_divisao:
+                clausulas.append(f"{alias_divisao}.pessoa_id = ?")
+            else:
+                clausulas.append(
+                    f"EXISTS (SELECT 1 FROM {DIVISOES_DA_FONTE[fonte]} fd "
+                    f"WHERE fd.conta_id = c.id AND fd.pessoa_id = ?)"
+                )
+        elif criterio == 'data_inicio':
+            clausulas.append("c.data_vencimento >= ?")
+        elif criterio == 'data_fim':
+            clausulas.append("c.data_vencimento < ?")
+        elif criterio == 'valor_min':
+            clausulas.append("c.valor_total >= ?")
+        elif criterio == 'valor_max':
+            clausulas.append("c.valor_total <= ?")
+        elif criterio == 'parceladas':
+            clausulas.append("c.total_parcelas > 1")
+        elif criterio == 'texto':
+            clausulas.append(BUSCA_DA_FONTE[fonte])
+    
+    return " AND ".join(clausulas) if clausulas else "1=1"
+
+
+def _normalizar(valores) -> tuple:
+    """Converte um valor ou coleção em tupla ordenada, sem repetidos nem vazios."""
+    if valores is None or isinstance(valores, (str, int)):
+        valores = (valores,)
+    return tuple(sorted({v for v in valores if v not in (None, '')}))
@@ -0,0 +1,62 @@
+"""
+Mapa de identidade de uma unidade de trabalho.
+
+Dentro de Database.unidade_de_trabalho(), cada entidade lida por ID nos
+repositories (conta, pessoa, categoria, divisões de uma conta) é carregada
+do banco uma única vez: as leituras seguintes devolvem o mesmo objeto.
+As escritas feitas na unidade descartam na hora as entradas afetadas,
+pelos mesmos eventos que os repositories publicam (sem esperar o commit).
+"""
+
+from typing import Any, Callable, Dict, Tuple
+
+from .eventos import (
+    Evento, ContaAlterada, DivisaoAlterada, PessoaAlterada, CategoriaAlterada
+)
+
+# Entradas descartadas por cada tipo de evento: (tipo de entidade, pelos IDs
+# do evento?). Sem usar os IDs, todas as entradas do tipo são descartadas.
+DESCARTES = {
+    ContaAlterada: (('conta', True), ('divisoes', True)),
+    DivisaoAlterada: (('divisoes', True),),
+    PessoaAlterada: (('pessoa', True), ('divisoes', False)),
+    CategoriaAlterada: (('categoria', True), ('conta', False)),
+}
+
+
+class MapaIdentidade:
+    """Entidades já carregadas, por (tipo, id)."""
+    
+    def __init__(self):
+        self._entidades: Dict[Tuple[str, Any], Any] = {}
+        self.acertos = 0
+    
+    def obter(self, tipo: str, id: Any, carregar: Callable[[], Any]) -> Any:
+        """Retorna a entidade carregada (inclusive None) ou a carrega."""
+        chave = (tipo, id)
+        if chave in self._entidades:
+            self.acertos += 1
+            return self._entidades[chave]
+        
+        entidade = self._entidades[chave] = carregar()
+        return entidade
+    
+    def descartar(self, evento: Evento):
+        """Descarta as entradas afetadas por uma escrita."""
+        descartes = next(
+            (DESCARTES[tipo] for tipo in type(evento).__mro__ if tipo in DESCARTES), None
+        )
+        if descartes is None:
+            self.limpar()
+            return
+        
+        for tipo, pelos_ids in descartes:
+            if pelos_ids and evento.ids is not None:
+                for id in evento.ids:
+                    self._entidades.pop((tipo, id), None)
+            else:
+                for chave in [c for c in self._entidades if c[0] == tipo]:
+                    del self._entidades[chave]
+    
+    def limpar(self):
+        self._entidades.clear()
@@ -0,0 +1,297 @@
+"""
+Instrumentação das consultas - tempo, execuções e linhas por comando SQL.
+
+A conexão do Database é criada com ConexaoInstrumentada, cujos cursores
+medem cada comando do execute até a última linha lida. Assim todas as
+consultas são medidas, inclusive as feitas diretamente com conn.execute
+nos repositories. As métricas são agrupadas pelo texto do comando (com os
+espaços normalizados), o que mostra quantas vezes cada consulta roda por
+tela e onde está o tempo gasto (ex: uma consulta repetida por linha).
+
+Comandos acima do limite de consulta lenta (settings.database) ficam
+registrados com o EXPLAIN QUERY PLAN em um log limitado.
+"""
+
+import json
+import logging
+import sqlite3
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from src.config.constants import AMOSTRAS_LATENCIA, MAX_CONSULTAS_LENTAS
+
+logger = logging.getLogger(__name__)
+
+# Linhas lidas por vez ao iterar diretamente sobre um cursor
+LOTE_ITERACAO = 256
+
+
+@dataclass
+class MetricaConsulta:
+    """Métricas acumuladas de um comando SQL."""
+    sql: str
+    execucoes: int = 0
+    tempo_total: float = 0.0  # segundos
+    linhas: int = 0
+    tempos: deque = field(default_factory=lambda: deque(maxlen=AMOSTRAS_LATENCIA))
+    
+    def percentil(self, p: float) -> float:
+        """Latência (segundos) do percentil p das últimas execuções."""
+        if not self.tempos:
+            return 0.0
+        ordenados = sorted(self.tempos)
+        return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+    
+    def to_dict(self) -> dict:
+        return {
+            'sql': self.sql,
+            'execucoes': self.execucoes,
+            'tempo_total_ms': round(self.tempo_total * 1000, 3),
+            'tempo_medio_ms': round(self.tempo_total * 1000 / self.execucoes, 3),
+            'p50_ms': round(self.percentil(50) * 1000, 3),
+            'p95_ms': round(self.percentil(95) * 1000, 3),
+            'p99_ms': round(self.percentil(99) * 1000, 3),
+            'linhas': self.linhas,
+        }
+
+
+@dataclass
+class ContagemConsultas:
+    """Comandos e usos de conexão contados por Database.contar_consultas()."""
+    comandos: List[str] = field(default_factory=list)
+    conexoes: int = 0
+    
+    @property
+    def consultas(self) -> int:
+        return len(self.comandos)
+
+
+def orcamento_consultas(maximo: int):
+    """
+    Declara quantos comandos SQL um método de service (ou o carregar() de
+    uma página) pode executar. Não altera o método: o orçamento é conferido
+    por src/verificacao_orcamento.py.
+    """
+    def decorador(funcao):
+        funcao.orcamento_consultas = maximo
+        return funcao
+    return decorador
+
+
+class EstatisticasConsultas:
+    """Coleta das métricas de consulta de uma conexão."""
+    
+    def __init__(self, limite_lenta_ms: float):
+        self.limite_lenta_ms = limite_lenta_ms
+        self.metricas: Dict[str, MetricaConsulta] = {}
+        self.lentas: deque = deque(maxlen=MAX_CONSULTAS_LENTAS)
+        self.execucoes = 0
+        self.tempo_total = 0.0
+        self.iniciado_em = datetime.now()
+    
+    def registrar(self, conn: sqlite3.Connection, sql: str, params,
+                  duracao: float, linhas: int):
+        """Registra uma execução (duração em segundos)."""
+        chave = _normalizar_sql(sql)
+        metrica = self.metricas.get(chave)
+        if metrica is None:
+            metrica = self.metricas[chave] = MetricaConsulta(chave)
+        
+        metrica.execucoes += 1
+        metrica.tempo_total += duracao
+        metrica.linhas += linhas
+        metrica.tempos.append(duracao)
+        self.execucoes += 1
+        self.tempo_total += duracao
+        
+        if duracao * 1000 >= self.limite_lenta_ms:
+            self._registrar_lenta(conn, chave, sql, params, duracao, linhas)
+    
+    def _registrar_lenta(self, conn, chave: str, sql: str, params,
+                         duracao: float, linhas: int):
+        plano = _plano_consulta(conn, sql, params)
+        self.lentas.append({
+            'quando': datetime.now().isoformat(timespec='seconds'),
+            'sql': chave,
+            'parametros': _parametros_json(params),
+            'duracao_ms': round(duracao * 1000, 3),
+            'linhas': linhas,
+            'plano': plano,
+        })
+        logger.warning(
+            "Consulta lenta (%.1f ms, %d linhas): %s\n    %s",
+            duracao * 1000, linhas, chave, "\n    ".join(plano)
+        )
+    
+    def resumo(self) -> List[dict]:
+        """Métricas por comando, do maior para o menor tempo total."""
+        metricas = sorted(self.metricas.values(), key=lambda m: m.tempo_total, reverse=True)
+        return [m.to_dict() for m in metricas]
+    
+    def totais(self) -> dict:
+        """Totais desde o início (ou da última limpeza) da coleta."""
+        return {
+            'desde': self.iniciado_em.isoformat(timespec='seconds'),
+            'execucoes': self.execucoes,
+            'comandos_distintos': len(self.metricas),
+            'tempo_total_ms': round(self.tempo_total * 1000, 3),
+            'consultas_lentas': len(self.lentas),
+            'limite_lenta_ms': self.limite_lenta_ms,
+        }
+    
+    def limpar(self):
+        """Zera as métricas e o log de consultas lentas."""
+        self.metricas.clear()
+        self.lentas.clear()
+        self.execucoes = 0
+        self.tempo_total = 0.0
+        self.iniciado_em = datetime.now()
+    
+    def exportar_json(self, caminho: Path) -> Path:
+        """Grava totais, métricas por comando e consultas lentas em JSON."""
+        dados = {
+            'totais': self.totais(),
+            'consultas': self.resumo(),
+            'lentas': list(self.lentas),
+        }
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        return caminho
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """
+    Cursor que mede cada comando. O tempo de um SELECT inclui a leitura
+    das linhas: a medição termina quando o resultado se esgota, quando o
+    cursor executa outro comando ou quando é fechado/descartado.
+    """
+    
+    _medicao: Optional[list] = None  # [sql, params, duração, linhas]
+    
+    def execute(self, sql, params=()):
+        self._concluir()
+        inicio = perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._iniciar(sql, params, perf_counter() - inicio)
+    
+    def executemany(self, sql, seq_params):
+        self._concluir()
+        inicio = perf_counter()
+        try:
+            return super().executemany(sql, seq_params)
+        finally:
+            # Sem parâmetros no registro: o plano não é gerado para lotes
+            self._iniciar(sql, None, perf_counter() - inicio)
+    
+    def fetchone(self):
+        inicio = perf_counter()
+        linha = super().fetchone()
+        self._ler(perf_counter() - inicio, linha is not None, linha is None)
+        return linha
+    
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        inicio = perf_counter()
+        linhas = super().fetchmany(tamanho)
+        self._ler(perf_counter() - inicio, len(linhas), len(linhas) < tamanho)
+        return linhas
+    
+    def fetchall(self):
+        inicio = perf_counter()
+        linhas = super().fetchall()
+        self._ler(perf_counter() - inicio, len(linhas), True)
+        return linhas
+    
+    def __iter__(self):
+        # Lê em lotes: medir linha a linha dobraria o custo da iteração
+        while True:
+            lote = self.fetchmany(LOTE_ITERACAO)
+            yield from lote
+            if len(lote) < LOTE_ITERACAO:
+                return
+    
+    def close(self):
+        self._concluir()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._concluir()
+        except Exception:
+            pass
+    
+    def _iniciar(self, sql, params, duracao: float):
+        if self.description is None:
+            # Comando sem resultado (DML/DDL): linhas afetadas
+            self.connection.estatisticas.registrar(
+                self.connection, sql, params, duracao, max(self.rowcount, 0)
+            )
+        else:
+            self._medicao = [sql, params, duracao, 0]
+    
+    def _ler(self, duracao: float, linhas: int, fim: bool):
+        medicao = self._medicao
+        if medicao is None:
+            return
+        medicao[2] += duracao
+        medicao[3] += linhas
+        if fim:
+            self._concluir()
+    
+    def _concluir(self):
+        medicao = self._medicao
+        if medicao is not None:
+            self._medicao = None
+            self.connection.estatisticas.registrar(self.connection, *medicao)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são medidos."""
+    
+    estatisticas: EstatisticasConsultas
+    
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+    
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+    
+    def executemany(self, sql, seq_params):
+        return self.cursor().executemany(sql, seq_params)
+
+
+@lru_cache(maxsize=1024)
+def _normalizar_sql(sql: str) -> str:
+    """Texto do comando em uma linha (chave das métricas)."""
+    return ' '.join(sql.split())
+
+
+def _plano_consulta(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+    """EXPLAIN QUERY PLAN do comando, sem passar pela instrumentação."""
+    if params is None:
+        return []
+    try:
+        cursor = sqlite3.Connection.cursor(conn)
+        cursor.row_factory = None
+        return [linha[3] for linha in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    except sqlite3.Error:
+        return []
+
+
+def _parametros_json(params):
+    """Parâmetros do comando em formato serializável."""
+    def valor(v):
+        return v if v is None or isinstance(v, (int, float, str)) else repr(v)
+    
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {chave: valor(v) for chave, v in params.items()}
+    return [valor(v) for v in params]
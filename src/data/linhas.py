@@ -0,0 +1,74 @@
+"""
+Linhas de resultado leves - tuplas com acesso por nome de coluna.
+
+Cada formato de consulta (a sequência de colunas do cursor) gera uma única
+subclasse de Linha com o mapa coluna -> posição. As linhas em si são apenas
+tuplas: não há um dict por registro, o que reduz alocação e memória nas
+listagens grandes. A interface de leitura é a mesma de um dict
+(linha['descricao'], linha.get('status')), além de linha.descricao.
+"""
+
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, Tuple
+
+from src.config.constants import TAMANHO_CACHE_SQL
+
+
+class Linha(tuple):
+    """Registro somente leitura com acesso por posição, chave ou atributo."""
+    
+    __slots__ = ()
+    _colunas: Tuple[str, ...] = ()
+    _indices: Dict[str, int] = {}
+    
+    def __getitem__(self, chave):
+        if isinstance(chave, str):
+            return tuple.__getitem__(self, self._indices[chave])
+        return tuple.__getitem__(self, chave)
+    
+    def __getattr__(self, nome: str) -> Any:
+        try:
+            return tuple.__getitem__(self, self._indices[nome])
+        except KeyError:
+            raise AttributeError(nome) from None
+    
+    def __contains__(self, chave) -> bool:
+        return chave in self._indices
+    
+    def get(self, chave: str, padrao: Any = None) -> Any:
+        indice = self._indices.get(chave)
+        return padrao if indice is None else tuple.__getitem__(self, indice)
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self._colunas
+    
+    def values(self) -> tuple:
+        return tuple(self)
+    
+    def items(self):
+        return zip(self._colunas, self)
+    
+    def to_dict(self) -> dict:
+        return dict(zip(self._colunas, self))
+    
+    def __repr__(self) -> str:
+        return f"Linha({self.to_dict()!r})"
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_SQL)
+def tipo_linha(colunas: Tuple[str, ...]) -> type:
+    """
+    Retorna (criando uma vez por formato) a classe de linha das colunas.
+    Colunas com nome de identificador viram propriedades posicionais,
+    como em namedtuple; as demais ficam acessíveis por chave.
+    """
+    atributos = {
+        '__slots__': (),
+        '_colunas': colunas,
+        '_indices': {nome: i for i, nome in enumerate(colunas)},
+    }
+    for i, nome in enumerate(colunas):
+        if nome.isidentifier() and not hasattr(Linha, nome):
+            atributos[nome] = property(itemgetter(i))
+    return type('Linha', (Linha,), atributos)
@@ -0,0 +1,111 @@
+"""
+Dados de referência (categorias e pessoas) mantidos em memória.
+
+São tabelas pequenas, lidas a cada diálogo aberto e a cada validação,
+mas que quase nunca mudam. O registro carrega cada tabela uma vez, monta
+os índices por ID e por nome e descarta a tabela quando um evento de
+alteração dela chega (CategoriaAlterada/PessoaAlterada). Com uma transação
+aberta, os eventos ainda não chegaram: a leitura vai direto ao banco.
+
+Os dicts retornados são compartilhados: não devem ser alterados.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .database import get_database
+from .eventos import CategoriaAlterada, Evento, PessoaAlterada
+
+
+@dataclass
+class IndiceReferencias:
+    """Registros de uma tabela de referência, na ordem por nome, e seus índices."""
+    registros: List[dict]
+    por_id: Dict[int, dict] = field(init=False)
+    por_nome: Dict[str, int] = field(init=False)
+    
+    def __post_init__(self):
+        self.por_id = {r['id']: r for r in self.registros}
+        self.por_nome = {r['nome']: r['id'] for r in self.registros}
+
+
+def rotulo_categoria(categoria: dict) -> str:
+    """Texto da categoria nas listas de seleção ("<ícone> <nome>")."""
+    return f"{categoria['icone']} {categoria['nome']}"
+
+
+class RegistroReferencias:
+    """Categorias e pessoas em memória, com índices por ID e por nome."""
+    
+    # Tabela de cada tipo de registro e o evento que a invalida
+    TABELAS = {'categorias': CategoriaAlterada, 'pessoas': PessoaAlterada}
+    
+    def __init__(self):
+        self.db = get_database()
+        self._indices: Dict[str, IndiceReferencias] = {}
+        for tabela, evento in self.TABELAS.items():
+            self.db.eventos.inscrever(evento, self._invalidador(tabela))
+    
+    # ==================== CATEGORIAS ====================
+    
+    def categorias(self) -> List[dict]:
+        """Todas as categorias, ordenadas por nome."""
+        return self._indice('categorias').registros
+    
+    def categoria(self, id: int) -> Optional[dict]:
+        return self._indice('categorias').por_id.get(id)
+    
+    def id_categoria(self, nome: str) -> Optional[int]:
+        return self._indice('categorias').por_nome.get(nome)
+    
+    def id_categoria_por_rotulo(self, rotulo: str) -> Optional[int]:
+        """ID da categoria a partir do texto exibido (ver rotulo_categoria)."""
+        icone, _, nome = rotulo.partition(' ')
+        categoria = self.categoria(self.id_categoria(nome))
+        return categoria['id'] if categoria and categoria['icone'] == icone else None
+    
+    # ==================== PESSOAS ====================
+    
+    def pessoas(self, apenas_ativas: bool = True) -> List[dict]:
+        """Pessoas ordenadas por nome (por padrão, só as ativas)."""
+        pessoas = self._indice('pessoas').registros
+        return [p for p in pessoas if p['ativo']] if apenas_ativas else pessoas
+    
+    def pessoa(self, id: int) -> Optional[dict]:
+        return self._indice('pessoas').por_id.get(id)
+    
+    def id_pessoa(self, nome: str) -> Optional[int]:
+        return self._indice('pessoas').por_nome.get(nome)
+    
+    # ==================== CARGA ====================
+    
+    def limpar(self):
+        self._indices.clear()
+    
+    def _indice(self, tabela: str) -> IndiceReferencias:
+        if self.db.alteracoes_pendentes:
+            return self._carregar(tabela)
+        
+        indice = self._indices.get(tabela)
+        if indice is None:
+            indice = self._indices[tabela] = self._carregar(tabela)
+        return indice
+    
+    def _carregar(self, tabela: str) -> IndiceReferencias:
+        return IndiceReferencias(self.db.fetch_all(f"SELECT * FROM {tabela} ORDER BY nome"))
+    
+    def _invalidador(self, tabela: str):
+        def invalidar(evento: Evento):
+            self._indices.pop(tabela, None)
+        return invalidar
+
+
+_registro: Optional[RegistroReferencias] = None
+
+
+def get_referencias() -> RegistroReferencias:
+    """Retorna o registro único de dados de referência."""
+    global _registro
+    if _registro is None:
+        _registro = RegistroReferencias()
+    return _registro
@@ -3,11 +3,20 @@ Repositories - Padrão Repository para acesso a dados.
 Cada repository é responsável por uma entidade específica.
 """
 
+import json
 from abc import ABC, abstractmethod
-from typing import List, Optional, TypeVar, Generic
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, TypeVar, Generic, Tuple, Iterator
 from datetime import datetime
 
 from .database import get_database
+from .filtros import FiltroContas, compilar_filtro, projecao_contas, CAMPOS_LISTAGEM
+from .linhas import Linha
+from .eventos import (
+    Evento, ContaAlterada, DivisaoAlterada, DivisaoPaga, PessoaAlterada,
+    CategoriaAlterada, periodos_de, periodos_plano, periodos_recorrencia, ids_plano
+)
+from src.config.constants import TAMANHO_PAGINA, TAMANHO_LOTE, MAX_PARCELAS, LINHAS_POR_INSERT
 
 T = TypeVar('T')
 
@@ -18,6 +27,38 @@ class BaseRepository(ABC, Generic[T]):
     def __init__(self):
         self.db = get_database()
     
+    def _publicar(self, evento: Evento):
+        """Publica a alteração (entregue aos assinantes após o commit)."""
+        self.db.publicar(evento)
+    
+    def _por_id(self, tipo: str, id, carregar: Callable[[], T]) -> T:
+        """
+        Leitura por ID: dentro de uma unidade de trabalho, a entidade é
+        carregada uma vez e as leituras seguintes vêm do mapa de identidade.
+        """
+        mapa = self.db.mapa_identidade
+        return carregar() if mapa is None else mapa.obter(tipo, id, carregar)
+    
+    @staticmethod
+    def _inserir_linhas(conn, sql: str, colunas: Tuple[str, ...],
+                        linhas: List[dict], params: tuple = ()) -> List:
+        """
+        Executa sql (um INSERT com VALUES {}) com várias linhas por
+        comando, em lotes de LINHAS_POR_INSERT. Ao contrário de executemany,
+        é um comando por lote e devolve as linhas de RETURNING. Colunas
+        ausentes em uma linha são gravadas como NULL; params são os
+        parâmetros do restante do comando, depois dos de VALUES.
+        """
+        marcadores = f"({', '.join('?' * len(colunas))})"
+        resultado = []
+        for inicio in range(0, len(linhas), LINHAS_POR_INSERT):
+            lote = linhas[inicio:inicio + LINHAS_POR_INSERT]
+            resultado.extend(conn.execute(
+                sql.format(', '.join([marcadores] * len(lote))),
+                [linha.get(coluna) for linha in lote for coluna in colunas] + list(params)
+            ).fetchall())
+        return resultado
+    
     @abstractmethod
     def get_by_id(self, id: int) -> Optional[T]:
         """Obtém um registro por ID."""
@@ -48,9 +89,9 @@ class PessoaRepository(BaseRepository):
     """Repository para entidade Pessoa."""
     
     def get_by_id(self, id: int) -> Optional[dict]:
-        return self.db.fetch_one(
+        return self._por_id('pessoa', id, lambda: self.db.fetch_one(
             "SELECT * FROM pessoas WHERE id = ?", (id,)
-        )
+        ))
     
     def get_all(self, apenas_ativas: bool = True) -> List[dict]:
         query = "SELECT * FROM pessoas"
@@ -65,10 +106,12 @@ class PessoaRepository(BaseRepository):
         )
     
     def create(self, nome: str, cor: str = '#3498db') -> int:
-        return self.db.insert(
+        id = self.db.insert(
             "INSERT INTO pessoas (nome, cor) VALUES (?, ?)",
             (nome, cor)
         )
+        self._publicar(PessoaAlterada(frozenset({id})))
+        return id
     
     def update(self, id: int, nome: str, cor: str) -> bool:
         with self.db.get_connection() as conn:
@@ -76,6 +119,7 @@ class PessoaRepository(BaseRepository):
                 "UPDATE pessoas SET nome = ?, cor = ? WHERE id = ?",
                 (nome, cor, id)
             )
+            self._publicar(PessoaAlterada(frozenset({id})))
         return True
     
     def delete(self, id: int) -> bool:
@@ -85,6 +129,7 @@ class PessoaRepository(BaseRepository):
                 "UPDATE pessoas SET ativo = 0 WHERE id = ?",
                 (id,)
             )
+            self._publicar(PessoaAlterada(frozenset({id})))
         return True
     
     def reativar(self, id: int) -> bool:
@@ -93,6 +138,7 @@ class PessoaRepository(BaseRepository):
                 "UPDATE pessoas SET ativo = 1 WHERE id = ?",
                 (id,)
             )
+            self._publicar(PessoaAlterada(frozenset({id})))
         return True
 
 
@@ -100,9 +146,9 @@ class CategoriaRepository(BaseRepository):
     """Repository para entidade Categoria."""
     
     def get_by_id(self, id: int) -> Optional[dict]:
-        return self.db.fetch_one(
+        return self._por_id('categoria', id, lambda: self.db.fetch_one(
             "SELECT * FROM categorias WHERE id = ?", (id,)
-        )
+        ))
     
     def get_all(self) -> List[dict]:
         return self.db.fetch_all(
@@ -115,10 +161,12 @@ class CategoriaRepository(BaseRepository):
         )
     
     def create(self, nome: str, icone: str = '📦') -> int:
-        return self.db.insert(
+        id = self.db.insert(
             "INSERT INTO categorias (nome, icone) VALUES (?, ?)",
             (nome, icone)
         )
+        self._publicar(CategoriaAlterada(frozenset({id})))
+        return id
     
     def update(self, id: int, nome: str, icone: str) -> bool:
         with self.db.get_connection() as conn:
@@ -126,11 +174,34 @@ class CategoriaRepository(BaseRepository):
                 "UPDATE categorias SET nome = ?, icone = ? WHERE id = ?",
                 (nome, icone, id)
             )
+            self._publicar(CategoriaAlterada(frozenset({id})))
         return True
     
     def delete(self, id: int) -> bool:
         with self.db.get_connection() as conn:
             conn.execute("DELETE FROM categorias WHERE id = ?", (id,))
+            self._publicar(CategoriaAlterada(frozenset({id})))
+        return True
+
+
+class MetadadosRepository:
+    """Repository para valores internos chave/valor (tabela metadados)."""
+    
+    def __init__(self):
+        self.db = get_database()
+    
+    def get(self, chave: str, padrao: Optional[str] = None) -> Optional[str]:
+        row = self.db.fetch_one(
+            "SELECT valor FROM metadados WHERE chave = ?", (chave,)
+        )
+        return row['valor'] if row else padrao
+    
+    def set(self, chave: str, valor: str) -> bool:
+        with self.db.get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadados (chave, valor) VALUES (?, ?)",
+                (chave, valor)
+            )
         return True
 
 
@@ -138,40 +209,217 @@ class ContaRepository(BaseRepository):
     """Repository para entidade Conta."""
     
     def get_by_id(self, id: int) -> Optional[dict]:
-        return self.db.fetch_one("""
+        return self._por_id('conta', id, lambda: self.db.fetch_one("""
             SELECT c.*, cat.nome as categoria_nome, cat.icone as categoria_icone
-            FROM contas c
+            FROM v_contas c
             LEFT JOIN categorias cat ON c.categoria_id = cat.id
             WHERE c.id = ?
-        """, (id,))
+        """, (id,)))
     
-    def get_all(self, status: str = None, mes: int = None, ano: int = None) -> List[dict]:
-        query = """
-            SELECT c.*, cat.nome as categoria_nome, cat.icone as categoria_icone
-            FROM contas c
-            LEFT JOIN categorias cat ON c.categoria_id = cat.id
-            WHERE 1=1
+    def get_all(self, status: str = None, mes: int = None, ano: int = None,
+                campos: Tuple[str, ...] = None, limite: int = None) -> List[Linha]:
+        return self.filtrar(FiltroContas.do_mes(mes, ano, status=status), campos, limite)
+    
+    def filtrar(self, filtro: FiltroContas = None, campos: Tuple[str, ...] = None,
+                limite: int = None) -> List[Linha]:
         """
-        params = []
+        Lista as contas (físicas e virtuais) que atendem ao filtro, das mais
+        recentes para as mais antigas.
+        campos restringe as colunas lidas (ver CAMPOS_LISTAGEM)
+        e limite é aplicado no próprio SQL.
+        """
+        return self.db.fetch_linhas(*self._consulta_filtro(filtro, campos, limite))
+    
+    def iterar(self, filtro: FiltroContas = None, campos: Tuple[str, ...] = None,
+               lote: int = TAMANHO_LOTE) -> Iterator[Linha]:
+        """Como filtrar, mas lendo as contas em lotes (memória constante)."""
+        return self.db.iter_query(*self._consulta_filtro(filtro, campos), lote)
+    
+    # Colunas de divisão acrescentadas às de CAMPOS_LISTAGEM em iterar_com_divisoes
+    CAMPOS_DIVISAO = ('divisao_pessoa_id', 'divisao_valor', 'divisao_pago')
+    
+    def iterar_com_divisoes(self, filtro: FiltroContas = None,
+                            lote: int = TAMANHO_LOTE) -> Iterator[Linha]:
+        """
+        Percorre, em uma única consulta, as contas do filtro junto com as
+        suas divisões: uma linha por divisão (CAMPOS_LISTAGEM seguidos de
+        CAMPOS_DIVISAO), ou uma linha com divisão nula para a conta sem
+        divisões. As linhas de uma conta vêm juntas, na ordem de filtrar.
         
-        if status:
-            query += " AND c.status = ?"
-            params.append(status)
+        As divisões das parcelas virtuais vêm direto do plano, sem passar
+        pela view divisoes_virtuais (que expandiria os planos de novo).
+        """
+        colunas, _ = projecao_contas(CAMPOS_LISTAGEM)
+        partes = []
+        params = ()
+        for fonte, divisoes in (
+            ('contas', "LEFT JOIN divisao_contas dc ON dc.conta_id = c.id"),
+            ('contas_virtuais', "LEFT JOIN planos_parcela_divisoes dc ON dc.plano_id = c.plano_id"),
+        ):
+            where, params_fonte = compilar_filtro(filtro, fonte)
+            pago = "dc.pago" if fonte == 'contas' else "0"
+            partes.append(f"""
+                SELECT {colunas}, dc.pessoa_id AS divisao_pessoa_id,
+                       dc.valor AS divisao_valor, {pago} AS divisao_pago
+                FROM {fonte} c
+                LEFT JOIN categorias cat ON c.categoria_id = cat.id
+                {divisoes}
+                WHERE {where}
+            """)
+            params += params_fonte
         
-        if mes and ano:
-            query += " AND strftime('%m', c.data_vencimento) = ? AND strftime('%Y', c.data_vencimento) = ?"
-            params.append(f"{mes:02d}")
-            params.append(str(ano))
+        return self.db.iter_query(f"""
+            SELECT * FROM ({" UNION ALL ".join(partes)})
+            ORDER BY data_vencimento DESC, criado_em DESC, id DESC
+        """, params, lote)
+    
+    def _consulta_filtro(self, filtro: FiltroContas, campos: Tuple[str, ...] = None,
+                         limite: int = None) -> Tuple[str, tuple]:
+        """
+        Monta o SELECT de filtrar/iterar. Com limite, cada fonte é lida já
+        ordenada e com o próprio LIMIT (o que a view v_contas não permite)
+        e só as linhas necessárias chegam à ordenação final.
+        """
+        campos = tuple(campos) if campos else CAMPOS_LISTAGEM
+        colunas, precisa_categoria = projecao_contas(campos)
+        join = "LEFT JOIN categorias cat ON c.categoria_id = cat.id" if precisa_categoria else ""
         
-        query += " ORDER BY c.data_vencimento DESC, c.criado_em DESC"
+        if limite is None:
+            where, params = compilar_filtro(filtro)
+            return f"""
+                SELECT {colunas}
+                FROM v_contas c
+                {join}
+                WHERE {where}
+                ORDER BY c.data_vencimento DESC, c.criado_em DESC, c.id DESC
+            """, params
         
-        return self.db.fetch_all(query, tuple(params))
+        partes = []
+        params = ()
+        for fonte in self.FONTES:
+            where, params_fonte = compilar_filtro(filtro, fonte)
+            partes.append(f"""
+                SELECT * FROM (
+                    SELECT {colunas}, c.data_vencimento AS _ordem_data,
+                           c.criado_em AS _ordem_criacao, c.id AS _ordem_id
+                    FROM {fonte} c
+                    {join}
+                    WHERE {where}
+                    ORDER BY c.data_vencimento DESC, c.criado_em DESC, c.id DESC
+                    LIMIT ?
+                )
+            """)
+            params += params_fonte + (limite,)
+        
+        return f"""
+            SELECT {", ".join(campos)} FROM ({" UNION ALL ".join(partes)})
+            ORDER BY _ordem_data DESC, _ordem_criacao DESC, _ordem_id DESC
+            LIMIT ?
+        """, params + (limite,)
+    
+    # Fontes de contas lidas separadamente nas listagens paginadas
+    FONTES = ('contas', 'contas_virtuais')
+    
+    def get_pagina(self, filtro: FiltroContas = None,
+                   limite: int = TAMANHO_PAGINA, cursor: Tuple = None,
+                   anterior: bool = False) -> dict:
+        """
+        Obtém uma página de contas por keyset (data_vencimento DESC, id DESC).
+        
+        cursor é a chave (data_vencimento, id) de uma ponta da página atual:
+        a última linha para avançar, a primeira (com anterior=True) para voltar.
+        Cada fonte (contas e parcelas virtuais) é lida já ordenada e com LIMIT,
+        então o custo de uma página não depende de quantas páginas existem.
+        """
+        ordem = "ASC" if anterior else "DESC"
+        colunas, _ = projecao_contas()
+        
+        linhas = []
+        for condicao, params_cursor in self._segmentos_cursor(cursor, anterior):
+            segmento = []
+            for fonte in self.FONTES:
+                where, params = compilar_filtro(filtro, fonte)
+                segmento.extend(self.db.fetch_linhas(f"""
+                    SELECT {colunas}
+                    FROM {fonte} c
+                    LEFT JOIN categorias cat ON c.categoria_id = cat.id
+                    WHERE {where} AND {condicao}
+                    ORDER BY c.data_vencimento {ordem}, c.id {ordem}
+                    LIMIT ?
+                """, params + tuple(params_cursor) + (limite + 1 - len(linhas),)))
+            
+            segmento.sort(key=lambda c: (c['data_vencimento'] or '', c['id']), reverse=not anterior)
+            linhas.extend(segmento)
+            if len(linhas) > limite:
+                break
+        
+        tem_mais = len(linhas) > limite
+        itens = linhas[:limite]
+        if anterior:
+            itens.reverse()
+        
+        return {
+            'itens': itens,
+            'total': self.contar(filtro),
+            'cursor_inicio': (itens[0]['data_vencimento'], itens[0]['id']) if itens else None,
+            'cursor_fim': (itens[-1]['data_vencimento'], itens[-1]['id']) if itens else None,
+            'tem_anterior': tem_mais if anterior else cursor is not None,
+            'tem_proxima': cursor is not None if anterior else tem_mais
+        }
+    
+    def contar(self, filtro: FiltroContas = None) -> int:
+        """Conta as contas (físicas e virtuais) de um filtro."""
+        subconsultas = []
+        params = ()
+        for fonte in self.FONTES:
+            where, params_fonte = compilar_filtro(filtro, fonte)
+            subconsultas.append(f"(SELECT COUNT(*) FROM {fonte} c WHERE {where})")
+            params += params_fonte
+        
+        row = self.db.fetch_one(f"SELECT {' + '.join(subconsultas)} as total", params)
+        return row['total'] if row else 0
+    
+    def buscar(self, texto: str, filtro: FiltroContas = None,
+               limite: int = TAMANHO_PAGINA, cursor: Tuple = None,
+               anterior: bool = False) -> dict:
+        """
+        Busca contas pelas palavras da descrição/observação (índice FTS5),
+        combinadas aos demais critérios do filtro.
+        Retorna uma página no mesmo formato de get_pagina.
+        """
+        filtro = replace(filtro or FiltroContas(), texto=texto)
+        return self.get_pagina(filtro, limite, cursor, anterior)
+    
+    def _segmentos_cursor(self, cursor: Tuple, anterior: bool) -> List[Tuple[str, list]]:
+        """
+        Condições de keyset, em ordem de leitura, para as linhas depois
+        (ou antes, com anterior=True) do cursor.
+        Contas sem vencimento ficam no fim da ordenação DESC e são lidas em
+        um segmento separado, para que o segmento principal seja um seek
+        no índice de data_vencimento.
+        """
+        if cursor is None:
+            segmentos = [("c.data_vencimento IS NOT NULL", []), ("c.data_vencimento IS NULL", [])]
+            return list(reversed(segmentos)) if anterior else segmentos
+        
+        data, id = cursor
+        
+        if data is None:
+            if anterior:
+                return [("c.data_vencimento IS NULL AND c.id > ?", [id]),
+                        ("c.data_vencimento IS NOT NULL", [])]
+            return [("c.data_vencimento IS NULL AND c.id < ?", [id])]
+        
+        if anterior:
+            return [("(c.data_vencimento, c.id) > (?, ?)", [data, id])]
+        return [("(c.data_vencimento, c.id) < (?, ?)", [data, id]),
+                ("c.data_vencimento IS NULL", [])]
     
     def get_by_grupo(self, grupo_id: str) -> List[dict]:
         """Obtém todas as parcelas de um grupo."""
         return self.db.fetch_all("""
             SELECT c.*, cat.nome as categoria_nome, cat.icone as categoria_icone
-            FROM contas c
+            FROM v_contas c
             LEFT JOIN categorias cat ON c.categoria_id = cat.id
             WHERE c.grupo_parcela_id = ?
             ORDER BY c.parcela_atual
@@ -180,14 +428,44 @@ class ContaRepository(BaseRepository):
     def create(self, descricao: str, valor_total: float, parcela_atual: int = 1,
                total_parcelas: int = 1, data_vencimento: str = None,
                categoria_id: int = None, observacao: str = None,
-               grupo_parcela_id: str = None) -> int:
-        return self.db.insert("""
+               grupo_parcela_id: str = None, pagador_id: int = None) -> int:
+        id = self.db.insert("""
             INSERT INTO contas 
             (descricao, valor_total, parcela_atual, total_parcelas, 
-             data_vencimento, categoria_id, observacao, grupo_parcela_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+             data_vencimento, categoria_id, observacao, grupo_parcela_id, pagador_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (descricao, valor_total, parcela_atual, total_parcelas,
-              data_vencimento, categoria_id, observacao, grupo_parcela_id))
+              data_vencimento, categoria_id, observacao, grupo_parcela_id, pagador_id))
+        self._publicar(ContaAlterada(frozenset({id}), periodos_de([data_vencimento])))
+        return id
+    
+    COLUNAS_LOTE = (
+        'descricao', 'valor_total', 'parcela_atual', 'total_parcelas', 'data_vencimento',
+        'categoria_id', 'observacao', 'grupo_parcela_id', 'pagador_id'
+    )
+    
+    def create_batch(self, contas: List[dict]) -> List[int]:
+        """
+        Cria múltiplas contas com INSERTs de várias linhas (observacao,
+        grupo_parcela_id e pagador_id são opcionais em cada conta). Retorna
+        os IDs gerados, na mesma ordem da lista recebida.
+        """
+        if not contas:
+            return []
+        
+        with self.db.get_connection() as conn:
+            rows = self._inserir_linhas(conn, f"""
+                INSERT INTO contas ({', '.join(self.COLUNAS_LOTE)})
+                VALUES {{}}
+                RETURNING id
+            """, self.COLUNAS_LOTE, contas)
+            # Os IDs crescem na ordem de VALUES; a de RETURNING não é garantida
+            ids = sorted(r[0] for r in rows)
+            self._publicar(ContaAlterada(
+                frozenset(ids), periodos_de(c['data_vencimento'] for c in contas)
+            ))
+        
+        return ids
     
     def update(self, id: int, **kwargs) -> bool:
         if not kwargs:
@@ -201,70 +479,283 @@ class ContaRepository(BaseRepository):
         valores.append(id)
         
         with self.db.get_connection() as conn:
-            conn.execute(
-                f"UPDATE contas SET {', '.join(campos)} WHERE id = ?",
+            datas = []
+            if 'data_vencimento' in kwargs:
+                # O mês antigo também muda (RETURNING só traz o valor novo)
+                datas = [r[0] for r in conn.execute(
+                    "SELECT data_vencimento FROM contas WHERE id = ?", (id,)
+                )]
+            rows = conn.execute(
+                f"UPDATE contas SET {', '.join(campos)} WHERE id = ? "
+                f"RETURNING data_vencimento",
                 tuple(valores)
-            )
+            ).fetchall()
+            if rows:
+                datas.extend(r[0] for r in rows)
+                self._publicar(ContaAlterada(frozenset({id}), periodos_de(datas)))
         return True
     
+    def update_by_grupo(self, grupo_id: str, a_partir_de_parcela: int, **kwargs) -> int:
+        """
+        Atualiza de uma vez as parcelas de um grupo a partir de uma parcela.
+        Retorna o número de linhas alteradas.
+        """
+        if not kwargs:
+            return 0
+        
+        campos = []
+        valores = []
+        for campo, valor in kwargs.items():
+            campos.append(f"{campo} = ?")
+            valores.append(valor)
+        valores.extend([grupo_id, a_partir_de_parcela])
+        
+        with self.db.get_connection() as conn:
+            rows = conn.execute(
+                f"UPDATE contas SET {', '.join(campos)} "
+                f"WHERE grupo_parcela_id = ? AND parcela_atual >= ? "
+                f"RETURNING id, data_vencimento",
+                tuple(valores)
+            ).fetchall()
+            self._publicar_contas(rows)
+            return len(rows)
+    
     def delete(self, id: int) -> bool:
         with self.db.get_connection() as conn:
-            conn.execute("DELETE FROM contas WHERE id = ?", (id,))
+            self._publicar_contas(conn.execute(
+                "DELETE FROM contas WHERE id = ? RETURNING id, data_vencimento", (id,)
+            ).fetchall())
         return True
     
     def delete_by_grupo(self, grupo_id: str) -> bool:
-        """Exclui todas as parcelas de um grupo."""
+        """Exclui todas as parcelas de um grupo (inclusive o plano de parcelas virtuais)."""
         with self.db.get_connection() as conn:
-            conn.execute(
-                "DELETE FROM contas WHERE grupo_parcela_id = ?",
+            self._publicar_contas(conn.execute(
+                "DELETE FROM contas WHERE grupo_parcela_id = ? RETURNING id, data_vencimento",
                 (grupo_id,)
-            )
+            ).fetchall())
+            for plano in conn.execute("""
+                DELETE FROM planos_parcela WHERE grupo_parcela_id = ?
+                RETURNING id, data_inicio, parcela_inicial, total_parcelas
+            """, (grupo_id,)).fetchall():
+                self._publicar(ContaAlterada(
+                    ids_plano(plano['id'], plano['parcela_inicial'], plano['total_parcelas']),
+                    periodos_plano(plano['data_inicio'], plano['parcela_inicial'],
+                                   plano['total_parcelas'])
+                ))
         return True
     
     def marcar_pago(self, id: int) -> bool:
         with self.db.get_connection() as conn:
-            conn.execute(
-                "UPDATE contas SET status = 'pago' WHERE id = ?",
+            self._publicar_contas(conn.execute(
+                "UPDATE contas SET status = 'pago' WHERE id = ? RETURNING id, data_vencimento",
                 (id,)
-            )
+            ).fetchall())
         return True
     
-    def get_resumo_geral(self, mes: int = None, ano: int = None) -> dict:
+    def marcar_pagas(self, filtro: FiltroContas) -> int:
+        """
+        Marca como pagas, com um único UPDATE, todas as contas pendentes
+        que atendem ao filtro. Retorna o número de contas alteradas.
+        """
+        where, params = compilar_filtro(filtro, 'contas')
+        
+        with self.db.get_connection() as conn:
+            rows = conn.execute(f"""
+                UPDATE contas AS c SET status = 'pago'
+                WHERE c.status != 'pago' AND {where}
+                RETURNING id, data_vencimento
+            """, params).fetchall()
+            self._publicar_contas(rows)
+            return len(rows)
+    
+    def marcar_pagas_grupo(self, grupo_id: str, ate_parcela: int) -> int:
+        """Quita as parcelas de um grupo até ate_parcela (inclusive)."""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                UPDATE contas SET status = 'pago'
+                WHERE grupo_parcela_id = ? AND parcela_atual <= ? AND status != 'pago'
+                RETURNING id, data_vencimento
+            """, (grupo_id, ate_parcela)).fetchall()
+            self._publicar_contas(rows)
+            return len(rows)
+    
+    def atualizar_atrasadas(self, hoje: str) -> Tuple[int, int]:
+        """
+        Marca como atrasadas as contas pendentes vencidas antes de hoje e
+        devolve para pendente as atrasadas cujo vencimento foi adiado.
+        Os dois UPDATEs usam o índice (status, data_vencimento), então só
+        as contas candidatas são visitadas.
+        Retorna (marcadas, revertidas).
+        """
+        with self.db.get_connection() as conn:
+            marcadas = conn.execute("""
+                UPDATE contas SET status = 'atrasado'
+                WHERE status = 'pendente' AND data_vencimento < ?
+                RETURNING id, data_vencimento
+            """, (hoje,)).fetchall()
+            revertidas = conn.execute("""
+                UPDATE contas SET status = 'pendente'
+                WHERE status = 'atrasado' AND data_vencimento >= ?
+                RETURNING id, data_vencimento
+            """, (hoje,)).fetchall()
+            self._publicar_contas(marcadas + revertidas)
+        return len(marcadas), len(revertidas)
+    
+    def _publicar_contas(self, rows: List):
+        """Publica ContaAlterada para linhas (id, data_vencimento) de RETURNING."""
+        if rows:
+            self._publicar(ContaAlterada(
+                frozenset(r[0] for r in rows), periodos_de(r[1] for r in rows)
+            ))
+    
+    def get_periodos_grupo(self, grupo_id: str, ate_parcela: int = None) -> List[Tuple[int, int]]:
+        """Lista os meses (mes, ano) em que vencem as parcelas de um grupo."""
         query = """
+            SELECT DISTINCT CAST(strftime('%m', data_vencimento) AS INTEGER) as mes,
+                            CAST(strftime('%Y', data_vencimento) AS INTEGER) as ano
+            FROM contas
+            WHERE grupo_parcela_id = ?
+        """
+        params = [grupo_id]
+        
+        if ate_parcela is not None:
+            query += " AND parcela_atual <= ?"
+            params.append(ate_parcela)
+        
+        return [(r['mes'], r['ano']) for r in self.db.fetch_all(query, tuple(params))]
+    
+    def get_resumo_geral(self, mes: int = None, ano: int = None) -> dict:
+        where, params = compilar_filtro(FiltroContas.do_mes(mes, ano))
+        query = f"""
             SELECT 
                 COUNT(*) as total_contas,
                 COALESCE(SUM(valor_total), 0) as valor_total,
                 COALESCE(SUM(CASE WHEN status = 'pago' THEN valor_total ELSE 0 END), 0) as valor_pago,
-                COALESCE(SUM(CASE WHEN status = 'pendente' THEN valor_total ELSE 0 END), 0) as valor_pendente
-            FROM contas WHERE 1=1
+                COALESCE(SUM(CASE WHEN status != 'pago' THEN valor_total ELSE 0 END), 0) as valor_pendente,
+                COALESCE(SUM(CASE WHEN status = 'atrasado' THEN valor_total ELSE 0 END), 0) as valor_atrasado
+            FROM v_contas c WHERE {where}
         """
-        params = []
         
-        if mes and ano:
-            query += " AND strftime('%m', data_vencimento) = ? AND strftime('%Y', data_vencimento) = ?"
-            params.append(f"{mes:02d}")
-            params.append(str(ano))
-        
-        return self.db.fetch_one(query, tuple(params)) or {}
+        return self.db.fetch_one(query, params) or {}
     
     def get_por_categoria(self, mes: int = None, ano: int = None) -> List[dict]:
-        query = """
+        where, params = compilar_filtro(FiltroContas.do_mes(mes, ano))
+        return self.db.fetch_all(f"""
             SELECT cat.nome, cat.icone,
                    COUNT(c.id) as quantidade,
                    COALESCE(SUM(c.valor_total), 0) as total
             FROM categorias cat
-            LEFT JOIN contas c ON cat.id = c.categoria_id
+            LEFT JOIN v_contas c ON cat.id = c.categoria_id AND {where}
+            GROUP BY cat.id, cat.nome, cat.icone ORDER BY total DESC
+        """, params)
+    
+    def get_evolucao_mensal(self, ano: int) -> List[dict]:
         """
-        params = []
+        Total, pago e pendente de cada mês do ano que tem contas, em uma
+        única consulta agrupada pelo mês do vencimento.
+        """
+        where, params = compilar_filtro(FiltroContas(
+            data_inicio=f"{ano:04d}-01-01", data_fim=f"{ano + 1:04d}-01-01"
+        ))
+        return self.db.fetch_all(f"""
+            SELECT CAST(strftime('%m', c.data_vencimento) AS INTEGER) as mes,
+                   COALESCE(SUM(c.valor_total), 0) as total,
+                   COALESCE(SUM(CASE WHEN c.status = 'pago' THEN c.valor_total ELSE 0 END), 0) as pago,
+                   COALESCE(SUM(CASE WHEN c.status != 'pago' THEN c.valor_total ELSE 0 END), 0) as pendente
+            FROM v_contas c WHERE {where}
+            GROUP BY strftime('%m', c.data_vencimento)
+        """, params)
+    
+    def get_painel(self, filtro: FiltroContas, campos: Tuple[str, ...],
+                   limite: int) -> dict:
+        """
+        Totais das contas do filtro por categoria (com o pago e o atrasado
+        de cada uma) e as `limite` contas mais recentes, em uma única
+        consulta: cada parte vem como um array JSON. Retorna
+        {'categorias': [...], 'contas': [...]}; as contas vêm na ordem de
+        filtrar, com os campos pedidos.
+        """
+        where, params = compilar_filtro(filtro)
+        consulta_contas, params_contas = self._consulta_filtro(filtro, campos, limite)
+        pares = ", ".join(f"'{campo}', {campo}" for campo in campos)
         
-        if mes and ano:
-            query += " AND strftime('%m', c.data_vencimento) = ? AND strftime('%Y', c.data_vencimento) = ?"
-            params.append(f"{mes:02d}")
-            params.append(str(ano))
+        linha = self.db.fetch_one(f"""
+            SELECT (
+                SELECT json_group_array(json_object(
+                    'categoria_id', categoria_id, 'nome', nome, 'icone', icone,
+                    'quantidade', quantidade, 'total', total, 'pago', pago,
+                    'atrasado', atrasado
+                ))
+                FROM (
+                    SELECT c.categoria_id, cat.nome, cat.icone,
+                           COUNT(*) as quantidade,
+                           SUM(c.valor_total) as total,
+                           SUM(CASE WHEN c.status = 'pago' THEN c.valor_total ELSE 0 END) as pago,
+                           SUM(CASE WHEN c.status = 'atrasado' THEN c.valor_total ELSE 0 END) as atrasado
+                    FROM v_contas c
+                    LEFT JOIN categorias cat ON c.categoria_id = cat.id
+                    WHERE {where}
+                    GROUP BY c.categoria_id
+                )
+            ) as categorias, (
+                SELECT json_group_array(json_object({pares}))
+                FROM ({consulta_contas})
+            ) as contas
+        """, params + params_contas)
         
-        query += " GROUP BY cat.id, cat.nome, cat.icone ORDER BY total DESC"
+        return {
+            'categorias': json.loads(linha['categorias']),
+            'contas': json.loads(linha['contas']),
+        }
+    
+    def get_totais_projecao(self, inicio: str, fim: str, limite: str) -> List[dict]:
+        """
+        Totais por mês ('AAAA-MM') do que está a pagar de inicio a fim
+        (exclusivo), em uma única consulta: contas pendentes e atrasadas,
+        parcelas virtuais e os meses que as recorrências ainda vão gerar até
+        o mês de limite (calculados sem gravar nada). Linhas com dimensao
+        'categoria' (valor das contas) e 'pessoa' (divisões não pagas), id,
+        total e o nome (e o ícone, da categoria) para exibição.
+        """
+        partes = []
+        for fonte, divisoes in (('contas', 'divisao_contas'),
+                                ('contas_virtuais', 'divisoes_virtuais')):
+            partes.append(f"""
+                SELECT 'categoria' AS dimensao, substr(c.data_vencimento, 1, 7) AS mes,
+                       c.categoria_id AS id, c.valor_total AS valor
+                FROM {fonte} c
+                WHERE c.status IN ('pendente', 'atrasado')
+                  AND c.data_vencimento >= :inicio AND c.data_vencimento < :fim
+            """)
+            partes.append(f"""
+                SELECT 'pessoa', substr(c.data_vencimento, 1, 7), dc.pessoa_id, dc.valor
+                FROM {fonte} c
+                JOIN {divisoes} dc ON dc.conta_id = c.id
+                WHERE dc.pago = 0
+                  AND c.data_vencimento >= :inicio AND c.data_vencimento < :fim
+            """)
+        partes.append("""
+            SELECT 'categoria', strftime('%Y-%m', vencimento), categoria_id, valor
+            FROM vencimentos
+            WHERE vencimento >= :inicio
+        """)
+        partes.append("""
+            SELECT 'pessoa', strftime('%Y-%m', v.vencimento), d.pessoa_id, d.valor
+            FROM vencimentos v
+            JOIN recorrencias_divisoes d ON d.recorrencia_id = v.id
+            WHERE v.vencimento >= :inicio
+        """)
         
-        return self.db.fetch_all(query, tuple(params))
+        return self.db.fetch_all(f"""
+            {RecorrenciaRepository.CTE_VENCIMENTOS}
+            SELECT t.dimensao, t.mes, t.id, SUM(t.valor) as total,
+                   coalesce(cat.nome, p.nome) as nome, cat.icone
+            FROM ({" UNION ALL ".join(partes)}) t
+            LEFT JOIN categorias cat ON t.dimensao = 'categoria' AND cat.id = t.id
+            LEFT JOIN pessoas p ON t.dimensao = 'pessoa' AND p.id = t.id
+            GROUP BY t.dimensao, t.mes, t.id
+        """, {'inicio': inicio, 'fim': fim, 'limite': limite[:7] + '-01'})
 
 
 class DivisaoRepository(BaseRepository):
@@ -281,104 +772,842 @@ class DivisaoRepository(BaseRepository):
     def get_all(self) -> List[dict]:
         return self.db.fetch_all("""
             SELECT dc.*, p.nome as pessoa_nome, p.cor as pessoa_cor
-            FROM divisao_contas dc
+            FROM v_divisao_contas dc
             JOIN pessoas p ON dc.pessoa_id = p.id
         """)
     
     def get_by_conta(self, conta_id: int) -> List[dict]:
-        return self.db.fetch_all("""
+        return self._por_id('divisoes', conta_id, lambda: self.db.fetch_all("""
             SELECT dc.*, p.nome as pessoa_nome, p.cor as pessoa_cor
-            FROM divisao_contas dc
+            FROM v_divisao_contas dc
             JOIN pessoas p ON dc.pessoa_id = p.id
             WHERE dc.conta_id = ?
             ORDER BY p.nome
-        """, (conta_id,))
+        """, (conta_id,)))
     
-    def get_by_pessoa(self, pessoa_id: int, mes: int = None, ano: int = None) -> List[dict]:
-        query = """
-            SELECT dc.*, c.descricao, c.parcela_atual, c.total_parcelas,
-                   c.data_vencimento, c.status
-            FROM divisao_contas dc
-            JOIN contas c ON dc.conta_id = c.id
-            WHERE dc.pessoa_id = ?
-        """
-        params = [pessoa_id]
-        
-        if mes and ano:
-            query += " AND strftime('%m', c.data_vencimento) = ? AND strftime('%Y', c.data_vencimento) = ?"
-            params.append(f"{mes:02d}")
-            params.append(str(ano))
+    def get_by_contas(self, conta_ids: List[int]) -> Dict[int, List[dict]]:
+        """Divisões de várias contas em uma única consulta: {conta_id: [divisões]}."""
+        por_conta = {conta_id: [] for conta_id in conta_ids}
+        if not conta_ids:
+            return por_conta
         
-        query += " ORDER BY c.data_vencimento"
-        
-        return self.db.fetch_all(query, tuple(params))
+        rows = self.db.fetch_all(f"""
+            SELECT dc.*, p.nome as pessoa_nome, p.cor as pessoa_cor
+            FROM v_divisao_contas dc
+            JOIN pessoas p ON dc.pessoa_id = p.id
+            WHERE dc.conta_id IN ({', '.join('?' * len(conta_ids))})
+            ORDER BY p.nome
+        """, tuple(conta_ids))
+        for row in rows:
+            por_conta[row['conta_id']].append(row)
+        return por_conta
+    
+    def get_by_pessoa(self, pessoa_id: int, mes: int = None, ano: int = None) -> List[Linha]:
+        return self.filtrar(FiltroContas.do_mes(mes, ano, pessoa_id=pessoa_id))
+    
+    def filtrar(self, filtro: FiltroContas = None) -> List[Linha]:
+        """
+        Lista as divisões cujas contas atendem ao filtro; o critério de
+        pessoa se aplica à própria divisão.
+        """
+        return self.db.fetch_linhas(*self._consulta_filtro(filtro))
+    
+    def iterar(self, filtro: FiltroContas = None,
+               lote: int = TAMANHO_LOTE) -> Iterator[Linha]:
+        """Como filtrar, mas lendo as divisões em lotes (memória constante)."""
+        return self.db.iter_query(*self._consulta_filtro(filtro), lote)
+    
+    def _consulta_filtro(self, filtro: FiltroContas) -> Tuple[str, tuple]:
+        where, params = compilar_filtro(filtro, alias_divisao='dc')
+        return f"""
+            SELECT dc.*, c.descricao, c.parcela_atual, c.total_parcelas,
+                   c.data_vencimento, c.status, c.categoria_id
+            FROM v_divisao_contas dc
+            JOIN v_contas c ON dc.conta_id = c.id
+            WHERE {where}
+            ORDER BY c.data_vencimento
+        """, params
+    
+    # Colunas de RETURNING usadas para publicar DivisaoAlterada/DivisaoPaga
+    RETORNO = """
+        RETURNING conta_id,
+                  (SELECT data_vencimento FROM contas WHERE id = divisao_contas.conta_id)
+    """
     
     def create(self, conta_id: int, pessoa_id: int, valor: float, 
                percentual: float = None) -> int:
-        return self.db.insert("""
-            INSERT OR REPLACE INTO divisao_contas 
-            (conta_id, pessoa_id, valor, percentual)
-            VALUES (?, ?, ?, ?)
-        """, (conta_id, pessoa_id, valor, percentual))
+        with self.db.get_connection() as conn:
+            rows = conn.execute(f"""
+                INSERT OR REPLACE INTO divisao_contas 
+                (conta_id, pessoa_id, valor, percentual)
+                VALUES (?, ?, ?, ?)
+                {self.RETORNO}, id
+            """, (conta_id, pessoa_id, valor, percentual)).fetchall()
+            self._publicar_divisoes(rows)
+        return rows[0]['id']
     
     def create_batch(self, divisoes: List[dict]) -> bool:
-        """Cria múltiplas divisões de uma vez."""
+        """Cria múltiplas divisões de uma vez (INSERTs de várias linhas)."""
+        if not divisoes:
+            return True
+        
         with self.db.get_connection() as conn:
-            conn.executemany("""
-                INSERT OR REPLACE INTO divisao_contas 
+            self._publicar_divisoes(self._inserir_linhas(conn, f"""
+                INSERT OR REPLACE INTO divisao_contas
                 (conta_id, pessoa_id, valor, percentual)
-                VALUES (:conta_id, :pessoa_id, :valor, :percentual)
-            """, divisoes)
+                VALUES {{}}
+                {self.RETORNO}
+            """, ('conta_id', 'pessoa_id', 'valor', 'percentual'), divisoes))
         return True
     
     def update(self, id: int, valor: float, percentual: float = None) -> bool:
         with self.db.get_connection() as conn:
-            conn.execute(
-                "UPDATE divisao_contas SET valor = ?, percentual = ? WHERE id = ?",
+            self._publicar_divisoes(conn.execute(
+                f"UPDATE divisao_contas SET valor = ?, percentual = ? WHERE id = ? {self.RETORNO}",
                 (valor, percentual, id)
-            )
+            ).fetchall())
         return True
     
     def delete(self, id: int) -> bool:
         with self.db.get_connection() as conn:
-            conn.execute("DELETE FROM divisao_contas WHERE id = ?", (id,))
+            self._publicar_divisoes(conn.execute(
+                f"DELETE FROM divisao_contas WHERE id = ? {self.RETORNO}", (id,)
+            ).fetchall())
         return True
     
     def delete_by_conta(self, conta_id: int) -> bool:
         with self.db.get_connection() as conn:
-            conn.execute(
-                "DELETE FROM divisao_contas WHERE conta_id = ?",
+            self._publicar_divisoes(conn.execute(
+                f"DELETE FROM divisao_contas WHERE conta_id = ? {self.RETORNO}",
                 (conta_id,)
-            )
+            ).fetchall())
         return True
     
-    def marcar_pago(self, id: int) -> bool:
+    def _publicar_divisoes(self, rows: List, evento: type = DivisaoAlterada, **campos):
+        """Publica o evento para linhas (conta_id, data_vencimento)."""
+        if rows:
+            self._publicar(evento(
+                frozenset(r[0] for r in rows), periodos_de(r[1] for r in rows), **campos
+            ))
+    
+    def replace_by_grupo(self, grupo_id: str, a_partir_de_parcela: int,
+                         divisoes: List[dict]) -> bool:
+        """Substitui as divisões das parcelas de um grupo a partir de uma parcela."""
         with self.db.get_connection() as conn:
+            contas = conn.execute("""
+                SELECT id, data_vencimento FROM contas
+                WHERE grupo_parcela_id = ? AND parcela_atual >= ?
+            """, (grupo_id, a_partir_de_parcela)).fetchall()
             conn.execute("""
+                DELETE FROM divisao_contas
+                WHERE conta_id IN (
+                    SELECT id FROM contas
+                    WHERE grupo_parcela_id = ? AND parcela_atual >= ?
+                )
+            """, (grupo_id, a_partir_de_parcela))
+            self._inserir_linhas(conn, """
+                WITH d(pessoa_id, valor, percentual) AS (VALUES {})
+                INSERT INTO divisao_contas (conta_id, pessoa_id, valor, percentual)
+                SELECT c.id, d.pessoa_id, d.valor, d.percentual
+                FROM contas c, d
+                WHERE c.grupo_parcela_id = ? AND c.parcela_atual >= ?
+            """, ('pessoa_id', 'valor', 'percentual'), divisoes,
+                (grupo_id, a_partir_de_parcela))
+            self._publicar_divisoes(contas)
+        return True
+    
+    def reajustar_by_grupo(self, grupo_id: str, a_partir_de_parcela: int,
+                           novo_valor: float) -> bool:
+        """
+        Reescala as divisões existentes para um novo valor de parcela,
+        mantendo a proporção de cada pessoa.
+        """
+        with self.db.get_connection() as conn:
+            self._publicar_divisoes(conn.execute(f"""
+                UPDATE divisao_contas
+                SET valor = ROUND(valor * ? / (
+                    SELECT c.valor_total FROM contas c WHERE c.id = divisao_contas.conta_id
+                ), 2)
+                WHERE conta_id IN (
+                    SELECT id FROM contas
+                    WHERE grupo_parcela_id = ? AND parcela_atual >= ? AND valor_total > 0
+                )
+                {self.RETORNO}
+            """, (novo_valor, grupo_id, a_partir_de_parcela)).fetchall())
+        return True
+    
+    def marcar_pago(self, id: int) -> bool:
+        with self.db.get_connection() as conn:
+            rows = conn.execute(f"""
                 UPDATE divisao_contas 
                 SET pago = 1, data_pagamento = ?
                 WHERE id = ?
-            """, (datetime.now().strftime('%Y-%m-%d'), id))
+                {self.RETORNO}, pessoa_id
+            """, (datetime.now().strftime('%Y-%m-%d'), id)).fetchall()
+            if rows:
+                self._publicar_divisoes(rows, DivisaoPaga, pessoa_id=rows[0]['pessoa_id'])
         return True
     
-    def get_total_por_pessoa(self, mes: int = None, ano: int = None) -> List[dict]:
+    def marcar_pagas_pessoa(self, pessoa_id: int, mes: int = None,
+                            ano: int = None) -> int:
+        """
+        Marca como pagas, com um único UPDATE, as divisões pendentes de uma
+        pessoa (no mês, se informado). Retorna o número de divisões alteradas.
+        """
         query = """
+            UPDATE divisao_contas
+            SET pago = 1, data_pagamento = ?
+            WHERE pessoa_id = ? AND pago = 0
+        """
+        params = (datetime.now().strftime('%Y-%m-%d'), pessoa_id)
+        
+        if mes and ano:
+            where, params_filtro = compilar_filtro(FiltroContas.do_mes(mes, ano), 'contas')
+            query += f" AND conta_id IN (SELECT c.id FROM contas c WHERE {where})"
+            params += params_filtro
+        
+        with self.db.get_connection() as conn:
+            rows = conn.execute(query + self.RETORNO, params).fetchall()
+            self._publicar_divisoes(rows, DivisaoPaga, pessoa_id=pessoa_id)
+            return len(rows)
+    
+    def marcar_pagas(self, filtro: FiltroContas) -> int:
+        """
+        Marca como pagas, com um único UPDATE, as divisões pendentes das
+        contas físicas que atendem ao filtro (de todas as pessoas).
+        Retorna o número de divisões alteradas.
+        """
+        where, params = compilar_filtro(filtro, 'contas')
+        with self.db.get_connection() as conn:
+            rows = conn.execute(f"""
+                UPDATE divisao_contas
+                SET pago = 1, data_pagamento = ?
+                WHERE pago = 0 AND conta_id IN (SELECT c.id FROM contas c WHERE {where})
+                {self.RETORNO}
+            """, (datetime.now().strftime('%Y-%m-%d'),) + params).fetchall()
+            self._publicar_divisoes(rows, DivisaoPaga)
+            return len(rows)
+    
+    def get_total_por_pessoa(self, mes: int = None, ano: int = None) -> List[dict]:
+        """
+        Totais por pessoa ativa. As divisões físicas e as virtuais são lidas
+        separadamente, cada uma a partir das contas do período, para que o
+        total de um mês não percorra todas as divisões.
+        Com período, só aparecem as pessoas com divisões nele.
+        """
+        filtro = FiltroContas.do_mes(mes, ano)
+        partes = []
+        params = ()
+        for fonte, divisoes in (('contas', 'divisao_contas'),
+                                ('contas_virtuais', 'divisoes_virtuais')):
+            where, params_fonte = compilar_filtro(filtro, fonte)
+            partes.append(f"""
+                SELECT dc.pessoa_id, dc.valor, dc.pago
+                FROM {fonte} c
+                JOIN {divisoes} dc ON dc.conta_id = c.id
+                WHERE {where}
+            """)
+            params += params_fonte
+        
+        join = "JOIN" if mes and ano else "LEFT JOIN"
+        return self.db.fetch_all(f"""
             SELECT p.id, p.nome, p.cor,
-                   COALESCE(SUM(dc.valor), 0) as total,
-                   COALESCE(SUM(CASE WHEN dc.pago = 1 THEN dc.valor ELSE 0 END), 0) as total_pago,
-                   COALESCE(SUM(CASE WHEN dc.pago = 0 THEN dc.valor ELSE 0 END), 0) as total_pendente
+                   COALESCE(SUM(t.valor), 0) as total,
+                   COALESCE(SUM(CASE WHEN t.pago = 1 THEN t.valor ELSE 0 END), 0) as total_pago,
+                   COALESCE(SUM(CASE WHEN t.pago = 0 THEN t.valor ELSE 0 END), 0) as total_pendente
             FROM pessoas p
-            LEFT JOIN divisao_contas dc ON p.id = dc.pessoa_id
-            LEFT JOIN contas c ON dc.conta_id = c.id
+            {join} ({" UNION ALL ".join(partes)}) t ON p.id = t.pessoa_id
             WHERE p.ativo = 1
+            GROUP BY p.id, p.nome, p.cor ORDER BY p.nome
+        """, params)
+    
+    def get_saldos(self, filtro: FiltroContas = None) -> List[dict]:
+        """
+        Saldo líquido de cada participante nas divisões pendentes das contas
+        do filtro, em uma única consulta agregada: quem pagou a conta
+        (pagador_id; NULL é o dono do app) tem a receber cada divisão dela,
+        e a pessoa da divisão tem a pagar o mesmo valor. Saldo positivo é
+        crédito; a divisão do próprio pagador se anula. Parcelas virtuais
+        são sempre pagas pelo dono.
+        """
+        partes = []
+        params = ()
+        for fonte, divisoes, pagador in (('contas', 'divisao_contas', 'c.pagador_id'),
+                                         ('contas_virtuais', 'divisoes_virtuais', 'NULL')):
+            where, params_fonte = compilar_filtro(filtro, fonte, alias_divisao='dc')
+            partes.append(f"""
+                SELECT {pagador} AS credor, dc.pessoa_id AS devedor, dc.valor
+                FROM {fonte} c
+                JOIN {divisoes} dc ON dc.conta_id = c.id
+                WHERE {where} AND dc.pago = 0
+            """)
+            params += params_fonte
+        
+        return self.db.fetch_all(f"""
+            WITH pendentes AS ({" UNION ALL ".join(partes)})
+            SELECT pessoa_id, ROUND(SUM(valor), 2) as saldo
+            FROM (
+                SELECT credor AS pessoa_id, valor FROM pendentes
+                UNION ALL
+                SELECT devedor, -valor FROM pendentes
+            )
+            GROUP BY pessoa_id
+        """, params)
+    
+    # Expressão SQL de cada dimensão do pivot (conta "c", divisão "dc")
+    DIMENSOES_PIVOT = {
+        'pessoa': 'dc.pessoa_id',
+        'categoria': 'c.categoria_id',
+        'mes': 'substr(c.data_vencimento, 1, 7)',
+    }
+    
+    def get_pivot(self, linhas: str, colunas: str, filtro: FiltroContas = None,
+                  apenas_pendentes: bool = False) -> List[dict]:
+        """
+        Soma das divisões agrupada por duas dimensões (ver DIMENSOES_PIVOT),
+        em uma única consulta: uma linha {linha, coluna, total} por
+        combinação presente. Os meses vêm como 'AAAA-MM'. Como em
+        get_total_por_pessoa, as divisões físicas e as virtuais são lidas
+        separadamente, cada uma a partir das contas do filtro.
+        """
+        for dimensao in (linhas, colunas):
+            if dimensao not in self.DIMENSOES_PIVOT:
+                raise ValueError(f"Dimensão de pivot desconhecida: {dimensao}")
+        
+        partes = []
+        params = ()
+        for fonte, divisoes in (('contas', 'divisao_contas'),
+                                ('contas_virtuais', 'divisoes_virtuais')):
+            where, params_fonte = compilar_filtro(filtro, fonte, alias_divisao='dc')
+            if apenas_pendentes:
+                where += " AND dc.pago = 0"
+            partes.append(f"""
+                SELECT {self.DIMENSOES_PIVOT[linhas]} AS linha,
+                       {self.DIMENSOES_PIVOT[colunas]} AS coluna, dc.valor
+                FROM {fonte} c
+                JOIN {divisoes} dc ON dc.conta_id = c.id
+                WHERE {where}
+            """)
+            params += params_fonte
+        
+        return self.db.fetch_all(f"""
+            SELECT linha, coluna, SUM(valor) as total
+            FROM ({" UNION ALL ".join(partes)})
+            GROUP BY linha, coluna
+        """, params)
+
+
+def eh_parcela_virtual(conta_id: int) -> bool:
+    """Indica se o ID pertence a uma parcela virtual (ainda não materializada)."""
+    return conta_id is not None and conta_id < 0
+
+
+class PlanoParcelaRepository(BaseRepository):
+    """
+    Repository para planos de parcelamento.
+    Um plano guarda a compra uma única vez; as parcelas são sintetizadas
+    pelas views (v_contas/v_divisao_contas) e só viram linhas em contas
+    quando são pagas ou editadas.
+    """
+    
+    def get_by_id(self, id: int) -> Optional[dict]:
+        return self.db.fetch_one(
+            "SELECT * FROM planos_parcela WHERE id = ?", (id,)
+        )
+    
+    def get_all(self) -> List[dict]:
+        return self.db.fetch_all(
+            "SELECT * FROM planos_parcela ORDER BY data_inicio"
+        )
+    
+    def get_by_grupo(self, grupo_id: str) -> Optional[dict]:
+        return self.db.fetch_one(
+            "SELECT * FROM planos_parcela WHERE grupo_parcela_id = ?", (grupo_id,)
+        )
+    
+    def get_divisoes(self, plano_id: int) -> List[dict]:
+        return self.db.fetch_all(
+            "SELECT * FROM planos_parcela_divisoes WHERE plano_id = ?", (plano_id,)
+        )
+    
+    def create(self, grupo_parcela_id: str, descricao: str, valor_parcela: float,
+               parcela_inicial: int, total_parcelas: int, data_inicio: str,
+               categoria_id: int = None, observacao: str = None) -> int:
+        id = self.db.insert("""
+            INSERT INTO planos_parcela
+            (grupo_parcela_id, descricao, valor_parcela, parcela_inicial,
+             total_parcelas, data_inicio, categoria_id, observacao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (grupo_parcela_id, descricao, valor_parcela, parcela_inicial,
+              total_parcelas, data_inicio, categoria_id, observacao))
+        self._publicar(self._evento_plano(
+            ContaAlterada, id, data_inicio, parcela_inicial, total_parcelas
+        ))
+        return id
+    
+    def create_divisoes(self, plano_id: int, divisoes: List[dict]) -> bool:
+        """Grava a divisão aplicada a todas as parcelas do plano."""
+        with self.db.get_connection() as conn:
+            self._inserir_divisoes(conn, plano_id, divisoes)
+            self._publicar_plano(conn, DivisaoAlterada, plano_id)
+        return True
+    
+    def _inserir_divisoes(self, conn, plano_id: int, divisoes: List[dict]):
+        self._inserir_linhas(conn, """
+            INSERT OR REPLACE INTO planos_parcela_divisoes
+            (plano_id, pessoa_id, valor, percentual)
+            VALUES {}
+        """, ('plano_id', 'pessoa_id', 'valor', 'percentual'),
+            [{**d, 'plano_id': plano_id} for d in divisoes])
+    
+    # Colunas do plano que definem as parcelas (IDs e meses)
+    CAMPOS_PARCELAS = ('data_inicio', 'parcela_inicial', 'total_parcelas')
+    
+    def _publicar_plano(self, conn, evento: type, plano_id: int):
+        """Publica o evento para as parcelas virtuais de um plano."""
+        for plano in conn.execute(
+            f"SELECT {', '.join(self.CAMPOS_PARCELAS)} FROM planos_parcela WHERE id = ?",
+            (plano_id,)
+        ).fetchall():
+            self._publicar(self._evento_plano(evento, plano_id, *plano))
+    
+    @staticmethod
+    def _evento_plano(evento: type, plano_id: int, data_inicio: str,
+                      parcela_inicial: int, total_parcelas: int) -> Evento:
+        return evento(
+            ids_plano(plano_id, parcela_inicial, total_parcelas),
+            periodos_plano(data_inicio, parcela_inicial, total_parcelas)
+        )
+    
+    def update(self, id: int, **kwargs) -> bool:
+        if not kwargs:
+            return False
+        
+        campos = []
+        valores = []
+        for campo, valor in kwargs.items():
+            campos.append(f"{campo} = ?")
+            valores.append(valor)
+        valores.append(id)
+        
+        with self.db.get_connection() as conn:
+            if set(kwargs) & set(self.CAMPOS_PARCELAS):
+                # Parcelas antigas também mudam (RETURNING só traz os valores novos)
+                self._publicar_plano(conn, ContaAlterada, id)
+            for plano in conn.execute(
+                f"UPDATE planos_parcela SET {', '.join(campos)} WHERE id = ? "
+                f"RETURNING {', '.join(self.CAMPOS_PARCELAS)}",
+                tuple(valores)
+            ).fetchall():
+                self._publicar(self._evento_plano(ContaAlterada, id, *plano))
+        return True
+    
+    def delete(self, id: int) -> bool:
+        with self.db.get_connection() as conn:
+            for plano in conn.execute(
+                f"DELETE FROM planos_parcela WHERE id = ? "
+                f"RETURNING {', '.join(self.CAMPOS_PARCELAS)}",
+                (id,)
+            ).fetchall():
+                self._publicar(self._evento_plano(ContaAlterada, id, *plano))
+        return True
+    
+    def materializar(self, conta_id: int) -> Optional[int]:
+        """
+        Converte uma parcela virtual em uma linha de contas (com suas divisões).
+        Retorna o ID da conta criada, ou None se a parcela não existir.
+        """
+        ids = self._materializar("id = ?", (conta_id,))
+        return ids[0] if ids else None
+    
+    def materializar_ate(self, plano_id: int, parcela_limite: int) -> int:
+        """
+        Materializa de uma vez todas as parcelas virtuais do plano
+        até parcela_limite (inclusive). Retorna quantas foram criadas.
+        """
+        return len(self._materializar(
+            "plano_id = ? AND parcela_atual <= ?", (plano_id, parcela_limite)
+        ))
+    
+    def contar_virtuais(self, plano_id: int, a_partir_de_parcela: int) -> int:
+        """Quantas parcelas do plano, a partir de a_partir_de_parcela, ainda são virtuais."""
+        return self.db.fetch_one("""
+            SELECT COUNT(*) AS total FROM contas_virtuais
+            WHERE plano_id = ? AND parcela_atual >= ?
+        """, (plano_id, a_partir_de_parcela))['total']
+    
+    def materializar_periodo(self, inicio: str = None, fim: str = None,
+                             pessoa_id: int = None, categoria_id: int = None) -> int:
         """
+        Materializa as parcelas virtuais com vencimento em [inicio, fim)
+        (sem inicio: até fim), opcionalmente só as de uma pessoa ou categoria.
+        Retorna quantas foram criadas.
+        """
+        filtro = "1=1"
         params = []
         
-        if mes and ano:
-            query += " AND strftime('%m', c.data_vencimento) = ? AND strftime('%Y', c.data_vencimento) = ?"
-            params.append(f"{mes:02d}")
-            params.append(str(ano))
+        if inicio:
+            filtro += " AND data_vencimento >= ?"
+            params.append(inicio)
+        if fim:
+            filtro += " AND data_vencimento < ?"
+            params.append(fim)
+        
+        if pessoa_id is not None:
+            filtro += " AND plano_id IN (SELECT plano_id FROM planos_parcela_divisoes WHERE pessoa_id = ?)"
+            params.append(pessoa_id)
+        
+        if categoria_id is not None:
+            filtro += " AND categoria_id = ?"
+            params.append(categoria_id)
+        
+        return len(self._materializar(filtro, tuple(params)))
+    
+    def _materializar(self, filtro: str, params: tuple) -> List[int]:
+        """
+        Grava em contas, com INSERT ... SELECT, as parcelas virtuais que
+        atendem ao filtro, junto com suas divisões e marcações.
+        Retorna os IDs criados.
+        """
+        with self.db.transacao() as conn:
+            # RETURNING traz também o ID virtual que a parcela deixa de ter
+            criadas = conn.execute(f"""
+                INSERT INTO contas
+                (descricao, valor_total, parcela_atual, total_parcelas,
+                 data_vencimento, categoria_id, status, observacao, grupo_parcela_id)
+                SELECT descricao, valor_total, parcela_atual, total_parcelas,
+                       data_vencimento, categoria_id, status, observacao, grupo_parcela_id
+                FROM contas_virtuais
+                WHERE {filtro}
+                ORDER BY plano_id, parcela_atual
+                RETURNING id, data_vencimento, -((
+                    SELECT p.id FROM planos_parcela p
+                    WHERE p.grupo_parcela_id = contas.grupo_parcela_id
+                ) * 100 + parcela_atual)
+            """, params).fetchall()
+            if not criadas:
+                return []
+            
+            # Na mesma transação os IDs do AUTOINCREMENT são sequenciais
+            primeiro_id = min(r[0] for r in criadas)
+            ultimo_id = max(r[0] for r in criadas)
+            
+            conn.execute("""
+                INSERT INTO divisao_contas (conta_id, pessoa_id, valor, percentual)
+                SELECT c.id, d.pessoa_id, d.valor, d.percentual
+                FROM contas c
+                JOIN planos_parcela p ON p.grupo_parcela_id = c.grupo_parcela_id
+                JOIN planos_parcela_divisoes d ON d.plano_id = p.id
+                WHERE c.id BETWEEN ? AND ?
+            """, (primeiro_id, ultimo_id))
+            
+            conn.execute("""
+                INSERT OR REPLACE INTO planos_parcela_materializadas
+                (plano_id, parcela_atual, conta_id)
+                SELECT p.id, c.parcela_atual, c.id
+                FROM contas c
+                JOIN planos_parcela p ON p.grupo_parcela_id = c.grupo_parcela_id
+                WHERE c.id BETWEEN ? AND ?
+            """, (primeiro_id, ultimo_id))
+            
+            self._publicar(ContaAlterada(
+                frozenset(r[0] for r in criadas) | frozenset(r[2] for r in criadas),
+                periodos_de(r[1] for r in criadas)
+            ))
+        
+        return list(range(primeiro_id, ultimo_id + 1))
+    
+    def reajustar_divisoes(self, plano_id: int, novo_valor: float) -> bool:
+        """Reescala a divisão padrão do plano para um novo valor de parcela."""
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                UPDATE planos_parcela_divisoes
+                SET valor = ROUND(valor * ? / (
+                    SELECT p.valor_parcela FROM planos_parcela p
+                    WHERE p.id = planos_parcela_divisoes.plano_id
+                ), 2)
+                WHERE plano_id = ?
+            """, (novo_valor, plano_id))
+            self._publicar_plano(conn, DivisaoAlterada, plano_id)
+        return True
+    
+    def replace_divisoes(self, plano_id: int, divisoes: List[dict]) -> bool:
+        """Substitui a divisão padrão do plano (apaga e grava em uma transação)."""
+        with self.db.transacao() as conn:
+            conn.execute(
+                "DELETE FROM planos_parcela_divisoes WHERE plano_id = ?", (plano_id,)
+            )
+            self._inserir_divisoes(conn, plano_id, divisoes)
+            self._publicar_plano(conn, DivisaoAlterada, plano_id)
+        return True
+    
+    def excluir_parcela(self, conta_id: int) -> bool:
+        """Exclui uma única parcela virtual, sem materializá-la."""
+        plano_id, parcela_atual = divmod(-conta_id, 100)
+        with self.db.get_connection() as conn:
+            rows = conn.execute("""
+                INSERT OR REPLACE INTO planos_parcela_materializadas
+                (plano_id, parcela_atual, conta_id) VALUES (?, ?, NULL)
+                RETURNING (
+                    SELECT date(p.data_inicio, 'start of month',
+                                '+' || (? - p.parcela_inicial) || ' months')
+                    FROM planos_parcela p WHERE p.id = ?
+                )
+            """, (plano_id, parcela_atual, parcela_atual, plano_id)).fetchall()
+            self._publicar(ContaAlterada(
+                frozenset({conta_id}), periodos_de(r[0] for r in rows)
+            ))
+        return True
+
+
+class RecorrenciaRepository(BaseRepository):
+    """
+    Repository para contas recorrentes.
+    Uma regra (dia do mês, valor, divisão e fim opcional) vira uma conta
+    comum por mês, gravada em lote na primeira vez que o mês é consultado;
+    gerada_ate marca até qual mês a regra já foi gravada.
+    """
+    
+    # Vencimentos ainda não gravados de cada regra até o mês :limite (1º dia),
+    # já dentro de [data_inicio, data_fim]
+    CTE_VENCIMENTOS = """
+        WITH RECURSIVE meses(inicio_mes) AS (
+            SELECT min(coalesce(
+                date(gerada_ate, '+1 month'), date(data_inicio, 'start of month')
+            ))
+            FROM recorrencias
+            WHERE gerada_ate IS NULL OR gerada_ate < :limite
+            UNION ALL
+            SELECT date(inicio_mes, '+1 month') FROM meses
+            WHERE inicio_mes < :limite
+        ),
+        calculados AS (
+            SELECT r.*,
+                   min(
+                       date(m.inicio_mes, '+' || (r.dia - 1) || ' days'),
+                       date(m.inicio_mes, '+1 month', '-1 day')
+                   ) AS vencimento
+            FROM recorrencias r
+            JOIN meses m ON m.inicio_mes > coalesce(r.gerada_ate, '')
+                        AND m.inicio_mes <= :limite
+            WHERE r.gerada_ate IS NULL OR r.gerada_ate < :limite
+        ),
+        vencimentos AS (
+            SELECT * FROM calculados
+            WHERE vencimento >= data_inicio
+              AND (data_fim IS NULL OR vencimento <= data_fim)
+        )
+    """
+    
+    def get_by_id(self, id: int) -> Optional[dict]:
+        return self.db.fetch_one(
+            "SELECT * FROM recorrencias WHERE id = ?", (id,)
+        )
+    
+    def get_all(self) -> List[dict]:
+        return self.db.fetch_all(
+            "SELECT * FROM recorrencias ORDER BY dia, descricao"
+        )
+    
+    def get_divisoes(self, recorrencia_id: int) -> List[dict]:
+        return self.db.fetch_all(
+            "SELECT * FROM recorrencias_divisoes WHERE recorrencia_id = ?", (recorrencia_id,)
+        )
+    
+    def create(self, descricao: str, valor: float, dia: int, data_inicio: str,
+               data_fim: str = None, categoria_id: int = None,
+               observacao: str = None, pagador_id: int = None) -> int:
+        id = self.db.insert("""
+            INSERT INTO recorrencias
+            (descricao, valor, dia, data_inicio, data_fim, categoria_id,
+             observacao, pagador_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (descricao, valor, dia, data_inicio, data_fim, categoria_id,
+              observacao, pagador_id))
+        self._publicar(self._evento_regra(ContaAlterada, data_inicio, data_fim))
+        return id
+    
+    def create_divisoes(self, recorrencia_id: int, divisoes: List[dict]) -> bool:
+        """Grava a divisão aplicada a cada conta gerada pela regra."""
+        with self.db.get_connection() as conn:
+            self._inserir_linhas(conn, """
+                INSERT OR REPLACE INTO recorrencias_divisoes
+                (recorrencia_id, pessoa_id, valor, percentual)
+                VALUES {}
+            """, ('recorrencia_id', 'pessoa_id', 'valor', 'percentual'),
+                [{**d, 'recorrencia_id': recorrencia_id} for d in divisoes])
+            self._publicar_regra(conn, DivisaoAlterada, recorrencia_id)
+        return True
+    
+    def _publicar_regra(self, conn, evento: type, recorrencia_id: int):
+        """Publica o evento para os meses ainda não gravados de uma regra."""
+        for regra in conn.execute(
+            "SELECT data_inicio, data_fim FROM recorrencias WHERE id = ?", (recorrencia_id,)
+        ).fetchall():
+            self._publicar(self._evento_regra(evento, *regra))
+    
+    @staticmethod
+    def _evento_regra(evento: type, data_inicio: str, data_fim: Optional[str]) -> Evento:
+        # Nenhuma conta gravada muda: só os meses calculados (ex: projeção)
+        return evento(frozenset(), periodos_recorrencia(data_inicio, data_fim, MAX_PARCELAS))
+    
+    def replace_divisoes(self, recorrencia_id: int, divisoes: List[dict]) -> bool:
+        """
+        Substitui a divisão da regra (as contas já geradas não mudam). Apaga
+        e grava em uma única transação: uma falha não deixa a regra sem divisão.
+        """
+        with self.db.transacao() as conn:
+            conn.execute(
+                "DELETE FROM recorrencias_divisoes WHERE recorrencia_id = ?", (recorrencia_id,)
+            )
+            return self.create_divisoes(recorrencia_id, divisoes)
+    
+    # Colunas da regra que definem os meses em que ela vence
+    CAMPOS_MESES = ('data_inicio', 'data_fim')
+    
+    def update(self, id: int, **kwargs) -> bool:
+        """Altera a regra; as contas já geradas continuam como estão."""
+        if not kwargs:
+            return False
         
-        query += " GROUP BY p.id, p.nome, p.cor ORDER BY p.nome"
+        campos = []
+        valores = []
+        for campo, valor in kwargs.items():
+            campos.append(f"{campo} = ?")
+            valores.append(valor)
+        valores.append(id)
         
-        return self.db.fetch_all(query, tuple(params))
+        with self.db.get_connection() as conn:
+            if set(kwargs) & set(self.CAMPOS_MESES):
+                # Meses antigos também mudam (RETURNING só traz os valores novos)
+                self._publicar_regra(conn, ContaAlterada, id)
+            for regra in conn.execute(
+                f"UPDATE recorrencias SET {', '.join(campos)} WHERE id = ? "
+                f"RETURNING {', '.join(self.CAMPOS_MESES)}",
+                tuple(valores)
+            ).fetchall():
+                self._publicar(self._evento_regra(ContaAlterada, *regra))
+        return True
+    
+    def delete(self, id: int) -> bool:
+        """Remove a regra; as contas já geradas ficam (recorrencia_id NULL)."""
+        with self.db.get_connection() as conn:
+            for regra in conn.execute(
+                f"DELETE FROM recorrencias WHERE id = ? RETURNING {', '.join(self.CAMPOS_MESES)}",
+                (id,)
+            ).fetchall():
+                self._publicar(self._evento_regra(ContaAlterada, *regra))
+        return True
+    
+    def atualizar_geradas(self, id: int, a_partir_de: str) -> int:
+        """
+        Copia os dados e a divisão atuais da regra para as contas não pagas
+        que ela já gerou com vencimento a partir de a_partir_de (o dia do
+        vencimento de cada conta é mantido). Retorna quantas foram alteradas.
+        """
+        with self.db.transacao() as conn:
+            alteradas = conn.execute("""
+                UPDATE contas
+                SET descricao = r.descricao, valor_total = r.valor,
+                    categoria_id = r.categoria_id, observacao = r.observacao,
+                    pagador_id = r.pagador_id
+                FROM recorrencias r
+                WHERE r.id = contas.recorrencia_id
+                  AND contas.recorrencia_id = ? AND contas.data_vencimento >= ?
+                  AND contas.status != 'pago'
+                RETURNING contas.id, contas.data_vencimento
+            """, (id, a_partir_de)).fetchall()
+            if not alteradas:
+                return 0
+            
+            ids = [r[0] for r in alteradas]
+            marcadores = ', '.join('?' * len(ids))
+            conn.execute(
+                f"DELETE FROM divisao_contas WHERE conta_id IN ({marcadores})", ids
+            )
+            conn.execute(f"""
+                INSERT INTO divisao_contas (conta_id, pessoa_id, valor, percentual)
+                SELECT c.id, d.pessoa_id, d.valor, d.percentual
+                FROM contas c
+                JOIN recorrencias_divisoes d ON d.recorrencia_id = c.recorrencia_id
+                WHERE c.id IN ({marcadores})
+            """, ids)
+            
+            self._publicar(ContaAlterada(
+                frozenset(ids), periodos_de(r[1] for r in alteradas)
+            ))
+        return len(alteradas)
+    
+    def materializar_ate(self, limite: str) -> int:
+        """
+        Grava, com um único INSERT ... SELECT, as contas de todas as regras
+        nos meses posteriores a gerada_ate até o mês de limite (inclusive),
+        junto com suas divisões, e avança gerada_ate. Quando todas as regras
+        já chegaram ao mês, custa só o INSERT que não encontra nada.
+        Retorna quantas contas foram criadas.
+        """
+        limite = limite[:7] + '-01'
+        with self.db.transacao() as conn:
+            criadas = conn.execute(f"""
+                {self.CTE_VENCIMENTOS}
+                INSERT INTO contas
+                (descricao, valor_total, data_vencimento, categoria_id, status,
+                 observacao, pagador_id, recorrencia_id)
+                SELECT descricao, valor, vencimento, categoria_id,
+                       CASE
+                           WHEN vencimento < date('now', 'localtime') THEN 'atrasado'
+                           ELSE 'pendente'
+                       END,
+                       observacao, pagador_id, id
+                FROM vencimentos
+                ORDER BY id, vencimento
+                RETURNING id, data_vencimento
+            """, {'limite': limite}).fetchall()
+            if not criadas:
+                return 0
+            
+            # Na mesma transação os IDs do AUTOINCREMENT são sequenciais
+            primeiro_id = min(r[0] for r in criadas)
+            ultimo_id = max(r[0] for r in criadas)
+            
+            conn.execute("""
+                INSERT INTO divisao_contas (conta_id, pessoa_id, valor, percentual)
+                SELECT c.id, d.pessoa_id, d.valor, d.percentual
+                FROM contas c
+                JOIN recorrencias_divisoes d ON d.recorrencia_id = c.recorrencia_id
+                WHERE c.id BETWEEN ? AND ?
+            """, (primeiro_id, ultimo_id))
+            
+            conn.execute("""
+                UPDATE recorrencias SET gerada_ate = ?
+                WHERE gerada_ate IS NULL OR gerada_ate < ?
+            """, (limite, limite))
+            
+            self._publicar(ContaAlterada(
+                frozenset(r[0] for r in criadas), periodos_de(r[1] for r in criadas)
+            ))
+        
+        return len(criadas)
+    
+    def encerrar(self, id: int, data_fim: str) -> int:
+        """
+        Define o último vencimento da regra e exclui as contas não pagas que
+        ela já gerou depois dele. Retorna quantas contas foram excluídas.
+        """
+        with self.db.transacao() as conn:
+            # Sem fim no evento: cobre os meses que a regra deixa de ter
+            for regra in conn.execute(
+                "UPDATE recorrencias SET data_fim = ? WHERE id = ? RETURNING data_inicio",
+                (data_fim, id)
+            ).fetchall():
+                self._publicar(self._evento_regra(ContaAlterada, regra[0], None))
+            excluidas = conn.execute("""
+                DELETE FROM contas
+                WHERE recorrencia_id = ? AND data_vencimento > ? AND status != 'pago'
+                RETURNING id, data_vencimento
+            """, (id, data_fim)).fetchall()
+            if excluidas:
+                self._publicar(ContaAlterada(
+                    frozenset(r[0] for r in excluidas), periodos_de(r[1] for r in excluidas)
+                ))
+        return len(excluidas)
@@ -0,0 +1,194 @@
+"""
+Verificação dos planos de consulta dos repositories.
+
+Executa as consultas usadas pelas telas (dashboard, contas, relatórios e
+operações em lote) dentro de uma simulação que é desfeita no final, com
+estatísticas de um banco grande injetadas em sqlite_stat1, e aponta toda
+varredura (SCAN) de contas ou divisao_contas. Assim o resultado não
+depende do tamanho do banco local.
+
+Uso: python -m src.data.verificacao_indices
+(termina com código 1 se alguma consulta varrer uma tabela grande)
+"""
+
+import re
+import sys
+from datetime import date
+from math import prod
+from typing import Callable, Dict, List, Tuple
+
+from .database import get_database
+from .filtros import FiltroContas, intervalo_mes
+from .repositories import (
+    ContaRepository, DivisaoRepository, PlanoParcelaRepository, RecorrenciaRepository
+)
+
+# Tamanho simulado das tabelas e cardinalidade de cada coluna indexada
+# (valores distintos), usados para gerar o sqlite_stat1. Só varreduras das
+# tabelas grandes são apontadas.
+TABELAS_GRANDES: Dict[str, int] = {'contas': 100_000, 'divisao_contas': 200_000}
+TABELAS_PEQUENAS: Dict[str, int] = {
+    'pessoas': 10,
+    'categorias': 15,
+    'planos_parcela': 50,
+    'planos_parcela_divisoes': 100,
+    'planos_parcela_materializadas': 500,
+    'recorrencias': 20,
+    'recorrencias_divisoes': 40,
+    'metadados': 5,
+}
+CARDINALIDADES: Dict[str, int] = {
+    'data_vencimento': 3_000,
+    'status': 3,
+    'categoria_id': 15,
+    'valor_total': 10_000,
+    'grupo_parcela_id': 20_000,
+    'parcela_atual': 48,
+    'conta_id': 100_000,
+    'pessoa_id': 10,
+    'pago': 2,
+    'valor': 10_000,
+    'recorrencia_id': 20,
+}
+
+
+def consultas_verificadas() -> List[Tuple[str, Callable[[], object]]]:
+    """Chamadas de repository verificadas (as mesmas feitas pelas telas)."""
+    contas = ContaRepository()
+    divisoes = DivisaoRepository()
+    planos = PlanoParcelaRepository()
+    recorrencias = RecorrenciaRepository()
+    
+    hoje = date.today()
+    mes, ano = hoje.month, hoje.year
+    do_mes = FiltroContas.do_mes(mes, ano)
+    campos_dashboard = ('descricao', 'valor_total', 'parcela_atual',
+                        'total_parcelas', 'status', 'categoria_icone')
+    
+    return [
+        ("conta por id", lambda: contas.get_by_id(1)),
+        ("contas do mês", lambda: contas.get_all(mes=mes, ano=ano)),
+        ("últimas contas (dashboard)",
+         lambda: contas.get_all(mes=mes, ano=ano, campos=campos_dashboard, limite=5)),
+        ("página de contas", lambda: contas.get_pagina(do_mes)),
+        ("página de pendentes",
+         lambda: contas.get_pagina(FiltroContas.do_mes(mes, ano, status='pendente'))),
+        ("página seguinte", lambda: contas.get_pagina(do_mes, cursor=(hoje.isoformat(), 1))),
+        ("busca textual", lambda: contas.buscar('mercado', do_mes)),
+        ("contas de uma pessoa",
+         lambda: contas.get_pagina(FiltroContas.do_mes(mes, ano, pessoa_id=1))),
+        ("parcelas de um grupo", lambda: contas.get_by_grupo('verificacao')),
+        ("resumo do mês", lambda: contas.get_resumo_geral(mes, ano)),
+        ("gastos por categoria", lambda: contas.get_por_categoria(mes, ano)),
+        ("meses de um grupo", lambda: contas.get_periodos_grupo('verificacao', 3)),
+        ("pagar mês", lambda: contas.marcar_pagas(FiltroContas.do_mes(mes, ano, categorias=1))),
+        ("quitar grupo", lambda: contas.marcar_pagas_grupo('verificacao', 3)),
+        ("editar grupo", lambda: contas.update_by_grupo('verificacao', 2, descricao='x')),
+        ("varredura de atrasadas", lambda: contas.atualizar_atrasadas(hoje.isoformat())),
+        ("divisões de uma conta", lambda: divisoes.get_by_conta(1)),
+        ("divisões de uma página", lambda: divisoes.get_by_contas([1, 2, -1])),
+        ("divisões de uma pessoa no mês", lambda: divisoes.get_by_pessoa(1, mes, ano)),
+        ("totais por pessoa", lambda: divisoes.get_total_por_pessoa(mes, ano)),
+        ("quitar pessoa no mês", lambda: divisoes.marcar_pagas_pessoa(1, mes, ano)),
+        ("reajustar divisões de grupo", lambda: divisoes.reajustar_by_grupo('verificacao', 2, 10.0)),
+        ("materializar período", lambda: planos.materializar_periodo(*intervalo_mes(mes, ano))),
+        ("gerar recorrentes do mês", lambda: recorrencias.materializar_ate(intervalo_mes(mes, ano)[0])),
+        ("encerrar recorrência", lambda: recorrencias.encerrar(1, hoje.isoformat())),
+        ("editar contas de uma recorrência",
+         lambda: recorrencias.atualizar_geradas(1, hoje.isoformat())),
+    ]
+
+
+def verificar_planos() -> List[dict]:
+    """
+    Executa as consultas verificadas e retorna as linhas de plano que
+    varrem tabelas grandes: [{'consulta', 'sql', 'plano'}].
+    Varreduras em ordem de índice com LIMIT são aceitas (leem só o início
+    do índice, como a primeira página da listagem).
+    """
+    db = get_database()
+    problemas = []
+    tinha_estatisticas = _tem_estatisticas(db)
+    
+    with db.simulacao() as conn:
+        _injetar_estatisticas(conn)
+        
+        for descricao, chamada in consultas_verificadas():
+            with db.contar_consultas() as contagem:
+                chamada()
+            
+            for sql in contagem.comandos:
+                if not re.match(r'\s*(SELECT|WITH|UPDATE|DELETE|INSERT)', sql, re.I):
+                    continue
+                for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+                    if _varre_tabela_grande(sql, linha['detail']):
+                        problemas.append({
+                            'consulta': descricao,
+                            'sql': ' '.join(sql.split()),
+                            'plano': linha['detail']
+                        })
+    
+    # Volta a usar as estatísticas reais: a simulação foi desfeita, mas as
+    # já carregadas na conexão continuariam sendo as injetadas
+    if tinha_estatisticas:
+        with db.get_connection() as conn:
+            conn.execute("ANALYZE sqlite_schema")
+    
+    return problemas
+
+
+def _injetar_estatisticas(conn):
+    """Substitui sqlite_stat1 por estatísticas de um banco grande."""
+    conn.execute("ANALYZE sqlite_schema")  # cria sqlite_stat1, se não existir
+    
+    conn.execute("DELETE FROM sqlite_stat1")
+    for tabela, linhas in {**TABELAS_GRANDES, **TABELAS_PEQUENAS}.items():
+        conn.execute(
+            "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, NULL, ?)",
+            (tabela, str(linhas))
+        )
+        for indice in conn.execute(f"PRAGMA index_list({tabela})").fetchall():
+            colunas = [c['name'] for c in conn.execute(f"PRAGMA index_info({indice['name']})")]
+            medias = [
+                max(1, round(linhas / min(linhas, prod(CARDINALIDADES.get(c, linhas) for c in colunas[:i + 1]))))
+                for i in range(len(colunas))
+            ]
+            conn.execute(
+                "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)",
+                (tabela, indice['name'], ' '.join(map(str, [linhas] + medias)))
+            )
+    
+    conn.execute("ANALYZE sqlite_schema")  # recarrega as estatísticas
+
+
+def _tem_estatisticas(db) -> bool:
+    return db.fetch_one("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'") is not None
+
+
+def _varre_tabela_grande(sql: str, detalhe: str) -> bool:
+    """Indica se a linha do plano é um SCAN de tabela grande não limitado."""
+    varredura = re.match(r'SCAN (\w+)', detalhe)
+    if not varredura:
+        return False
+    
+    # Nome ou alias de cada tabela grande na consulta
+    nomes = set()
+    for tabela in TABELAS_GRANDES:
+        nomes.add(tabela)
+        for alias in re.findall(rf'\b{tabela}\b\s+(?:AS\s+)?(\w+)', sql, re.I):
+            nomes.add(alias)
+    nomes -= {'WHERE', 'JOIN', 'LEFT', 'ON', 'SET', 'ORDER', 'GROUP', 'LIMIT', 'UNION'}
+    
+    if varredura.group(1) not in nomes:
+        return False
+    
+    em_ordem_de_indice = 'USING INDEX' in detalhe or 'USING COVERING INDEX' in detalhe
+    return not (em_ordem_de_indice and re.search(r'\bLIMIT\b', sql, re.I))
+
+
+if __name__ == "__main__":
+    problemas = verificar_planos()
+    for problema in problemas:
+        print(f"[{problema['consulta']}] {problema['plano']}\n    {problema['sql']}\n")
+    print(f"{len(problemas)} varredura(s) de tabela grande encontrada(s).")
+    sys.exit(1 if problemas else 0)
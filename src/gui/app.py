@@ -5,12 +5,16 @@ Aplicação principal - FinanceApp.
 import customtkinter as ctk
 from datetime import datetime
 
-from .pages import DashboardPage, ContasPage, PessoasPage, RelatoriosPage
+from .pages import (
+    DashboardPage, ContasPage, PessoasPage, RelatoriosPage, PivotPage, DiagnosticoPage
+)
 from .dialogs import DialogoConta
 from .components import ActionButton
 from src.config.settings import settings
-from src.config.constants import MESES, ANOS_DISPONIVEIS
+from src.config.constants import MESES, ANOS_DISPONIVEIS, INTERVALO_VARREDURA_ATRASADAS_MS
 from src.services import ContaService, PessoaService
+from src.data import get_database
+from src.data.colunar import NUMPY_DISPONIVEL, get_base_colunar
 from src.services.conta_service import DadosConta
 
 
@@ -43,6 +47,19 @@ class FinanceApp(ctk.CTk):
         self._criar_sidebar()
         self._criar_area_principal()
         
+        # Marcar contas atrasadas e gerar as recorrentes do mês antes de exibir os dados
+        self.conta_service.atualizar_atrasadas()
+        self.conta_service.materializar_recorrencias(self.mes_atual, self.ano_atual)
+        self.after(INTERVALO_VARREDURA_ATRASADAS_MS, self._varrer_atrasadas)
+        
+        # Base das análises: mapeada do instantâneo em disco, mais o que mudou
+        if NUMPY_DISPONIVEL:
+            get_base_colunar().abrir()
+        else:
+            # Sem a base colunar, nada lê o log de alterações
+            db = get_database()
+            db.podar_log_alteracoes(db.seq_alteracoes())
+        
         # Mostrar dashboard
         self.mostrar_dashboard()
     
@@ -70,6 +87,8 @@ class FinanceApp(ctk.CTk):
         self.btn_contas = self._criar_btn_nav("📋 Contas", self.mostrar_contas, 2)
         self.btn_pessoas = self._criar_btn_nav("👥 Pessoas", self.mostrar_pessoas, 3)
         self.btn_relatorios = self._criar_btn_nav("📈 Relatórios", self.mostrar_relatorios, 4)
+        self.btn_pivot = self._criar_btn_nav("🔀 Pivot", self.mostrar_pivot, 5)
+        self.btn_diagnostico = self._criar_btn_nav("🩺 Diagnóstico", self.mostrar_diagnostico, 6)
         
         # Seletor de período
         ctk.CTkLabel(
@@ -144,7 +163,9 @@ class FinanceApp(ctk.CTk):
             'dashboard': self.btn_dashboard,
             'contas': self.btn_contas,
             'pessoas': self.btn_pessoas,
-            'relatorios': self.btn_relatorios
+            'relatorios': self.btn_relatorios,
+            'pivot': self.btn_pivot,
+            'diagnostico': self.btn_diagnostico
         }
         
         for nome, btn in botoes.items():
@@ -159,10 +180,21 @@ class FinanceApp(ctk.CTk):
         self.mes_atual = MESES.index(mes_nome) + 1
         self.ano_atual = int(self.combo_ano.get())
         
+        # Contas recorrentes do mês são geradas na primeira vez que ele é exibido
+        self.conta_service.materializar_recorrencias(self.mes_atual, self.ano_atual)
+        
         # Recarregar página atual
         if self.pagina_atual:
             self.pagina_atual.carregar()
     
+    def _varrer_atrasadas(self):
+        """
+        Varredura periódica de contas atrasadas (a página atual se
+        recarrega pelos eventos, se o mês exibido for afetado).
+        """
+        self.conta_service.atualizar_atrasadas()
+        self.after(INTERVALO_VARREDURA_ATRASADAS_MS, self._varrer_atrasadas)
+    
     def _alternar_tema(self):
         """Alterna entre tema claro e escuro."""
         modo = self.switch_tema.get()
@@ -203,10 +235,21 @@ class FinanceApp(ctk.CTk):
         self.pagina_atual = RelatoriosPage(self.main_area, self)
         self.pagina_atual.grid(row=0, column=0, sticky="nsew")
     
-    def atualizar_dashboard(self):
-        """Atualiza o dashboard se estiver visível."""
-        if isinstance(self.pagina_atual, DashboardPage):
-            self.pagina_atual.carregar()
+    def mostrar_pivot(self):
+        """Exibe o pivot do ano (pessoa × categoria × mês)."""
+        self._limpar_area_principal()
+        self._atualizar_botoes_nav('pivot')
+        
+        self.pagina_atual = PivotPage(self.main_area, self)
+        self.pagina_atual.grid(row=0, column=0, sticky="nsew")
+    
+    def mostrar_diagnostico(self):
+        """Exibe a página de diagnóstico das consultas."""
+        self._limpar_area_principal()
+        self._atualizar_botoes_nav('diagnostico')
+        
+        self.pagina_atual = DiagnosticoPage(self.main_area, self)
+        self.pagina_atual.grid(row=0, column=0, sticky="nsew")
     
     # ==================== AÇÕES GLOBAIS ====================
     
@@ -228,14 +271,18 @@ class FinanceApp(ctk.CTk):
                 categoria_id=result['categoria_id'],
                 observacao=result['observacao'],
                 gerar_parcelas_futuras=result['gerar_parcelas_futuras'],
-                divisoes=result['divisoes']
+                parcelas_virtuais=result.get('parcelas_virtuais', False),
+                divisoes=result['divisoes'],
+                pagador_id=result.get('pagador_id'),
+                recorrente=result.get('recorrente', False),
+                repetir_ate=result.get('repetir_ate')
             )
             
-            resultado = self.conta_service.criar_conta(dados)
-            
-            if resultado.sucesso and self.pagina_atual:
-                self.pagina_atual.carregar()
+            self.conta_service.criar_conta(dados)
     
     def run(self):
         """Inicia a aplicação."""
         self.mainloop()
+        if NUMPY_DISPONIVEL:
+            get_base_colunar().salvar_instantaneo()
+        get_database().fechar()
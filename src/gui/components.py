@@ -3,7 +3,7 @@ Componentes base da interface gráfica.
 """
 
 import customtkinter as ctk
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 from tkinter import colorchooser
 
 
@@ -37,6 +37,65 @@ class Card(ctk.CTkFrame):
         ).pack(pady=(5, 15))
 
 
+class GraficoBarras(ctk.CTkFrame):
+    """
+    Gráfico de barras verticais desenhado em um Canvas, redesenhado quando
+    o tamanho muda. Com muitas barras, só parte dos rótulos é exibida.
+    """
+    
+    # Rótulos exibidos no máximo, distribuídos entre as barras
+    MAX_ROTULOS = 12
+    
+    def __init__(self, parent, rotulos: List[str], valores: List[float],
+                 cor: str = "#3498db", altura: int = 220,
+                 formatar: Callable[[float], str] = str, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.rotulos = rotulos
+        self.valores = valores
+        self.cor = cor
+        self.formatar = formatar
+        
+        self.canvas = ctk.CTkCanvas(
+            self,
+            height=altura,
+            highlightthickness=0,
+            bg=self._apply_appearance_mode(self.cget("fg_color"))
+        )
+        self.canvas.pack(fill="both", expand=True, padx=10, pady=10)
+        self.canvas.bind("<Configure>", lambda _: self._desenhar())
+    
+    def _desenhar(self):
+        self.canvas.delete("all")
+        if not self.valores:
+            return
+        
+        largura = self.canvas.winfo_width()
+        base = self.canvas.winfo_height() - 20
+        topo = 20
+        cor_texto = self._apply_appearance_mode(("gray10", "gray90"))
+        maximo = max(self.valores) or 1
+        passo = largura / len(self.valores)
+        barra = passo * 0.7
+        salto = max(1, -(-len(self.valores) // self.MAX_ROTULOS))
+        
+        for i, (rotulo, valor) in enumerate(zip(self.rotulos, self.valores)):
+            x = i * passo + (passo - barra) / 2
+            if valor > 0:
+                self.canvas.create_rectangle(
+                    x, base - (base - topo) * valor / maximo, x + barra, base,
+                    fill=self.cor, outline=""
+                )
+            if i % salto == 0:
+                self.canvas.create_text(
+                    x + barra / 2, base + 10, text=rotulo, fill=cor_texto, font=("", 9)
+                )
+        
+        self.canvas.create_text(
+            5, topo / 2, anchor="w", text=f"máx. {self.formatar(maximo)}",
+            fill=cor_texto, font=("", 10)
+        )
+
+
 class ColorButton(ctk.CTkButton):
     """Botão para seleção de cor."""
     
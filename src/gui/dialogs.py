@@ -8,9 +8,10 @@ from typing import List, Optional
 from datetime import datetime
 
 from .components import ActionButton, ColorButton, LabeledEntry
-from src.config.constants import FORMATO_DATA_BR, FORMATO_DATA_DB
+from src.config.constants import FORMATO_DATA_BR, FORMATO_DATA_DB, NOME_DONO
 from src.utils.validators import ValidadorConta, ValidadorPessoa
-from src.utils.formatters import formatar_data
+from src.utils.formatters import formatar_data, formatar_moeda, formatar_parcelas
+from src.data.referencias import get_referencias, rotulo_categoria
 
 
 class DialogBase(ctk.CTkToplevel):
@@ -213,6 +214,16 @@ class DialogoConta(DialogBase):
         )
         self.check_gerar.pack(side="left", padx=20)
         
+        # Checkbox para guardar apenas o plano (parcelas geradas sob demanda)
+        self.var_parcelas_virtuais = ctk.BooleanVar(value=False)
+        self.check_virtuais = ctk.CTkCheckBox(
+            parcela_container,
+            text="Parcelas sob demanda (não grava os meses futuros no banco)",
+            variable=self.var_parcelas_virtuais,
+            font=ctk.CTkFont(size=12)
+        )
+        self.check_virtuais.pack(anchor="w", pady=(8, 0))
+        
         # Info sobre geração de parcelas
         info_frame = ctk.CTkFrame(main_frame, fg_color=("#e8f4fd", "#1a3a4a"))
         info_frame.pack(fill="x", pady=(0, 15))
@@ -233,6 +244,23 @@ class DialogoConta(DialogBase):
         )
         self.entry_vencimento.pack(fill="x", pady=(0, 15))
         
+        # Conta recorrente (aluguel, luz...): gerada todo mês no mesmo dia
+        self.var_recorrente = ctk.BooleanVar(value=False)
+        self.check_recorrente = ctk.CTkCheckBox(
+            main_frame,
+            text="🔁 Repetir todo mês no dia do vencimento",
+            variable=self.var_recorrente,
+            font=ctk.CTkFont(size=12)
+        )
+        self.check_recorrente.pack(anchor="w", pady=(0, 10))
+        
+        self.entry_repetir_ate = LabeledEntry(
+            main_frame,
+            "Repetir até (DD/MM/AAAA, opcional):",
+            "Sem data de fim"
+        )
+        self.entry_repetir_ate.pack(fill="x", pady=(0, 15))
+        
         # Categoria
         ctk.CTkLabel(
             main_frame,
@@ -240,7 +268,7 @@ class DialogoConta(DialogBase):
             font=ctk.CTkFont(size=14)
         ).pack(anchor="w", pady=(0, 5))
         
-        categorias_display = [f"{c['icone']} {c['nome']}" for c in self.categorias]
+        categorias_display = [rotulo_categoria(c) for c in self.categorias]
         self.combo_categoria = ctk.CTkComboBox(
             main_frame,
             values=categorias_display if categorias_display else ["Sem categoria"],
@@ -252,6 +280,23 @@ class DialogoConta(DialogBase):
         if categorias_display:
             self.combo_categoria.set(categorias_display[0])
         
+        # Pagador (quem recebe as divisões no acerto de contas)
+        ctk.CTkLabel(
+            main_frame,
+            text="Pago por:",
+            font=ctk.CTkFont(size=14)
+        ).pack(anchor="w", pady=(0, 5))
+        
+        self.combo_pagador = ctk.CTkComboBox(
+            main_frame,
+            values=[NOME_DONO] + [p['nome'] for p in self.pessoas],
+            width=550,
+            height=40,
+            font=ctk.CTkFont(size=14)
+        )
+        self.combo_pagador.pack(fill="x", pady=(0, 15))
+        self.combo_pagador.set(NOME_DONO)
+        
         # Observação
         ctk.CTkLabel(
             main_frame,
@@ -386,18 +431,21 @@ class DialogoConta(DialogBase):
         # Desabilitar geração de parcelas na edição
         self.var_gerar_parcelas.set(False)
         self.check_gerar.configure(state="disabled")
+        self.check_virtuais.configure(state="disabled")
+        self.check_recorrente.configure(state="disabled")
         
         if conta.get('data_vencimento'):
             data_formatada = formatar_data(conta['data_vencimento'])
             self.entry_vencimento.set(data_formatada)
         
         # Categoria
-        cat_id = conta.get('categoria_id')
-        if cat_id:
-            for cat in self.categorias:
-                if cat['id'] == cat_id:
-                    self.combo_categoria.set(f"{cat['icone']} {cat['nome']}")
-                    break
+        categoria = get_referencias().categoria(conta.get('categoria_id'))
+        if categoria:
+            self.combo_categoria.set(rotulo_categoria(categoria))
+        
+        pagador = get_referencias().pessoa(conta.get('pagador_id'))
+        if pagador:
+            self.combo_pagador.set(pagador['nome'])
         
         if conta.get('observacao'):
             self.text_observacao.insert("1.0", conta['observacao'])
@@ -458,13 +506,15 @@ class DialogoConta(DialogBase):
             messagebox.showerror("Erro", msg)
             return
         
+        valido, msg, repetir_ate = ValidadorConta.validar_data(self.entry_repetir_ate.get())
+        if not valido:
+            messagebox.showerror("Erro", msg)
+            return
+        
         # Categoria
-        categoria_id = None
-        cat_selecionada = self.combo_categoria.get()
-        for cat in self.categorias:
-            if f"{cat['icone']} {cat['nome']}" == cat_selecionada:
-                categoria_id = cat['id']
-                break
+        categoria_id = get_referencias().id_categoria_por_rotulo(self.combo_categoria.get())
+        pagador = self.combo_pagador.get()
+        pagador_id = None if pagador == NOME_DONO else get_referencias().id_pessoa(pagador)
         
         # Divisões
         divisoes = []
@@ -490,7 +540,11 @@ class DialogoConta(DialogBase):
             'categoria_id': categoria_id,
             'observacao': self.text_observacao.get("1.0", "end-1c").strip(),
             'gerar_parcelas_futuras': self.var_gerar_parcelas.get(),
-            'divisoes': divisoes
+            'parcelas_virtuais': self.var_parcelas_virtuais.get(),
+            'divisoes': divisoes,
+            'pagador_id': pagador_id,
+            'recorrente': self.var_recorrente.get(),
+            'repetir_ate': repetir_ate
         }
         
         if self.conta:
@@ -556,3 +610,184 @@ class DialogoExcluirParcelas(DialogBase):
     def _selecionar(self, opcao: str):
         self.result = opcao
         self.destroy()
+
+
+class DialogoEditarParcelas(DialogBase):
+    """Diálogo para escolher se a edição vale para as parcelas seguintes."""
+    
+    def __init__(self, parent, descricao: str, parcela_atual: int, total_parcelas: int):
+        super().__init__(parent, "Editar Parcelas", 450, 220)
+        
+        self.descricao = descricao
+        self.parcela_atual = parcela_atual
+        self.total_parcelas = total_parcelas
+        
+        self._criar_widgets()
+    
+    def _criar_widgets(self):
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=25, pady=20)
+        
+        ctk.CTkLabel(
+            main_frame,
+            text=f"A conta '{self.descricao}' é a parcela "
+                 f"{self.parcela_atual}/{self.total_parcelas} de um parcelamento.",
+            font=ctk.CTkFont(size=14),
+            wraplength=400,
+            justify="center"
+        ).pack(pady=(0, 20))
+        
+        ActionButton(
+            main_frame,
+            text="Alterar apenas esta parcela",
+            style="primary",
+            width=280,
+            command=lambda: self._selecionar('uma')
+        ).pack(pady=5)
+        
+        ActionButton(
+            main_frame,
+            text="Alterar esta e as seguintes",
+            style="warning",
+            width=280,
+            command=lambda: self._selecionar('seguintes')
+        ).pack(pady=5)
+        
+        ActionButton(
+            main_frame,
+            text="Cancelar",
+            style="secondary",
+            width=280,
+            command=self.destroy
+        ).pack(pady=5)
+    
+    def _selecionar(self, opcao: str):
+        self.result = opcao
+        self.destroy()
+
+
+class DialogoEditarRecorrencia(DialogBase):
+    """Diálogo para escolher o que fazer com uma conta gerada por uma recorrência."""
+    
+    def __init__(self, parent, descricao: str):
+        super().__init__(parent, "Conta Recorrente", 450, 260)
+        
+        self.descricao = descricao
+        
+        self._criar_widgets()
+    
+    def _criar_widgets(self):
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=25, pady=20)
+        
+        ctk.CTkLabel(
+            main_frame,
+            text=f"A conta '{self.descricao}' se repete todo mês.",
+            font=ctk.CTkFont(size=14),
+            wraplength=400,
+            justify="center"
+        ).pack(pady=(0, 20))
+        
+        ActionButton(
+            main_frame,
+            text="Alterar apenas esta conta",
+            style="primary",
+            width=280,
+            command=lambda: self._selecionar('uma')
+        ).pack(pady=5)
+        
+        ActionButton(
+            main_frame,
+            text="Alterar esta e as próximas",
+            style="warning",
+            width=280,
+            command=lambda: self._selecionar('seguintes')
+        ).pack(pady=5)
+        
+        ActionButton(
+            main_frame,
+            text="Encerrar a recorrência após esta conta",
+            style="danger",
+            width=280,
+            command=lambda: self._selecionar('encerrar')
+        ).pack(pady=5)
+        
+        ActionButton(
+            main_frame,
+            text="Cancelar",
+            style="secondary",
+            width=280,
+            command=self.destroy
+        ).pack(pady=5)
+    
+    def _selecionar(self, opcao: str):
+        self.result = opcao
+        self.destroy()
+
+
+class DialogoDivisoesCelula(DialogBase):
+    """Lista (somente leitura) das divisões de uma célula do pivot."""
+    
+    def __init__(self, parent, titulo: str, divisoes: List):
+        super().__init__(parent, titulo, 560, 460)
+        
+        self.divisoes = divisoes
+        self.referencias = get_referencias()
+        
+        self._criar_widgets()
+    
+    def _criar_widgets(self):
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=25, pady=20)
+        
+        lista = ctk.CTkScrollableFrame(main_frame)
+        lista.pack(fill="both", expand=True, pady=(0, 15))
+        
+        for divisao in self.divisoes:
+            self._criar_linha(lista, divisao)
+        
+        if not self.divisoes:
+            ctk.CTkLabel(
+                lista,
+                text="Nenhuma divisão",
+                text_color="gray"
+            ).pack(pady=20)
+        
+        total = sum(d.valor for d in self.divisoes)
+        ctk.CTkLabel(
+            main_frame,
+            text=f"{len(self.divisoes)} divisões · Total: {formatar_moeda(total)}",
+            font=ctk.CTkFont(size=14, weight="bold")
+        ).pack(side="left")
+        
+        ActionButton(
+            main_frame,
+            text="Fechar",
+            style="secondary",
+            width=120,
+            command=self.destroy
+        ).pack(side="right")
+    
+    def _criar_linha(self, parent, divisao):
+        frame = ctk.CTkFrame(parent, fg_color=("gray85", "gray20"))
+        frame.pack(fill="x", padx=5, pady=3)
+        
+        descricao = divisao.descricao
+        if divisao.total_parcelas > 1:
+            descricao += f" ({formatar_parcelas(divisao.parcela_atual, divisao.total_parcelas)})"
+        pessoa = self.referencias.pessoa(divisao.pessoa_id) or {}
+        
+        ctk.CTkLabel(
+            frame,
+            text=f"{formatar_data(divisao.data_vencimento)}  ·  {descricao}  ·  "
+                 f"{pessoa.get('nome', '')}",
+            font=ctk.CTkFont(size=13),
+            anchor="w"
+        ).pack(side="left", padx=10, pady=6)
+        
+        ctk.CTkLabel(
+            frame,
+            text=formatar_moeda(divisao.valor),
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color="#27ae60" if divisao.pago else "#e74c3c"
+        ).pack(side="right", padx=10)
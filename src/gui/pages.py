@@ -3,27 +3,78 @@ Páginas/Views da aplicação.
 """
 
 import customtkinter as ctk
-from typing import Callable, Optional
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime
 
-from .components import Card, ActionButton, ConfirmDialog
-from .dialogs import DialogoPessoa, DialogoConta, DialogoExcluirParcelas
+from .components import Card, ActionButton, ConfirmDialog, MessageDialog, GraficoBarras
+from .dialogs import (
+    DialogoPessoa, DialogoConta, DialogoExcluirParcelas, DialogoEditarParcelas,
+    DialogoEditarRecorrencia, DialogoDivisoesCelula
+)
 from .dialogo_importacao import DialogoImportacao
-from src.services import ContaService, PessoaService, RelatorioService
+from src.services import (
+    ContaService, PessoaService, RelatorioService, DiagnosticoService, AcertoService
+)
 from src.services.importacao_service import ImportacaoService
 from src.services.conta_service import DadosConta
+from src.data import get_database
+from src.data.eventos import Evento, PessoaAlterada
+from src.data.instrumentacao import orcamento_consultas
 from src.utils.formatters import formatar_moeda, formatar_data
-from src.config.constants import MESES
+from src.config.constants import MESES, ATRASO_BUSCA_MS, MESES_PROJECAO
 
 
-class BasePage(ctk.CTkFrame):
-    """Classe base para páginas."""
+class BasePage(ctk.CTkFrame, ABC):
+    """
+    Classe base para páginas.
+    A página assina os eventos de alteração de EVENTOS e se recarrega
+    sozinha (uma vez por rodada do loop, por mais eventos que cheguem)
+    quando a alteração afeta o mês exibido. Toda página implementa
+    carregar(), chamado por essa recarga.
+    """
+    
+    EVENTOS: Tuple[type, ...] = (Evento,)
     
     def __init__(self, parent, app):
         super().__init__(parent, fg_color="transparent")
         self.app = app
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
+        
+        self._recarga_agendada = None
+        barramento = get_database().eventos
+        self._cancelamentos = [
+            barramento.inscrever(tipo, self._ao_alterar) for tipo in self.EVENTOS
+        ]
+    
+    @abstractmethod
+    def carregar(self):
+        """Carrega/recarrega a página."""
+        pass
+    
+    def _afetada_por(self, evento: Evento) -> bool:
+        """Indica se o evento altera os dados exibidos (por padrão, os do mês)."""
+        return evento.afeta_periodo(self.app.mes_atual, self.app.ano_atual)
+    
+    def _ao_alterar(self, evento: Evento):
+        if not self._afetada_por(evento):
+            return
+        if self._recarga_agendada is None:
+            self._recarga_agendada = self.after_idle(self._recarregar)
+    
+    def _recarregar(self):
+        self._recarga_agendada = None
+        self.carregar()
+    
+    def destroy(self):
+        for cancelar in self._cancelamentos:
+            cancelar()
+        self._cancelamentos = []
+        if self._recarga_agendada is not None:
+            self.after_cancel(self._recarga_agendada)
+            self._recarga_agendada = None
+        super().destroy()
 
 
 class DashboardPage(BasePage):
@@ -32,13 +83,23 @@ class DashboardPage(BasePage):
     def __init__(self, parent, app):
         super().__init__(parent, app)
         
-        self.conta_service = ContaService()
         self.relatorio_service = RelatorioService()
+        self.meses_projecao = MESES_PROJECAO[0]
+        self._periodos_projecao = []
         
         self.carregar()
     
+    def _afetada_por(self, evento: Evento) -> bool:
+        return super()._afetada_por(evento) or any(
+            evento.afeta_periodo(mes, ano) for mes, ano in self._periodos_projecao
+        )
+    
+    @orcamento_consultas(3)
     def carregar(self):
-        """Carrega/recarrega o dashboard."""
+        """
+        Carrega/recarrega o dashboard: o painel do mês (resumo, categorias e
+        últimas contas), os totais por pessoa e a projeção, uma consulta cada.
+        """
         # Limpar widgets existentes
         for widget in self.winfo_children():
             widget.destroy()
@@ -56,10 +117,11 @@ class DashboardPage(BasePage):
         # Container com scroll
         container = ctk.CTkScrollableFrame(self, fg_color="transparent")
         container.grid(row=1, column=0, sticky="nsew")
-        container.grid_columnconfigure((0, 1, 2), weight=1)
+        container.grid_columnconfigure((0, 1, 2, 3), weight=1)
         
         # Resumo geral
-        resumo = self.relatorio_service.get_resumo_geral(mes, ano)
+        painel = self.relatorio_service.get_painel_mes(mes, ano)
+        resumo = painel['resumo']
         
         # Cards
         Card(
@@ -83,6 +145,13 @@ class DashboardPage(BasePage):
             "#e74c3c"
         ).grid(row=0, column=2, sticky="nsew", padx=5, pady=5)
         
+        Card(
+            container,
+            "⚠️ Atrasado",
+            formatar_moeda(resumo.get('valor_atrasado', 0)),
+            "#f39c12"
+        ).grid(row=0, column=3, sticky="nsew", padx=5, pady=5)
+        
         # Totais por pessoa
         frame_pessoas = ctk.CTkFrame(container)
         frame_pessoas.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=20, padx=(0, 10))
@@ -107,7 +176,7 @@ class DashboardPage(BasePage):
         
         # Gastos por categoria
         frame_cat = ctk.CTkFrame(container)
-        frame_cat.grid(row=1, column=2, sticky="nsew", pady=20, padx=(10, 0))
+        frame_cat.grid(row=1, column=2, columnspan=2, sticky="nsew", pady=20, padx=(10, 0))
         
         ctk.CTkLabel(
             frame_cat,
@@ -115,15 +184,13 @@ class DashboardPage(BasePage):
             font=ctk.CTkFont(size=18, weight="bold")
         ).pack(anchor="w", padx=20, pady=15)
         
-        categorias = self.relatorio_service.get_gastos_por_categoria(mes, ano)
-        
-        for cat in categorias:
+        for cat in painel['categorias']:
             if cat.get('total', 0) > 0:
                 self._criar_linha_categoria(frame_cat, cat)
         
         # Últimas contas
         frame_contas = ctk.CTkFrame(container)
-        frame_contas.grid(row=2, column=0, columnspan=3, sticky="nsew", pady=10)
+        frame_contas.grid(row=2, column=0, columnspan=4, sticky="nsew", pady=10)
         
         header = ctk.CTkFrame(frame_contas, fg_color="transparent")
         header.pack(fill="x", padx=20, pady=15)
@@ -142,7 +209,7 @@ class DashboardPage(BasePage):
             command=self.app.adicionar_conta
         ).pack(side="right")
         
-        contas = self.conta_service.listar_contas(mes=mes, ano=ano)[:5]
+        contas = painel['contas']
         
         for conta in contas:
             self._criar_linha_conta(frame_contas, conta)
@@ -153,6 +220,52 @@ class DashboardPage(BasePage):
                 text="Nenhuma conta neste período",
                 text_color="gray"
             ).pack(pady=20)
+        
+        # Projeção dos compromissos futuros
+        frame_projecao = ctk.CTkFrame(container)
+        frame_projecao.grid(row=3, column=0, columnspan=4, sticky="nsew", pady=10)
+        
+        header = ctk.CTkFrame(frame_projecao, fg_color="transparent")
+        header.pack(fill="x", padx=20, pady=15)
+        
+        ctk.CTkLabel(
+            header,
+            text="🔮 Compromissos Futuros",
+            font=ctk.CTkFont(size=18, weight="bold")
+        ).pack(side="left")
+        
+        horizonte = ctk.CTkSegmentedButton(
+            header,
+            values=[f"{meses} meses" for meses in MESES_PROJECAO],
+            command=self._mudar_horizonte
+        )
+        horizonte.pack(side="right")
+        horizonte.set(f"{self.meses_projecao} meses")
+        
+        projecao = self.relatorio_service.get_projecao(self.meses_projecao)
+        self._periodos_projecao = projecao.meses
+        
+        GraficoBarras(
+            frame_projecao,
+            [f"{MESES[mes-1][:3]}/{ano % 100:02d}" for mes, ano in projecao.meses],
+            projecao.totais,
+            formatar=formatar_moeda
+        ).pack(fill="x", padx=20)
+        
+        ctk.CTkLabel(
+            frame_projecao,
+            text=f"Total: {formatar_moeda(sum(projecao.totais))}   ·   " + "   ·   ".join(
+                f"{pessoa['nome']}: {formatar_moeda(pessoa['total'])}"
+                for pessoa in projecao.por_pessoa
+            ),
+            font=ctk.CTkFont(size=13),
+            text_color="gray",
+            wraplength=850
+        ).pack(anchor="w", padx=20, pady=(5, 15))
+    
+    def _mudar_horizonte(self, valor: str):
+        self.meses_projecao = int(valor.split()[0])
+        self.carregar()
     
     def _criar_linha_pessoa(self, parent, pessoa: dict):
         frame = ctk.CTkFrame(parent, fg_color="transparent")
@@ -223,9 +336,10 @@ class DashboardPage(BasePage):
         ).pack(side="left", padx=5, fill="x", expand=True)
         
         status = conta.get('status', 'pendente')
+        icones_status = {'pago': "✅", 'atrasado': "⚠️"}
         ctk.CTkLabel(
             frame,
-            text="✅" if status == 'pago' else "⏳",
+            text=icones_status.get(status, "⏳"),
             font=ctk.CTkFont(size=14)
         ).pack(side="right", padx=5)
         
@@ -238,7 +352,11 @@ class DashboardPage(BasePage):
 
 
 class ContasPage(BasePage):
-    """Página de Contas."""
+    """
+    Página de Contas.
+    O cabeçalho e os filtros são montados uma vez; as alterações refazem
+    só a página exibida da lista, mantendo filtro, busca e cursor.
+    """
     
     def __init__(self, parent, app):
         super().__init__(parent, app)
@@ -246,25 +364,38 @@ class ContasPage(BasePage):
         self.conta_service = ContaService()
         self.pessoa_service = PessoaService()
         
+        self.status_atual = None
+        self.pagina = None
+        self._origem_pagina = (None, False)
+        
+        self._montar()
         self.carregar()
     
+    @orcamento_consultas(6)
     def carregar(self):
-        """Carrega/recarrega a página de contas."""
-        for widget in self.winfo_children():
-            widget.destroy()
-        
+        """Carrega a lista do mês exibido a partir da primeira página."""
         mes = self.app.mes_atual
         ano = self.app.ano_atual
         
+        self.label_titulo.configure(text=f"📋 Contas - {MESES[mes-1]}/{ano}")
+        self._carregar_lista(self.status_atual)
+    
+    def _recarregar(self):
+        self._recarga_agendada = None
+        self._carregar_lista(self.status_atual, *self._origem_pagina)
+    
+    def _montar(self):
+        """Monta cabeçalho, filtros, lista e paginação."""
         # Header
         header = ctk.CTkFrame(self, fg_color="transparent")
         header.grid(row=0, column=0, sticky="ew", pady=(0, 20))
         
-        ctk.CTkLabel(
+        self.label_titulo = ctk.CTkLabel(
             header,
-            text=f"📋 Contas - {MESES[mes-1]}/{ano}",
+            text="",
             font=ctk.CTkFont(size=24, weight="bold")
-        ).pack(side="left")
+        )
+        self.label_titulo.pack(side="left")
         
         ActionButton(
             header,
@@ -282,6 +413,15 @@ class ContasPage(BasePage):
             width=120,
             height=40,
             command=self._importar_fatura
+        ).pack(side="right", padx=(5, 0))
+        
+        ActionButton(
+            header,
+            text="✅ Pagar mês",
+            style="info",
+            width=120,
+            height=40,
+            command=self._pagar_mes
         ).pack(side="right")
         
         # Filtros
@@ -290,26 +430,85 @@ class ContasPage(BasePage):
         
         self.filtro_status = ctk.CTkSegmentedButton(
             filtro_frame,
-            values=["Todas", "Pendentes", "Pagas"],
+            values=["Todas", "Pendentes", "Atrasadas", "Pagas"],
             command=self._filtrar
         )
         self.filtro_status.pack(side="left")
         self.filtro_status.set("Todas")
         
+        self.entry_busca = ctk.CTkEntry(
+            filtro_frame,
+            placeholder_text="🔍 Buscar descrição ou observação",
+            width=280
+        )
+        self.entry_busca.pack(side="right")
+        self.entry_busca.bind("<KeyRelease>", self._agendar_busca)
+        self._busca_agendada = None
+        
         # Lista
         self.lista_frame = ctk.CTkScrollableFrame(self)
         self.lista_frame.grid(row=2, column=0, sticky="nsew")
+        self.grid_rowconfigure(1, weight=0)
+        self.grid_rowconfigure(2, weight=1)
+        
+        # Paginação
+        paginacao = ctk.CTkFrame(self, fg_color="transparent")
+        paginacao.grid(row=3, column=0, sticky="ew", pady=(10, 0))
+        
+        self.btn_proxima = ActionButton(
+            paginacao,
+            text="Próxima ▶",
+            style="secondary",
+            width=110,
+            command=lambda: self._carregar_lista(self.status_atual, self.pagina['cursor_fim'])
+        )
+        self.btn_proxima.pack(side="right")
         
-        self._carregar_lista()
+        self.label_paginacao = ctk.CTkLabel(
+            paginacao,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="gray"
+        )
+        self.label_paginacao.pack(side="right", padx=15)
+        
+        self.btn_anterior = ActionButton(
+            paginacao,
+            text="◀ Anterior",
+            style="secondary",
+            width=110,
+            command=lambda: self._carregar_lista(
+                self.status_atual, self.pagina['cursor_inicio'], anterior=True
+            )
+        )
+        self.btn_anterior.pack(side="right")
     
-    def _carregar_lista(self, status: str = None):
+    def _carregar_lista(self, status: str = None, cursor: tuple = None,
+                        anterior: bool = False):
         for widget in self.lista_frame.winfo_children():
             widget.destroy()
         
-        contas = self.conta_service.listar_contas(
+        self.status_atual = status
+        self._origem_pagina = (cursor, anterior)
+        self.pagina = self.conta_service.listar_contas_paginado(
             status=status,
             mes=self.app.mes_atual,
-            ano=self.app.ano_atual
+            ano=self.app.ano_atual,
+            cursor=cursor,
+            anterior=anterior,
+            texto=self.entry_busca.get()
+        )
+        contas = self.pagina['itens']
+        
+        # A página exibida esvaziou (ex: última conta paga no filtro de pendentes)
+        if not contas and cursor is not None:
+            self._carregar_lista(status)
+            return
+        
+        self.btn_anterior.configure(state="normal" if self.pagina['tem_anterior'] else "disabled")
+        self.btn_proxima.configure(state="normal" if self.pagina['tem_proxima'] else "disabled")
+        self.label_paginacao.configure(
+            text=f"{len(contas)} de {self.pagina['total']} conta(s)"
         )
         
         if not contas:
@@ -321,10 +520,12 @@ class ContasPage(BasePage):
             ).pack(pady=50)
             return
         
+        # Divisões da página inteira em uma consulta (não uma por conta)
+        divisoes = self.conta_service.get_divisoes_contas([c['id'] for c in contas])
         for conta in contas:
-            self._criar_item_conta(conta)
+            self._criar_item_conta(conta, divisoes[conta['id']])
     
-    def _criar_item_conta(self, conta: dict):
+    def _criar_item_conta(self, conta: dict, divisoes: List[dict]):
         frame = ctk.CTkFrame(self.lista_frame)
         frame.pack(fill="x", pady=5, padx=5)
         
@@ -355,9 +556,10 @@ class ContasPage(BasePage):
         ).pack(anchor="w")
         
         data = formatar_data(conta.get('data_vencimento', ''))
+        atraso = " • ⚠️ Atrasada" if conta.get('status') == 'atrasado' else ""
         ctk.CTkLabel(
             info,
-            text=f"{conta.get('categoria_nome', 'Sem categoria')} • Vencimento: {data or 'Não definido'}",
+            text=f"{conta.get('categoria_nome', 'Sem categoria')} • Vencimento: {data or 'Não definido'}{atraso}",
             font=ctk.CTkFont(size=12),
             text_color="gray",
             anchor="w"
@@ -405,7 +607,6 @@ class ContasPage(BasePage):
         ).pack(side="left", padx=2)
         
         # Divisões
-        divisoes = self.conta_service.get_divisoes_conta(conta['id'])
         if divisoes:
             div_frame = ctk.CTkFrame(frame, fg_color=("gray90", "gray15"))
             div_frame.pack(fill="x", padx=15, pady=(0, 10))
@@ -434,8 +635,23 @@ class ContasPage(BasePage):
                     font=ctk.CTkFont(size=12)
                 ).pack(side="right")
     
+    def _agendar_busca(self, event=None):
+        """Refaz a busca quando o usuário para de digitar."""
+        if self._busca_agendada:
+            self.after_cancel(self._busca_agendada)
+        self._busca_agendada = self.after(ATRASO_BUSCA_MS, self._buscar)
+    
+    def _buscar(self):
+        self._busca_agendada = None
+        self._carregar_lista(self.status_atual)
+    
     def _filtrar(self, valor: str):
-        status_map = {"Todas": None, "Pendentes": "pendente", "Pagas": "pago"}
+        status_map = {
+            "Todas": None,
+            "Pendentes": "pendente",
+            "Atrasadas": "atrasado",
+            "Pagas": "pago"
+        }
         self._carregar_lista(status_map.get(valor))
     
     def _adicionar_conta(self):
@@ -455,37 +671,109 @@ class ContasPage(BasePage):
                 categoria_id=result['categoria_id'],
                 observacao=result['observacao'],
                 gerar_parcelas_futuras=result['gerar_parcelas_futuras'],
-                divisoes=result['divisoes']
+                parcelas_virtuais=result.get('parcelas_virtuais', False),
+                divisoes=result['divisoes'],
+                pagador_id=result.get('pagador_id'),
+                recorrente=result.get('recorrente', False),
+                repetir_ate=result.get('repetir_ate')
             )
             
-            resultado = self.conta_service.criar_conta(dados)
-            
-            if resultado.sucesso:
-                self.carregar()
-                self.app.atualizar_dashboard()
+            self.conta_service.criar_conta(dados)
     
     def _editar_conta(self, conta: dict):
+        recorrencia = None
+        if conta.get('recorrencia_id'):
+            recorrencia = DialogoEditarRecorrencia(self.app, conta.get('descricao', '')).show()
+            if recorrencia == 'encerrar':
+                resultado = self.conta_service.encerrar_recorrencia(
+                    conta['recorrencia_id'], conta['data_vencimento']
+                )
+                MessageDialog(
+                    self.app,
+                    "Encerrar Recorrência",
+                    resultado.mensagem,
+                    "success" if resultado.sucesso else "error"
+                ).show()
+                return
+            elif recorrencia not in ('uma', 'seguintes'):
+                return
+        
         categorias = self.conta_service.listar_categorias()
         pessoas = self.pessoa_service.listar_todas()
         
         dialog = DialogoConta(self.app, categorias, pessoas, conta)
         result = dialog.show()
         
+        if result and recorrencia == 'seguintes':
+            # Esta conta recebe também o vencimento editado; a regra e as
+            # próximas contas geradas mantêm o dia delas
+            dados = self._dados_edicao(result)
+            resultado = self.conta_service.atualizar_conta(result['id'], dados)
+            if resultado.sucesso:
+                resultado = self.conta_service.atualizar_recorrencia(
+                    conta['recorrencia_id'], conta['data_vencimento'], dados
+                )
+            self._avisar_falha("Editar Recorrência", resultado)
+            return
+        
+        if result and conta.get('grupo_parcela_id') and conta.get('total_parcelas', 1) > 1:
+            opcao = DialogoEditarParcelas(
+                self.app,
+                conta.get('descricao', ''),
+                conta.get('parcela_atual', 1),
+                conta.get('total_parcelas', 1)
+            ).show()
+            
+            if opcao == 'seguintes':
+                resultado = self.conta_service.atualizar_grupo(
+                    conta['grupo_parcela_id'],
+                    conta.get('parcela_atual', 1),
+                    {
+                        'descricao': result['descricao'],
+                        'valor_total': result['valor_total'],
+                        'categoria_id': result['categoria_id'],
+                        'observacao': result['observacao']
+                    },
+                    result['divisoes']
+                )
+                # Vencimento e pagador não se propagam: valem só para esta parcela
+                if resultado.sucesso and (
+                    result['data_vencimento'] != conta.get('data_vencimento')
+                    or result.get('pagador_id') != conta.get('pagador_id')
+                ):
+                    resultado = self.conta_service.atualizar_conta(
+                        result['id'], self._dados_edicao(result)
+                    )
+                self._avisar_falha("Editar Parcelas", resultado)
+                return
+            elif opcao != 'uma':
+                return
+        
         if result:
-            dados = DadosConta(
-                descricao=result['descricao'],
-                valor_total=result['valor_total'],
-                parcela_atual=result['parcela_atual'],
-                total_parcelas=result['total_parcelas'],
-                data_vencimento=result['data_vencimento'],
-                categoria_id=result['categoria_id'],
-                observacao=result['observacao'],
-                divisoes=result['divisoes']
+            self._avisar_falha(
+                "Editar Conta",
+                self.conta_service.atualizar_conta(result['id'], self._dados_edicao(result))
             )
-            
-            self.conta_service.atualizar_conta(result['id'], dados)
-            self.carregar()
-            self.app.atualizar_dashboard()
+    
+    @staticmethod
+    def _dados_edicao(result: dict) -> DadosConta:
+        """Dados do diálogo de edição (sem geração de parcelas)."""
+        return DadosConta(
+            descricao=result['descricao'],
+            valor_total=result['valor_total'],
+            parcela_atual=result['parcela_atual'],
+            total_parcelas=result['total_parcelas'],
+            data_vencimento=result['data_vencimento'],
+            categoria_id=result['categoria_id'],
+            observacao=result['observacao'],
+            divisoes=result['divisoes'],
+            pagador_id=result.get('pagador_id')
+        )
+    
+    def _avisar_falha(self, titulo: str, resultado):
+        """Mostra a mensagem de erro de uma operação que falhou."""
+        if not resultado.sucesso:
+            MessageDialog(self.app, titulo, resultado.mensagem, "error").show()
     
     def _excluir_conta(self, conta: dict):
         # Verificar se faz parte de um grupo de parcelas
@@ -513,31 +801,37 @@ class ContasPage(BasePage):
                 return
             
             self.conta_service.excluir_conta(conta['id'])
-        
-        self.carregar()
-        self.app.atualizar_dashboard()
     
     def _marcar_paga(self, conta: dict):
         self.conta_service.marcar_paga(conta['id'])
-        self.carregar()
-        self.app.atualizar_dashboard()
+    
+    def _pagar_mes(self):
+        mes = self.app.mes_atual
+        ano = self.app.ano_atual
+        dialog = ConfirmDialog(
+            self.app,
+            "Pagar Mês",
+            f"Marcar todas as contas de {MESES[mes-1]}/{ano} como pagas?"
+        )
+        if not dialog.show():
+            return
+        
+        self.conta_service.marcar_pagas_periodo(mes, ano)
     
     def _importar_fatura(self):
         """Abre o diálogo de importação de fatura."""
         categorias = self.conta_service.listar_categorias()
         pessoas = self.pessoa_service.listar_todas()
         
-        dialog = DialogoImportacao(self.app, categorias, pessoas)
-        result = dialog.show()
-        
-        if result:
-            self.carregar()
-            self.app.atualizar_dashboard()
+        # As contas salvas pelo diálogo chegam à página como eventos
+        DialogoImportacao(self.app, categorias, pessoas).show()
 
 
 class PessoasPage(BasePage):
     """Página de Pessoas."""
     
+    EVENTOS = (PessoaAlterada,)
+    
     def __init__(self, parent, app):
         super().__init__(parent, app)
         
@@ -545,6 +839,7 @@ class PessoasPage(BasePage):
         
         self.carregar()
     
+    @orcamento_consultas(1)
     def carregar(self):
         """Carrega/recarrega a página de pessoas."""
         for widget in self.winfo_children():
@@ -632,9 +927,7 @@ class PessoasPage(BasePage):
         result = dialog.show()
         
         if result:
-            resultado = self.pessoa_service.criar(result['nome'], result['cor'])
-            if resultado.sucesso:
-                self.carregar()
+            self.pessoa_service.criar(result['nome'], result['cor'])
     
     def _editar_pessoa(self, pessoa: dict):
         dialog = DialogoPessoa(self.app, pessoa)
@@ -642,7 +935,6 @@ class PessoasPage(BasePage):
         
         if result:
             self.pessoa_service.atualizar(result['id'], result['nome'], result['cor'])
-            self.carregar()
     
     def _excluir_pessoa(self, pessoa: dict):
         dialog = ConfirmDialog(
@@ -653,7 +945,6 @@ class PessoasPage(BasePage):
         
         if dialog.show():
             self.pessoa_service.desativar(pessoa['id'])
-            self.carregar()
 
 
 class RelatoriosPage(BasePage):
@@ -663,9 +954,12 @@ class RelatoriosPage(BasePage):
         super().__init__(parent, app)
         
         self.relatorio_service = RelatorioService()
+        self.conta_service = ContaService()
+        self.acerto_service = AcertoService()
         
         self.carregar()
     
+    @orcamento_consultas(4)
     def carregar(self):
         """Carrega/recarrega a página de relatórios."""
         for widget in self.winfo_children():
@@ -724,6 +1018,41 @@ class RelatoriosPage(BasePage):
         for cat in categorias:
             if cat.get('total', 0) > 0:
                 self._criar_relatorio_categoria(frame_cat, cat, total_geral)
+        
+        # Acerto de contas
+        frame_acerto = ctk.CTkFrame(container)
+        frame_acerto.grid(row=1, column=0, columnspan=2, sticky="nsew", pady=10)
+        
+        acerto_header = ctk.CTkFrame(frame_acerto, fg_color="transparent")
+        acerto_header.pack(fill="x", padx=20, pady=15)
+        
+        ctk.CTkLabel(
+            acerto_header,
+            text="🤝 Acerto de Contas",
+            font=ctk.CTkFont(size=18, weight="bold")
+        ).pack(side="left")
+        
+        acerto = self.acerto_service.calcular(mes, ano)
+        
+        if acerto.transferencias:
+            ActionButton(
+                acerto_header,
+                text="✅ Acerto feito",
+                style="success",
+                width=130,
+                height=32,
+                command=self._quitar_acerto
+            ).pack(side="right")
+        
+        for transferencia in acerto.transferencias:
+            self._criar_transferencia(frame_acerto, transferencia)
+        
+        if not acerto.transferencias:
+            ctk.CTkLabel(
+                frame_acerto,
+                text="Ninguém deve nada neste mês",
+                text_color="gray"
+            ).pack(pady=20)
     
     def _criar_relatorio_pessoa(self, parent, pessoa: dict):
         frame = ctk.CTkFrame(parent, fg_color=("gray85", "gray20"))
@@ -781,6 +1110,61 @@ class RelatoriosPage(BasePage):
             font=ctk.CTkFont(size=14, weight="bold"),
             text_color="#e74c3c" if pendente > 0 else "#27ae60"
         ).pack(anchor="e")
+        
+        if pendente > 0:
+            ActionButton(
+                valores,
+                text="✅ Quitar mês",
+                style="success",
+                width=110,
+                height=28,
+                command=lambda p=pessoa: self._quitar_pessoa(p)
+            ).pack(anchor="e", pady=(5, 0))
+    
+    def _quitar_pessoa(self, pessoa: dict):
+        mes = self.app.mes_atual
+        ano = self.app.ano_atual
+        dialog = ConfirmDialog(
+            self.app,
+            "Quitar Mês",
+            f"Marcar todas as divisões de '{pessoa.get('nome', '')}' "
+            f"em {MESES[mes-1]}/{ano} como pagas?"
+        )
+        if not dialog.show():
+            return
+        
+        self.conta_service.marcar_divisoes_pagas(pessoa['id'], mes, ano)
+    
+    def _criar_transferencia(self, parent, transferencia):
+        frame = ctk.CTkFrame(parent, fg_color=("gray85", "gray20"))
+        frame.pack(fill="x", padx=20, pady=4)
+        
+        ctk.CTkLabel(
+            frame,
+            text=f"{transferencia.devedor}  →  {transferencia.credor}",
+            font=ctk.CTkFont(size=14),
+            anchor="w"
+        ).pack(side="left", padx=15, pady=8)
+        
+        ctk.CTkLabel(
+            frame,
+            text=formatar_moeda(transferencia.valor),
+            font=ctk.CTkFont(size=14, weight="bold")
+        ).pack(side="right", padx=15)
+    
+    def _quitar_acerto(self):
+        mes = self.app.mes_atual
+        ano = self.app.ano_atual
+        dialog = ConfirmDialog(
+            self.app,
+            "Acerto de Contas",
+            f"As transferências de {MESES[mes-1]}/{ano} foram feitas?\n"
+            f"Todas as divisões pendentes do mês serão marcadas como pagas."
+        )
+        if not dialog.show():
+            return
+        
+        self.acerto_service.quitar(mes, ano)
     
     def _criar_relatorio_categoria(self, parent, cat: dict, total_geral: float):
         frame = ctk.CTkFrame(parent, fg_color="transparent")
@@ -801,3 +1185,347 @@ class RelatoriosPage(BasePage):
             text=f"{formatar_moeda(valor)} ({percentual:.1f}%)",
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(side="right")
+
+
+class PivotPage(BasePage):
+    """
+    Página do pivot: divisões do ano por duas dimensões (pessoa, categoria
+    ou mês), com totais; clicar em uma célula lista as divisões dela.
+    """
+    
+    DIMENSOES = {"Pessoa": 'pessoa', "Categoria": 'categoria', "Mês": 'mes'}
+    
+    def __init__(self, parent, app):
+        super().__init__(parent, app)
+        
+        self.relatorio_service = RelatorioService()
+        self.linhas = 'pessoa'
+        self.colunas = 'mes'
+        self.apenas_pendentes = False
+        
+        self.carregar()
+    
+    def _afetada_por(self, evento: Evento) -> bool:
+        return any(evento.afeta_periodo(mes, self.app.ano_atual) for mes in range(1, 13))
+    
+    @property
+    def periodo(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        ano = self.app.ano_atual
+        return (1, ano), (12, ano)
+    
+    @orcamento_consultas(3)
+    def carregar(self):
+        """Carrega/recarrega o pivot do ano selecionado."""
+        for widget in self.winfo_children():
+            widget.destroy()
+        
+        # Header
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.grid(row=0, column=0, sticky="ew", pady=(0, 20))
+        
+        ctk.CTkLabel(
+            header,
+            text=f"🔀 Pivot - {self.app.ano_atual}",
+            font=ctk.CTkFont(size=24, weight="bold")
+        ).pack(side="left")
+        
+        nomes = {dimensao: nome for nome, dimensao in self.DIMENSOES.items()}
+        
+        filtro_pago = ctk.CTkSegmentedButton(
+            header,
+            values=["Todas", "Pendentes"],
+            command=self._filtrar
+        )
+        filtro_pago.pack(side="right")
+        filtro_pago.set("Pendentes" if self.apenas_pendentes else "Todas")
+        
+        for rotulo, atual, comando in (("Colunas:", self.colunas, self._mudar_colunas),
+                                       ("Linhas:", self.linhas, self._mudar_linhas)):
+            combo = ctk.CTkComboBox(
+                header, values=list(self.DIMENSOES), width=120, command=comando
+            )
+            combo.set(nomes[atual])
+            combo.pack(side="right", padx=(0, 15))
+            ctk.CTkLabel(header, text=rotulo, font=ctk.CTkFont(size=13)).pack(side="right", padx=5)
+        
+        # Tabela
+        tabela = ctk.CTkScrollableFrame(self, fg_color="transparent")
+        tabela.grid(row=1, column=0, sticky="nsew")
+        
+        pivot = self.relatorio_service.get_pivot(
+            self.linhas, self.colunas, *self.periodo, self.apenas_pendentes
+        )
+        
+        if not pivot.rotulos_linhas:
+            ctk.CTkLabel(
+                tabela,
+                text="Nenhuma divisão no período",
+                font=ctk.CTkFont(size=16),
+                text_color="gray"
+            ).grid(row=0, column=0, pady=50)
+            return
+        
+        negrito = ctk.CTkFont(size=12, weight="bold")
+        for j, (_, texto) in enumerate(pivot.rotulos_colunas, start=1):
+            ctk.CTkLabel(tabela, text=texto, font=negrito).grid(row=0, column=j, padx=4, pady=4)
+        ctk.CTkLabel(tabela, text="Total", font=negrito).grid(
+            row=0, column=len(pivot.rotulos_colunas) + 1, padx=4, pady=4
+        )
+        
+        for i, ((chave_linha, texto), valores) in enumerate(
+            zip(pivot.rotulos_linhas, pivot.valores), start=1
+        ):
+            ctk.CTkLabel(tabela, text=texto, font=negrito, anchor="w").grid(
+                row=i, column=0, padx=(0, 10), pady=2, sticky="w"
+            )
+            for j, ((chave_coluna, _), valor) in enumerate(
+                zip(pivot.rotulos_colunas, valores), start=1
+            ):
+                self._criar_celula(tabela, i, j, valor, chave_linha, chave_coluna)
+            ctk.CTkLabel(tabela, text=formatar_moeda(pivot.totais_linhas[i - 1]), font=negrito).grid(
+                row=i, column=len(valores) + 1, padx=4, pady=2, sticky="e"
+            )
+        
+        linha_total = len(pivot.rotulos_linhas) + 1
+        ctk.CTkLabel(tabela, text="Total", font=negrito, anchor="w").grid(
+            row=linha_total, column=0, pady=(8, 0), sticky="w"
+        )
+        for j, total in enumerate(pivot.totais_colunas + [pivot.total], start=1):
+            ctk.CTkLabel(tabela, text=formatar_moeda(total), font=negrito).grid(
+                row=linha_total, column=j, padx=4, pady=(8, 0), sticky="e"
+            )
+    
+    def _criar_celula(self, parent, linha: int, coluna: int, valor: float,
+                      chave_linha, chave_coluna):
+        if not valor:
+            ctk.CTkLabel(parent, text="–", text_color="gray").grid(row=linha, column=coluna)
+            return
+        
+        ctk.CTkButton(
+            parent,
+            text=formatar_moeda(valor),
+            font=ctk.CTkFont(size=12),
+            width=90,
+            height=26,
+            fg_color="transparent",
+            text_color=("gray10", "gray90"),
+            hover_color=("gray75", "gray25"),
+            anchor="e",
+            command=lambda: self._detalhar(chave_linha, chave_coluna)
+        ).grid(row=linha, column=coluna, padx=2, pady=2, sticky="e")
+    
+    def _detalhar(self, chave_linha, chave_coluna):
+        divisoes = self.relatorio_service.get_divisoes_celula(
+            self.linhas, self.colunas, chave_linha, chave_coluna, *self.periodo,
+            self.apenas_pendentes
+        )
+        DialogoDivisoesCelula(self.app, "Divisões da célula", divisoes).show()
+    
+    def _mudar_linhas(self, nome: str):
+        dimensao = self.DIMENSOES[nome]
+        if dimensao == self.colunas:
+            self.colunas = self.linhas
+        self.linhas = dimensao
+        self.carregar()
+    
+    def _mudar_colunas(self, nome: str):
+        dimensao = self.DIMENSOES[nome]
+        if dimensao == self.linhas:
+            self.linhas = self.colunas
+        self.colunas = dimensao
+        self.carregar()
+    
+    def _filtrar(self, valor: str):
+        self.apenas_pendentes = valor == "Pendentes"
+        self.carregar()
+
+
+class DiagnosticoPage(BasePage):
+    """Página de diagnóstico das consultas ao banco."""
+    
+    EVENTOS = ()
+    
+    def __init__(self, parent, app):
+        super().__init__(parent, app)
+        
+        self.diagnostico_service = DiagnosticoService()
+        
+        self.carregar()
+    
+    @orcamento_consultas(0)
+    def carregar(self):
+        """Carrega/recarrega as métricas de consulta."""
+        for widget in self.winfo_children():
+            widget.destroy()
+        
+        # Header
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.grid(row=0, column=0, sticky="ew", pady=(0, 20))
+        
+        ctk.CTkLabel(
+            header,
+            text="🩺 Diagnóstico",
+            font=ctk.CTkFont(size=24, weight="bold")
+        ).pack(side="left")
+        
+        ActionButton(
+            header,
+            text="💾 Exportar JSON",
+            style="primary",
+            width=140,
+            height=40,
+            command=self._exportar
+        ).pack(side="right")
+        
+        ActionButton(
+            header,
+            text="🧹 Zerar",
+            style="secondary",
+            width=100,
+            height=40,
+            command=self._zerar
+        ).pack(side="right", padx=10)
+        
+        ActionButton(
+            header,
+            text="🔄 Atualizar",
+            style="secondary",
+            width=110,
+            height=40,
+            command=self.carregar
+        ).pack(side="right")
+        
+        container = ctk.CTkScrollableFrame(self, fg_color="transparent")
+        container.grid(row=1, column=0, sticky="nsew")
+        
+        if not self.diagnostico_service.ativo:
+            ctk.CTkLabel(
+                container,
+                text="Instrumentação desativada (database.instrumentar em config.json)",
+                font=ctk.CTkFont(size=16),
+                text_color="gray"
+            ).pack(pady=50)
+            return
+        
+        resumo = self.diagnostico_service.get_resumo()
+        totais = resumo['totais']
+        
+        # Totais
+        cards = ctk.CTkFrame(container, fg_color="transparent")
+        cards.pack(fill="x", pady=(0, 15))
+        cards.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        
+        for i, (titulo, valor) in enumerate([
+            ("Consultas", str(totais['execucoes'])),
+            ("Comandos distintos", str(totais['comandos_distintos'])),
+            ("Tempo total", f"{totais['tempo_total_ms']:.0f} ms"),
+            (f"Lentas (≥ {totais['limite_lenta_ms']:g} ms)", str(totais['consultas_lentas'])),
+        ]):
+            Card(cards, titulo, valor).grid(row=0, column=i, padx=5, sticky="ew")
+        
+        # Comandos por tempo total
+        frame_consultas = ctk.CTkFrame(container)
+        frame_consultas.pack(fill="x", pady=10)
+        
+        ctk.CTkLabel(
+            frame_consultas,
+            text=f"⏱️ Comandos por tempo total (desde {formatar_data(totais['desde'][:10])})",
+            font=ctk.CTkFont(size=18, weight="bold")
+        ).pack(anchor="w", padx=20, pady=15)
+        
+        for consulta in resumo['consultas']:
+            self._criar_linha_consulta(frame_consultas, consulta)
+        
+        if not resumo['consultas']:
+            ctk.CTkLabel(
+                frame_consultas,
+                text="Nenhuma consulta registrada",
+                text_color="gray"
+            ).pack(pady=20)
+        
+        # Consultas lentas
+        frame_lentas = ctk.CTkFrame(container)
+        frame_lentas.pack(fill="x", pady=10)
+        
+        ctk.CTkLabel(
+            frame_lentas,
+            text="🐢 Consultas lentas",
+            font=ctk.CTkFont(size=18, weight="bold")
+        ).pack(anchor="w", padx=20, pady=15)
+        
+        for lenta in resumo['lentas']:
+            self._criar_linha_lenta(frame_lentas, lenta)
+        
+        if not resumo['lentas']:
+            ctk.CTkLabel(
+                frame_lentas,
+                text="Nenhuma consulta acima do limite",
+                text_color="gray"
+            ).pack(pady=20)
+    
+    def _criar_linha_consulta(self, parent, consulta: dict):
+        frame = ctk.CTkFrame(parent, fg_color=("gray85", "gray20"))
+        frame.pack(fill="x", padx=20, pady=4)
+        
+        ctk.CTkLabel(
+            frame,
+            text=(f"{consulta['execucoes']}x  ·  total {consulta['tempo_total_ms']:.1f} ms  ·  "
+                  f"p50 {consulta['p50_ms']:.2f}  p95 {consulta['p95_ms']:.2f}  "
+                  f"p99 {consulta['p99_ms']:.2f} ms  ·  {consulta['linhas']} linhas"),
+            font=ctk.CTkFont(size=13, weight="bold"),
+            anchor="w"
+        ).pack(fill="x", padx=15, pady=(8, 0))
+        
+        ctk.CTkLabel(
+            frame,
+            text=consulta['sql'][:300],
+            font=ctk.CTkFont(size=11),
+            text_color="gray",
+            anchor="w",
+            justify="left",
+            wraplength=850
+        ).pack(fill="x", padx=15, pady=(0, 8))
+    
+    def _criar_linha_lenta(self, parent, lenta: dict):
+        frame = ctk.CTkFrame(parent, fg_color=("gray85", "gray20"))
+        frame.pack(fill="x", padx=20, pady=4)
+        
+        ctk.CTkLabel(
+            frame,
+            text=f"{lenta['quando'][11:]}  ·  {lenta['duracao_ms']:.1f} ms  ·  {lenta['linhas']} linhas",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            text_color="#e74c3c",
+            anchor="w"
+        ).pack(fill="x", padx=15, pady=(8, 0))
+        
+        ctk.CTkLabel(
+            frame,
+            text=lenta['sql'][:300],
+            font=ctk.CTkFont(size=11),
+            anchor="w",
+            justify="left",
+            wraplength=850
+        ).pack(fill="x", padx=15)
+        
+        if lenta['plano']:
+            ctk.CTkLabel(
+                frame,
+                text="\n".join(lenta['plano']),
+                font=ctk.CTkFont(family="Courier", size=11),
+                text_color="gray",
+                anchor="w",
+                justify="left"
+            ).pack(fill="x", padx=15, pady=(2, 8))
+    
+    def _zerar(self):
+        self.diagnostico_service.zerar()
+        self.carregar()
+    
+    def _exportar(self):
+        resultado = self.diagnostico_service.exportar_json()
+        MessageDialog(
+            self.app,
+            "Exportar Métricas",
+            resultado.mensagem,
+            "success" if resultado.sucesso else "error"
+        ).show()
@@ -6,10 +6,16 @@ from .conta_service import ContaService
 from .pessoa_service import PessoaService
 from .relatorio_service import RelatorioService
 from .importacao_service import ImportacaoService
+from .diagnostico_service import DiagnosticoService
+from .analise_service import AnaliseService
+from .acerto_service import AcertoService
 
 __all__ = [
     'ContaService',
     'PessoaService',
     'RelatorioService',
-    'ImportacaoService'
+    'ImportacaoService',
+    'DiagnosticoService',
+    'AnaliseService',
+    'AcertoService'
 ]
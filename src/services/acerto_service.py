@@ -0,0 +1,157 @@
+"""
+Serviço de acerto de contas entre as pessoas.
+"""
+
+import heapq
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.data.repositories import DivisaoRepository, PlanoParcelaRepository
+from src.data.filtros import FiltroContas, intervalo_mes
+from src.data.referencias import get_referencias
+from src.data.instrumentacao import orcamento_consultas
+from src.services.conta_service import ResultadoOperacao
+from src.services.relatorio_service import em_cache, get_cache_relatorios
+from src.config.constants import NOME_DONO
+
+
+@dataclass
+class Transferencia:
+    """Pagamento de um participante a outro (ID None: o dono do app)."""
+    devedor_id: Optional[int]
+    devedor: str
+    credor_id: Optional[int]
+    credor: str
+    valor: float
+
+
+@dataclass
+class Acerto:
+    """Saldos líquidos de um período e as transferências que os zeram."""
+    mes: Optional[int]
+    ano: Optional[int]
+    saldos: List[Dict]
+    transferencias: List[Transferencia]
+
+
+def simplificar_dividas(saldos: Dict[Any, float]) -> List[Tuple[Any, Any, float]]:
+    """
+    Transferências (devedor, credor, valor) que zeram os saldos líquidos
+    (positivo: a receber). A cada passo o maior devedor paga ao maior
+    credor o menor dos dois valores e quem ainda tem saldo volta à fila:
+    cada passo zera ao menos um participante, então são no máximo n - 1
+    transferências, em O(n log n). Os valores são somados em centavos.
+    """
+    credores = []
+    devedores = []
+    for ordem, (chave, saldo) in enumerate(saldos.items()):
+        centavos = round(saldo * 100)
+        if centavos > 0:
+            credores.append((-centavos, ordem, chave))
+        elif centavos < 0:
+            devedores.append((centavos, ordem, chave))
+    heapq.heapify(credores)
+    heapq.heapify(devedores)
+    
+    transferencias = []
+    while credores and devedores:
+        credito, ordem_credor, credor = heapq.heappop(credores)
+        debito, ordem_devedor, devedor = heapq.heappop(devedores)
+        valor = min(-credito, -debito)
+        transferencias.append((devedor, credor, valor / 100))
+        if -credito > valor:
+            heapq.heappush(credores, (credito + valor, ordem_credor, credor))
+        if -debito > valor:
+            heapq.heappush(devedores, (debito + valor, ordem_devedor, devedor))
+    return transferencias
+
+
+class AcertoService:
+    """
+    Acerto de contas: a partir das divisões pendentes, calcula quanto cada
+    participante tem a receber ou a pagar (quem pagou a conta recebe as
+    divisões dela) e o menor conjunto de transferências que zera todos.
+    
+    Sem mês e ano, o acerto considera tudo o que vence até o fim do mês
+    atual (parcelas futuras ainda não são devidas).
+    """
+    
+    def __init__(self):
+        self.divisao_repo = DivisaoRepository()
+        self.plano_repo = PlanoParcelaRepository()
+        self.referencias = get_referencias()
+        self.cache = get_cache_relatorios()
+    
+    @orcamento_consultas(2)
+    def calcular(self, mes: int = None, ano: int = None) -> Acerto:
+        """
+        Saldos (do maior credor ao maior devedor) e transferências do período.
+        As datas são resolvidas antes do cache (sem mês e ano, o período
+        depende do dia) e o resultado é uma cópia do guardado nele.
+        """
+        filtro = self._filtro(mes, ano)
+        acerto = self._calcular(mes, ano, filtro.data_inicio, filtro.data_fim)
+        return replace(
+            acerto,
+            saldos=[dict(saldo) for saldo in acerto.saldos],
+            transferencias=[replace(t) for t in acerto.transferencias]
+        )
+    
+    @em_cache()
+    def _calcular(self, mes: Optional[int], ano: Optional[int],
+                  data_inicio: Optional[str], data_fim: str) -> Acerto:
+        filtro = FiltroContas(data_inicio=data_inicio, data_fim=data_fim)
+        saldos = {
+            s['pessoa_id']: s['saldo']
+            for s in self.divisao_repo.get_saldos(filtro) if s['saldo']
+        }
+        
+        return Acerto(
+            mes=mes,
+            ano=ano,
+            saldos=sorted(
+                (
+                    {'pessoa_id': pessoa_id, 'nome': self._nome(pessoa_id), 'saldo': saldo}
+                    for pessoa_id, saldo in saldos.items()
+                ),
+                key=lambda s: s['saldo'], reverse=True
+            ),
+            transferencias=[
+                Transferencia(devedor, self._nome(devedor), credor, self._nome(credor), valor)
+                for devedor, credor, valor in simplificar_dividas(saldos)
+            ]
+        )
+    
+    @orcamento_consultas(4)
+    def quitar(self, mes: int = None, ano: int = None) -> ResultadoOperacao:
+        """
+        Registra o acerto feito: marca como pagas, em lote, todas as divisões
+        pendentes do período (as parcelas virtuais são materializadas antes).
+        """
+        filtro = self._filtro(mes, ano)
+        try:
+            with self.divisao_repo.db.transacao():
+                self.plano_repo.materializar_periodo(filtro.data_inicio, filtro.data_fim)
+                alteradas = self.divisao_repo.marcar_pagas(filtro)
+            
+            return ResultadoOperacao(
+                True,
+                f"{alteradas} divisão(ões) marcada(s) como paga(s)",
+                {'divisoes_alteradas': alteradas}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao quitar o acerto: {str(e)}")
+    
+    @staticmethod
+    def _filtro(mes: Optional[int], ano: Optional[int]) -> FiltroContas:
+        if mes and ano:
+            return FiltroContas.do_mes(mes, ano)
+        hoje = date.today()
+        return FiltroContas(data_fim=intervalo_mes(hoje.month, hoje.year)[1])
+    
+    def _nome(self, pessoa_id: Optional[int]) -> str:
+        if pessoa_id is None:
+            return NOME_DONO
+        pessoa = self.referencias.pessoa(pessoa_id)
+        return pessoa['nome'] if pessoa else f"Pessoa {pessoa_id}"
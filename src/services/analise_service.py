@@ -0,0 +1,122 @@
+"""
+Serviço de análises de vários meses/anos sobre a base colunar.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+from src.data.colunar import (
+    PAGO, SEM_CATEGORIA, get_base_colunar, indice_mes, periodo_do_indice,
+    contar_por, percentis, pivotar, soma_movel, somar_nos, somar_por
+)
+from src.data.eventos import Periodo
+from src.data.referencias import get_referencias
+from src.data.instrumentacao import orcamento_consultas
+
+
+def _reais(centavos) -> float:
+    return round(int(centavos) / 100, 2)
+
+
+class AnaliseService:
+    """
+    Análises ad hoc (por mês, por categoria, somas móveis, percentis) sobre
+    contas e divisões de qualquer intervalo de meses, calculadas com NumPy
+    a partir da base colunar (BaseColunar), sem SQL por relatório.
+    
+    Períodos são (mes, ano), inclusive nas duas pontas. Com pessoa_id, os
+    valores são os das divisões da pessoa; sem, os das contas.
+    """
+    
+    def __init__(self):
+        self.base = get_base_colunar()
+        self.referencias = get_referencias()
+    
+    @orcamento_consultas(2)
+    def totais_por_mes(self, inicio: Periodo, fim: Periodo, pessoa_id: int = None,
+                       categoria_id: int = None) -> List[Dict]:
+        """Total, pago e pendente de cada mês do intervalo (inclusive sem valores)."""
+        linhas = self._selecionar(inicio, fim, pessoa_id, categoria_id)
+        meses = range(indice_mes(inicio), indice_mes(fim) + 1)
+        _, _, matriz = pivotar(
+            linhas['mes'], self._pagas(linhas, pessoa_id), linhas['centavos'],
+            rotulos_linhas=meses, rotulos_colunas=(False, True)
+        )
+        
+        totais = []
+        for indice, (pendente, pago) in zip(meses, matriz):
+            mes, ano = periodo_do_indice(indice)
+            totais.append({
+                'mes': mes,
+                'ano': ano,
+                'total': _reais(pendente + pago),
+                'pago': _reais(pago),
+                'pendente': _reais(pendente),
+            })
+        return totais
+    
+    @orcamento_consultas(3)
+    def totais_por_categoria(self, inicio: Periodo, fim: Periodo,
+                             pessoa_id: int = None) -> List[Dict]:
+        """Quantidade e total por categoria no intervalo, do maior total para o menor."""
+        linhas = self._selecionar(inicio, fim, pessoa_id)
+        categorias, somas = somar_por(linhas['categoria'], linhas['centavos'])
+        _, quantidades = contar_por(linhas['categoria'])
+        
+        totais = []
+        for categoria_id, soma, quantidade in zip(categorias.tolist(), somas, quantidades):
+            categoria = self.referencias.categoria(categoria_id) or {}
+            totais.append({
+                'categoria_id': None if categoria_id == SEM_CATEGORIA else categoria_id,
+                'nome': categoria.get('nome', 'Sem categoria'),
+                'icone': categoria.get('icone', ''),
+                'quantidade': int(quantidade),
+                'total': _reais(soma),
+            })
+        return sorted(totais, key=lambda t: t['total'], reverse=True)
+    
+    @orcamento_consultas(2)
+    def soma_movel_mensal(self, inicio: Periodo, fim: Periodo, janela: int = 3,
+                          pessoa_id: int = None, categoria_id: int = None) -> List[Dict]:
+        """
+        Total de cada mês e a soma dos últimos `janela` meses até ele.
+        Os meses anteriores ao início entram na soma dos primeiros meses.
+        """
+        antes = periodo_do_indice(indice_mes(inicio) - (janela - 1))
+        linhas = self._selecionar(antes, fim, pessoa_id, categoria_id)
+        meses = range(indice_mes(antes), indice_mes(fim) + 1)
+        mensais = somar_nos(linhas['mes'], linhas['centavos'], meses)
+        moveis = soma_movel(mensais, janela)
+        
+        return [
+            {'mes': m, 'ano': a, 'total': _reais(total), 'soma_movel': _reais(movel)}
+            for (m, a), total, movel in zip(
+                map(periodo_do_indice, meses[janela - 1:]), mensais[janela - 1:], moveis[janela - 1:]
+            )
+        ]
+    
+    @orcamento_consultas(2)
+    def percentis_valores(self, inicio: Periodo, fim: Periodo,
+                          ps: Sequence[float] = (50, 90, 99), pessoa_id: int = None,
+                          categoria_id: int = None) -> Dict[float, float]:
+        """Percentis dos valores das contas (ou divisões da pessoa) no intervalo."""
+        linhas = self._selecionar(inicio, fim, pessoa_id, categoria_id)
+        valores = percentis(linhas['centavos'], ps)
+        return {p: round(float(v) / 100, 2) for p, v in zip(ps, valores)}
+    
+    def _selecionar(self, inicio: Periodo, fim: Periodo, pessoa_id: Optional[int] = None,
+                    categoria_id: Optional[int] = None):
+        """Linhas (contas, ou divisões da pessoa) que vencem no intervalo."""
+        linhas = self.base.contas if pessoa_id is None else self.base.divisoes
+        selecao = (linhas['mes'] >= indice_mes(inicio)) & (linhas['mes'] <= indice_mes(fim))
+        if pessoa_id is not None:
+            selecao &= linhas['pessoa'] == pessoa_id
+        if categoria_id is not None:
+            selecao &= linhas['categoria'] == categoria_id
+        return linhas[selecao]
+    
+    @staticmethod
+    def _pagas(linhas, pessoa_id: Optional[int]):
+        """Indica, por linha, se a conta (ou a divisão da pessoa) está paga."""
+        if pessoa_id is None:
+            return linhas['status'] == PAGO
+        return linhas['pago']
@@ -3,15 +3,22 @@ Serviço de gestão de contas e parcelas.
 Contém a lógica de negócio para criação de contas parceladas.
 """
 
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from dataclasses import dataclass
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from uuid import uuid4
 
-from src.data.repositories import ContaRepository, DivisaoRepository, CategoriaRepository
+from src.data.repositories import (
+    ContaRepository, DivisaoRepository,
+    PlanoParcelaRepository, RecorrenciaRepository, MetadadosRepository, eh_parcela_virtual
+)
+from src.data.database import em_unidade_de_trabalho
+from src.data.filtros import FiltroContas, intervalo_mes
+from src.data.referencias import get_referencias
+from src.data.instrumentacao import orcamento_consultas
 from src.core.entities import Conta
-from src.config.constants import FORMATO_DATA_DB, FORMATO_DATA_BR, MAX_PARCELAS
+from src.config.constants import FORMATO_DATA_DB, FORMATO_DATA_BR, MAX_PARCELAS, TAMANHO_PAGINA
 
 
 @dataclass
@@ -33,7 +40,11 @@ class DadosConta:
     categoria_id: Optional[int] = None
     observacao: Optional[str] = None
     gerar_parcelas_futuras: bool = False
+    parcelas_virtuais: bool = False
     divisoes: List[Dict] = None
+    pagador_id: Optional[int] = None  # Pessoa que pagou a conta (None: você)
+    recorrente: bool = False  # Repete todo mês no dia do vencimento
+    repetir_ate: Optional[str] = None  # Último vencimento da recorrência (None: sem fim)
 
     def __post_init__(self):
         if self.divisoes is None:
@@ -46,29 +57,60 @@ class ContaService:
     def __init__(self):
         self.conta_repo = ContaRepository()
         self.divisao_repo = DivisaoRepository()
-        self.categoria_repo = CategoriaRepository()
+        self.referencias = get_referencias()
+        self.plano_repo = PlanoParcelaRepository()
+        self.recorrencia_repo = RecorrenciaRepository()
+        self.metadados_repo = MetadadosRepository()
     
+    @orcamento_consultas(1)
     def listar_contas(self, status: str = None, mes: int = None, 
-                       ano: int = None) -> List[dict]:
-        """Lista contas com filtros opcionais."""
-        return self.conta_repo.get_all(status, mes, ano)
+                       ano: int = None, campos: tuple = None,
+                       limite: int = None) -> List[dict]:
+        """
+        Lista contas com filtros opcionais. Informe campos e limite quando
+        só algumas colunas/linhas forem exibidas (ex: widgets do dashboard).
+        """
+        return self.conta_repo.get_all(status, mes, ano, campos, limite)
     
+    @orcamento_consultas(5)
+    def listar_contas_paginado(self, status: str = None, mes: int = None,
+                               ano: int = None, limite: int = TAMANHO_PAGINA,
+                               cursor: tuple = None, anterior: bool = False,
+                               texto: str = '') -> dict:
+        """
+        Lista uma página de contas (keyset). Use o cursor_fim da página
+        atual para avançar e o cursor_inicio (com anterior=True) para voltar.
+        Com texto, lista só as contas cuja descrição/observação o contém.
+        """
+        filtro = FiltroContas.do_mes(mes, ano, status=status)
+        if texto and texto.strip():
+            return self.conta_repo.buscar(texto, filtro, limite, cursor, anterior)
+        return self.conta_repo.get_pagina(filtro, limite, cursor, anterior)
+    
+    @orcamento_consultas(2)
+    @em_unidade_de_trabalho
     def obter_conta(self, conta_id: int) -> Optional[dict]:
         """Obtém uma conta pelo ID."""
         conta = self.conta_repo.get_by_id(conta_id)
         if conta:
-            conta['divisoes'] = self.divisao_repo.get_by_conta(conta_id)
+            # Cópia: a conta lida pode ser a do mapa de identidade
+            conta = {**conta, 'divisoes': self.divisao_repo.get_by_conta(conta_id)}
         return conta
     
+    @orcamento_consultas(1)
     def listar_categorias(self) -> List[dict]:
         """Lista todas as categorias."""
-        return self.categoria_repo.get_all()
+        return self.referencias.categorias()
     
+    @orcamento_consultas(6)
     def criar_conta(self, dados: DadosConta) -> ResultadoOperacao:
         """
         Cria uma nova conta.
         Se gerar_parcelas_futuras=True e total_parcelas > 1,
         gera automaticamente as parcelas para os meses seguintes.
+        Com parcelas_virtuais=True, grava apenas o plano de parcelamento
+        e as parcelas são geradas sob demanda. Com recorrente=True, grava
+        uma regra que gera a conta todo mês (veja materializar_recorrencias).
         """
         # Validações
         validacao = self._validar_dados_conta(dados)
@@ -76,15 +118,79 @@ class ContaService:
             return validacao
         
         try:
+            if dados.recorrente:
+                return self._criar_recorrencia(dados)
+            
             # Se for parcelada e deve gerar parcelas futuras
             if dados.gerar_parcelas_futuras and dados.total_parcelas > 1:
-                return self._criar_conta_parcelada(dados)
+                if dados.parcelas_virtuais:
+                    return self._criar_plano_parcelas(dados)
+                resultado = self._criar_conta_parcelada(dados)
             else:
-                return self._criar_conta_simples(dados)
+                resultado = self._criar_conta_simples(dados)
+            
+            # Conta lançada com vencimento passado já entra como atrasada
+            if self._data_base(dados) < date.today():
+                self.atualizar_atrasadas(forcar=True)
+            
+            return resultado
         
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao criar conta: {str(e)}")
     
+    @orcamento_consultas(5)
+    def criar_contas(self, lista: List[DadosConta]) -> ResultadoOperacao:
+        """
+        Cria várias contas de uma vez (ex: importação de fatura): as contas
+        e as divisões de todas são gravadas em lote, em uma única transação.
+        As inválidas ficam de fora e são listadas em dados['erros']. Contas
+        recorrentes ou com parcelas sob demanda devem usar criar_conta.
+        """
+        contas, grupos, validas, erros = [], [], [], []
+        for dados in lista:
+            validacao = self._validar_dados_conta(dados)
+            if validacao.sucesso and (dados.recorrente or dados.parcelas_virtuais):
+                validacao = ResultadoOperacao(False, "Não pode ser criada em lote")
+            if not validacao.sucesso:
+                erros.append(f"{dados.descricao}: {validacao.mensagem}")
+                continue
+            
+            linhas, divisoes = self._linhas_conta(dados)
+            grupos.append((len(contas), len(linhas), divisoes))
+            contas.extend(linhas)
+            validas.append(dados)
+        
+        if not validas:
+            return ResultadoOperacao(False, '; '.join(erros), {'erros': erros})
+        
+        try:
+            with self.conta_repo.db.transacao():
+                contas_criadas = self.conta_repo.create_batch(contas)
+                self.divisao_repo.create_batch([
+                    {
+                        'conta_id': contas_criadas[i],
+                        'pessoa_id': div['pessoa_id'],
+                        'valor': div['valor'],
+                        'percentual': div.get('percentual')
+                    }
+                    for inicio, quantidade, divisoes in grupos
+                    for i in range(inicio, inicio + quantidade)
+                    for div in divisoes
+                ])
+            
+            # Contas lançadas com vencimento passado já entram como atrasadas
+            if min(self._data_base(dados) for dados in validas) < date.today():
+                self.atualizar_atrasadas(forcar=True)
+        
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao criar contas: {str(e)}", {'erros': erros})
+        
+        return ResultadoOperacao(
+            True,
+            f"{len(validas)} conta(s) criada(s) com sucesso",
+            {'contas_ids': contas_criadas, 'criadas': len(validas), 'erros': erros}
+        )
+    
     def _validar_dados_conta(self, dados: DadosConta) -> ResultadoOperacao:
         """Valida os dados da conta."""
         if not dados.descricao or not dados.descricao.strip():
@@ -102,6 +208,21 @@ class ContaService:
         if dados.parcela_atual < 1 or dados.parcela_atual > dados.total_parcelas:
             return ResultadoOperacao(False, "Número da parcela inválido")
         
+        if (dados.pagador_id is not None and dados.parcelas_virtuais
+                and dados.gerar_parcelas_futuras and dados.total_parcelas > 1):
+            return ResultadoOperacao(
+                False, "Parcelas sob demanda não aceitam outro pagador além de você"
+            )
+        
+        if dados.recorrente and dados.total_parcelas > 1:
+            return ResultadoOperacao(False, "Uma conta recorrente não pode ser parcelada")
+        
+        if (dados.recorrente and dados.repetir_ate
+                and dados.repetir_ate < self._data_base(dados).strftime(FORMATO_DATA_DB)):
+            return ResultadoOperacao(
+                False, "O fim da recorrência deve ser depois do primeiro vencimento"
+            )
+        
         return ResultadoOperacao(True)
     
     def _criar_conta_simples(self, dados: DadosConta) -> ResultadoOperacao:
@@ -113,7 +234,8 @@ class ContaService:
             total_parcelas=dados.total_parcelas,
             data_vencimento=dados.data_vencimento,
             categoria_id=dados.categoria_id,
-            observacao=dados.observacao
+            observacao=dados.observacao,
+            pagador_id=dados.pagador_id
         )
         
         # Adicionar divisões
@@ -133,79 +255,182 @@ class ContaService:
         parcela atual e cria apenas as parcelas restantes (3/7, 4/7, 5/7, 6/7, 7/7).
         Cada parcela é criada para o mês seguinte com a mesma divisão.
         """
-        # Gerar ID único para o grupo de parcelas
-        grupo_id = str(uuid4())
+        contas, divisoes_parcela = self._linhas_conta(dados)
+        grupo_id = contas[0]['grupo_parcela_id']
+        parcela_inicial = dados.parcela_atual
+        parcelas_a_criar = len(contas)
         
-        # Calcular valor de cada parcela (valor_total já é o valor da parcela individual)
-        valor_parcela = dados.valor_total
+        # Persistir parcelas e divisões em uma única transação
+        with self.conta_repo.db.transacao():
+            contas_criadas = self.conta_repo.create_batch(contas)
+            self.divisao_repo.create_batch([
+                {
+                    'conta_id': conta_id,
+                    'pessoa_id': div['pessoa_id'],
+                    'valor': div['valor'],
+                    'percentual': div.get('percentual')
+                }
+                for conta_id in contas_criadas
+                for div in divisoes_parcela
+            ])
         
-        # Data base para vencimento
-        if dados.data_vencimento:
-            try:
-                data_base = datetime.strptime(dados.data_vencimento, FORMATO_DATA_DB).date()
-            except ValueError:
-                try:
-                    data_base = datetime.strptime(dados.data_vencimento, FORMATO_DATA_BR).date()
-                except ValueError:
-                    data_base = date.today()
+        # Mensagem informativa sobre as parcelas geradas
+        if parcela_inicial > 1:
+            mensagem = f"Conta parcelada criada! {parcelas_a_criar} parcelas geradas ({parcela_inicial}/{dados.total_parcelas} até {dados.total_parcelas}/{dados.total_parcelas})."
         else:
-            data_base = date.today()
+            mensagem = f"Conta parcelada criada com sucesso! {dados.total_parcelas} parcelas geradas."
         
-        contas_criadas = []
+        return ResultadoOperacao(
+            True,
+            mensagem,
+            {
+                'grupo_id': grupo_id,
+                'contas_ids': contas_criadas,
+                'total_parcelas': dados.total_parcelas,
+                'parcela_inicial': parcela_inicial,
+                'parcelas_criadas': parcelas_a_criar
+            }
+        )
+    
+    def _linhas_conta(self, dados: DadosConta) -> Tuple[List[dict], List[Dict]]:
+        """
+        Linhas de contas a gravar para dados (uma só, ou as parcelas
+        restantes quando gerar_parcelas_futuras) e a divisão de cada linha.
+        """
+        linha = {
+            'descricao': dados.descricao.strip(),
+            'valor_total': dados.valor_total,  # Valor da parcela individual
+            'parcela_atual': dados.parcela_atual,
+            'total_parcelas': dados.total_parcelas,
+            'data_vencimento': dados.data_vencimento,
+            'categoria_id': dados.categoria_id,
+            'observacao': dados.observacao,
+            'pagador_id': dados.pagador_id
+        }
+        if not (dados.gerar_parcelas_futuras and dados.total_parcelas > 1):
+            return [linha], [div for div in dados.divisoes if div.get('valor', 0) > 0]
+        
+        # Gerar ID único para o grupo de parcelas
+        grupo_id = str(uuid4())
+        
+        # Data base para vencimento
+        data_base = self._data_base(dados)
         
         # Determinar a partir de qual parcela começar
         # Se dados.parcela_atual = 3 e total = 7, criamos 3, 4, 5, 6, 7
+        parcelas_a_criar = dados.total_parcelas - dados.parcela_atual + 1
+        
+        # Datas de vencimento de todas as parcelas (offsets mensais sobre a data base)
+        contas = [
+            {
+                **linha,
+                'parcela_atual': dados.parcela_atual + i,
+                'data_vencimento': (data_base + relativedelta(months=i)).strftime(FORMATO_DATA_DB),
+                'grupo_parcela_id': grupo_id
+            }
+            for i in range(parcelas_a_criar)
+        ]
+        
+        # Todas as parcelas têm o mesmo valor, então a divisão é calculada uma vez só
+        divisoes_parcela = []
+        if dados.divisoes:
+            divisoes_parcela = [
+                div for div in self._calcular_divisoes_parcela(
+                    dados.divisoes,
+                    dados.valor_total,
+                    dados.valor_total
+                )
+                if div.get('valor', 0) > 0
+            ]
+        
+        return contas, divisoes_parcela
+    
+    def _criar_plano_parcelas(self, dados: DadosConta) -> ResultadoOperacao:
+        """
+        Cria um plano de parcelamento sem gerar as parcelas futuras no banco.
+        As parcelas aparecem nas listagens e relatórios através das views
+        e só são gravadas em contas quando forem pagas ou editadas.
+        """
+        grupo_id = str(uuid4())
         parcela_inicial = dados.parcela_atual
-        parcelas_a_criar = dados.total_parcelas - parcela_inicial + 1
         
-        # Criar cada parcela a partir da parcela atual
-        for i in range(parcelas_a_criar):
-            parcela_num = parcela_inicial + i
-            
-            # Calcular data de vencimento (adiciona meses a partir da data base)
-            data_vencimento = data_base + relativedelta(months=i)
-            
-            # Criar a conta/parcela
-            conta_id = self.conta_repo.create(
+        divisoes_parcela = []
+        if dados.divisoes:
+            divisoes_parcela = [
+                div for div in self._calcular_divisoes_parcela(
+                    dados.divisoes,
+                    dados.valor_total,
+                    dados.valor_total
+                )
+                if div.get('valor', 0) > 0
+            ]
+        
+        with self.plano_repo.db.transacao():
+            plano_id = self.plano_repo.create(
+                grupo_parcela_id=grupo_id,
                 descricao=dados.descricao.strip(),
-                valor_total=valor_parcela,  # Valor da parcela individual
-                parcela_atual=parcela_num,
+                valor_parcela=dados.valor_total,
+                parcela_inicial=parcela_inicial,
                 total_parcelas=dados.total_parcelas,
-                data_vencimento=data_vencimento.strftime(FORMATO_DATA_DB),
+                data_inicio=self._data_base(dados).strftime(FORMATO_DATA_DB),
                 categoria_id=dados.categoria_id,
-                observacao=dados.observacao,
-                grupo_parcela_id=grupo_id
+                observacao=dados.observacao
             )
-            
-            contas_criadas.append(conta_id)
-            
-            # Criar divisões com os mesmos percentuais/valores proporcionais
-            if dados.divisoes:
-                divisoes_parcela = self._calcular_divisoes_parcela(
-                    dados.divisoes, 
-                    valor_parcela,
-                    dados.valor_total
-                )
-                self._criar_divisoes(conta_id, divisoes_parcela)
-        
-        # Mensagem informativa sobre as parcelas geradas
-        if parcela_inicial > 1:
-            mensagem = f"Conta parcelada criada! {parcelas_a_criar} parcelas geradas ({parcela_inicial}/{dados.total_parcelas} até {dados.total_parcelas}/{dados.total_parcelas})."
-        else:
-            mensagem = f"Conta parcelada criada com sucesso! {dados.total_parcelas} parcelas geradas."
+            if divisoes_parcela:
+                self.plano_repo.create_divisoes(plano_id, divisoes_parcela)
         
         return ResultadoOperacao(
             True,
-            mensagem,
+            f"Plano de parcelamento criado! {dados.total_parcelas - parcela_inicial + 1} parcelas sob demanda.",
             {
                 'grupo_id': grupo_id,
-                'contas_ids': contas_criadas,
+                'plano_id': plano_id,
                 'total_parcelas': dados.total_parcelas,
-                'parcela_inicial': parcela_inicial,
-                'parcelas_criadas': parcelas_a_criar
+                'parcela_inicial': parcela_inicial
             }
         )
     
+    def _criar_recorrencia(self, dados: DadosConta) -> ResultadoOperacao:
+        """
+        Grava a regra de uma conta recorrente e gera as contas dela até o
+        mês atual; os meses seguintes são gerados quando forem exibidos.
+        """
+        data_base = self._data_base(dados)
+        
+        with self.recorrencia_repo.db.transacao():
+            recorrencia_id = self.recorrencia_repo.create(
+                descricao=dados.descricao.strip(),
+                valor=dados.valor_total,
+                dia=data_base.day,
+                data_inicio=data_base.strftime(FORMATO_DATA_DB),
+                data_fim=dados.repetir_ate,
+                categoria_id=dados.categoria_id,
+                observacao=dados.observacao,
+                pagador_id=dados.pagador_id
+            )
+            divisoes = [div for div in dados.divisoes if div.get('valor', 0) > 0]
+            if divisoes:
+                self.recorrencia_repo.create_divisoes(recorrencia_id, divisoes)
+            criadas = self.recorrencia_repo.materializar_ate(
+                date.today().strftime(FORMATO_DATA_DB)
+            )
+        
+        return ResultadoOperacao(
+            True,
+            f"Conta recorrente criada! {criadas} conta(s) gerada(s) até agora.",
+            {'recorrencia_id': recorrencia_id, 'contas_criadas': criadas}
+        )
+    
+    def _data_base(self, dados: DadosConta) -> date:
+        """Obtém a data de vencimento da primeira parcela (hoje, se inválida)."""
+        if dados.data_vencimento:
+            for formato in (FORMATO_DATA_DB, FORMATO_DATA_BR):
+                try:
+                    return datetime.strptime(dados.data_vencimento, formato).date()
+                except ValueError:
+                    pass
+        return date.today()
+    
     def _calcular_divisoes_parcela(self, divisoes_originais: List[Dict], 
                                     valor_parcela: float,
                                     valor_total: float) -> List[Dict]:
@@ -237,16 +462,19 @@ class ContaService:
         return divisoes_parcela
     
     def _criar_divisoes(self, conta_id: int, divisoes: List[Dict]):
-        """Cria as divisões de uma conta."""
-        for div in divisoes:
-            if div.get('valor', 0) > 0:
-                self.divisao_repo.create(
-                    conta_id=conta_id,
-                    pessoa_id=div['pessoa_id'],
-                    valor=div['valor'],
-                    percentual=div.get('percentual')
-                )
+        """Cria as divisões de uma conta (um único INSERT)."""
+        self.divisao_repo.create_batch([
+            {
+                'conta_id': conta_id,
+                'pessoa_id': div['pessoa_id'],
+                'valor': div['valor'],
+                'percentual': div.get('percentual')
+            }
+            for div in divisoes if div.get('valor', 0) > 0
+        ])
     
+    @orcamento_consultas(11)
+    @em_unidade_de_trabalho
     def atualizar_conta(self, conta_id: int, dados: DadosConta) -> ResultadoOperacao:
         """Atualiza uma conta existente."""
         conta = self.conta_repo.get_by_id(conta_id)
@@ -258,27 +486,109 @@ class ContaService:
             return validacao
         
         try:
-            self.conta_repo.update(
-                conta_id,
-                descricao=dados.descricao.strip(),
-                valor_total=dados.valor_total,
-                parcela_atual=dados.parcela_atual,
-                total_parcelas=dados.total_parcelas,
-                data_vencimento=dados.data_vencimento,
-                categoria_id=dados.categoria_id,
-                observacao=dados.observacao
-            )
+            # Materialização, edição e divisões: tudo ou nada
+            with self.conta_repo.db.transacao():
+                if eh_parcela_virtual(conta_id):
+                    conta_id = self.plano_repo.materializar(conta_id)
+                
+                self.conta_repo.update(
+                    conta_id,
+                    descricao=dados.descricao.strip(),
+                    valor_total=dados.valor_total,
+                    parcela_atual=dados.parcela_atual,
+                    total_parcelas=dados.total_parcelas,
+                    data_vencimento=dados.data_vencimento,
+                    categoria_id=dados.categoria_id,
+                    observacao=dados.observacao,
+                    pagador_id=dados.pagador_id
+                )
+                
+                # Atualizar divisões
+                self.divisao_repo.delete_by_conta(conta_id)
+                if dados.divisoes:
+                    self._criar_divisoes(conta_id, dados.divisoes)
             
-            # Atualizar divisões
-            self.divisao_repo.delete_by_conta(conta_id)
-            if dados.divisoes:
-                self._criar_divisoes(conta_id, dados.divisoes)
+            # O vencimento pode ter mudado: reavaliar atrasadas
+            self.atualizar_atrasadas(forcar=True)
             
             return ResultadoOperacao(True, "Conta atualizada com sucesso")
         
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao atualizar conta: {str(e)}")
     
+    # Campos que podem ser propagados para as parcelas de um grupo
+    CAMPOS_GRUPO = ('descricao', 'valor_total', 'categoria_id', 'observacao')
+    
+    @orcamento_consultas(13)
+    def atualizar_grupo(self, grupo_id: str, a_partir_de_parcela: int,
+                        campos: Dict, divisoes: Optional[List[Dict]] = None) -> ResultadoOperacao:
+        """
+        Propaga uma edição para todas as parcelas de um grupo a partir de
+        a_partir_de_parcela (inclusive), com um UPDATE por tabela e uma única
+        transação. Se o valor mudar sem novas divisões, as divisões existentes
+        são reescaladas mantendo a proporção de cada pessoa.
+        """
+        invalidos = set(campos) - set(self.CAMPOS_GRUPO)
+        if invalidos:
+            return ResultadoOperacao(False, f"Campos inválidos: {', '.join(sorted(invalidos))}")
+        
+        campos = dict(campos)
+        if 'descricao' in campos:
+            if not campos['descricao'] or not campos['descricao'].strip():
+                return ResultadoOperacao(False, "A descrição é obrigatória")
+            campos['descricao'] = campos['descricao'].strip()
+        
+        novo_valor = campos.get('valor_total')
+        if novo_valor is not None and novo_valor <= 0:
+            return ResultadoOperacao(False, "O valor deve ser maior que zero")
+        
+        if divisoes is not None and novo_valor is not None:
+            divisoes = self._calcular_divisoes_parcela(divisoes, novo_valor, novo_valor)
+        if divisoes is not None:
+            divisoes = [d for d in divisoes if d.get('valor', 0) > 0]
+        
+        virtuais = 0
+        try:
+            with self.conta_repo.db.transacao():
+                plano = self.plano_repo.get_by_grupo(grupo_id)
+                if plano:
+                    # Parcelas anteriores mantêm os dados antigos: materializa
+                    # antes de alterar o plano
+                    self.plano_repo.materializar_ate(plano['id'], a_partir_de_parcela - 1)
+                    virtuais = self.plano_repo.contar_virtuais(plano['id'], a_partir_de_parcela)
+                    
+                    if novo_valor is not None and divisoes is None:
+                        self.plano_repo.reajustar_divisoes(plano['id'], novo_valor)
+                    if divisoes is not None:
+                        self.plano_repo.replace_divisoes(plano['id'], divisoes)
+                    
+                    campos_plano = dict(campos)
+                    if 'valor_total' in campos_plano:
+                        campos_plano['valor_parcela'] = campos_plano.pop('valor_total')
+                    self.plano_repo.update(plano['id'], **campos_plano)
+                
+                if novo_valor is not None and divisoes is None:
+                    self.divisao_repo.reajustar_by_grupo(grupo_id, a_partir_de_parcela, novo_valor)
+                
+                # Gravadas e ainda virtuais (estas mudam junto com o plano)
+                alteradas = virtuais + self.conta_repo.update_by_grupo(
+                    grupo_id, a_partir_de_parcela, **campos
+                )
+                
+                if divisoes is not None:
+                    self.divisao_repo.replace_by_grupo(grupo_id, a_partir_de_parcela, divisoes)
+            
+            return ResultadoOperacao(
+                True,
+                "Parcelas atualizadas com sucesso",
+                {'contas_alteradas': alteradas}
+            )
+        
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao atualizar parcelas: {str(e)}")
+    
+    @orcamento_consultas(2)
+    @em_unidade_de_trabalho
     def excluir_conta(self, conta_id: int, excluir_grupo: bool = False) -> ResultadoOperacao:
         """
         Exclui uma conta.
@@ -297,6 +607,9 @@ class ContaService:
                     True, 
                     "Todas as parcelas foram excluídas"
                 )
+            elif eh_parcela_virtual(conta_id):
+                self.plano_repo.excluir_parcela(conta_id)
+                return ResultadoOperacao(True, "Conta excluída com sucesso")
             else:
                 self.conta_repo.delete(conta_id)
                 return ResultadoOperacao(True, "Conta excluída com sucesso")
@@ -304,6 +617,8 @@ class ContaService:
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao excluir conta: {str(e)}")
     
+    @orcamento_consultas(5)
+    @em_unidade_de_trabalho
     def marcar_paga(self, conta_id: int) -> ResultadoOperacao:
         """Marca uma conta como paga."""
         conta = self.conta_repo.get_by_id(conta_id)
@@ -311,15 +626,192 @@ class ContaService:
             return ResultadoOperacao(False, "Conta não encontrada")
         
         try:
+            if eh_parcela_virtual(conta_id):
+                conta_id = self.plano_repo.materializar(conta_id)
             self.conta_repo.marcar_pago(conta_id)
             return ResultadoOperacao(True, "Conta marcada como paga")
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao marcar conta: {str(e)}")
     
+    @orcamento_consultas(4)
+    def marcar_pagas_periodo(self, mes: int = None, ano: int = None,
+                             categoria_id: int = None) -> ResultadoOperacao:
+        """
+        Marca como pagas todas as contas de um mês e/ou categoria
+        com um único UPDATE. Sem mês, só as contas da categoria que vencem
+        até hoje (parcelas e recorrências futuras continuam pendentes).
+        Em dados retorna o número de contas alteradas e os períodos
+        afetados (None quando não há filtro de mês).
+        """
+        tem_periodo = bool(mes and ano)
+        if not tem_periodo and categoria_id is None:
+            return ResultadoOperacao(False, "Informe o mês ou a categoria")
+        
+        if tem_periodo:
+            inicio, fim = intervalo_mes(mes, ano)
+        else:
+            inicio, fim = None, (date.today() + timedelta(days=1)).strftime(FORMATO_DATA_DB)
+        
+        try:
+            with self.conta_repo.db.transacao():
+                self.plano_repo.materializar_periodo(inicio, fim, categoria_id=categoria_id)
+                alteradas = self.conta_repo.marcar_pagas(FiltroContas(
+                    categorias=categoria_id, data_inicio=inicio, data_fim=fim
+                ))
+            
+            return ResultadoOperacao(
+                True,
+                f"{alteradas} conta(s) marcada(s) como paga(s)",
+                {
+                    'contas_alteradas': alteradas,
+                    'periodos': [(mes, ano)] if tem_periodo else None
+                }
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao marcar contas: {str(e)}")
+    
+    @orcamento_consultas(4)
+    def marcar_divisoes_pagas(self, pessoa_id: int, mes: int, ano: int) -> ResultadoOperacao:
+        """Marca como pagas todas as divisões de uma pessoa no mês."""
+        try:
+            with self.conta_repo.db.transacao():
+                inicio, fim = intervalo_mes(mes, ano)
+                self.plano_repo.materializar_periodo(inicio, fim, pessoa_id=pessoa_id)
+                alteradas = self.divisao_repo.marcar_pagas_pessoa(pessoa_id, mes, ano)
+            
+            return ResultadoOperacao(
+                True,
+                f"{alteradas} divisão(ões) marcada(s) como paga(s)",
+                {'divisoes_alteradas': alteradas, 'periodos': [(mes, ano)]}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao marcar divisões: {str(e)}")
+    
+    @orcamento_consultas(6)
+    def quitar_grupo(self, grupo_id: str, ate_parcela: int) -> ResultadoOperacao:
+        """Marca como pagas as parcelas de um grupo até ate_parcela (inclusive)."""
+        try:
+            with self.conta_repo.db.transacao():
+                plano = self.plano_repo.get_by_grupo(grupo_id)
+                if plano:
+                    self.plano_repo.materializar_ate(plano['id'], ate_parcela)
+                alteradas = self.conta_repo.marcar_pagas_grupo(grupo_id, ate_parcela)
+                periodos = self.conta_repo.get_periodos_grupo(grupo_id, ate_parcela)
+            
+            return ResultadoOperacao(
+                True,
+                f"{alteradas} parcela(s) quitada(s)",
+                {'contas_alteradas': alteradas, 'periodos': periodos}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao quitar parcelas: {str(e)}")
+    
+    @orcamento_consultas(3)
+    def atualizar_atrasadas(self, forcar: bool = False) -> ResultadoOperacao:
+        """
+        Varredura de contas atrasadas (executada na inicialização e
+        periodicamente). Guarda a data da última varredura e não repete
+        o trabalho no mesmo dia, a menos que forcar=True.
+        """
+        hoje = date.today().strftime(FORMATO_DATA_DB)
+        
+        if not forcar and self.metadados_repo.get('ultima_varredura_atrasadas') == hoje:
+            return ResultadoOperacao(True, "Varredura já realizada hoje", {'marcadas': 0, 'revertidas': 0})
+        
+        try:
+            with self.conta_repo.db.transacao():
+                marcadas, revertidas = self.conta_repo.atualizar_atrasadas(hoje)
+                self.metadados_repo.set('ultima_varredura_atrasadas', hoje)
+            
+            return ResultadoOperacao(
+                True,
+                f"{marcadas} conta(s) marcada(s) como atrasada(s)",
+                {'marcadas': marcadas, 'revertidas': revertidas}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao verificar contas atrasadas: {str(e)}")
+    
+    @orcamento_consultas(3)
+    def materializar_recorrencias(self, mes: int, ano: int) -> ResultadoOperacao:
+        """
+        Gera as contas recorrentes de todos os meses ainda não gerados até
+        mes/ano (inclusive), em lote. Chamado quando um mês passa a ser
+        exibido; para um mês já gerado custa uma única consulta.
+        """
+        try:
+            criadas = self.recorrencia_repo.materializar_ate(intervalo_mes(mes, ano)[0])
+            return ResultadoOperacao(
+                True, f"{criadas} conta(s) recorrente(s) gerada(s)", {'criadas': criadas}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao gerar contas recorrentes: {str(e)}")
+    
+    @orcamento_consultas(1)
+    def listar_recorrencias(self) -> List[dict]:
+        """Lista as regras de contas recorrentes."""
+        return self.recorrencia_repo.get_all()
+    
+    @orcamento_consultas(2)
+    def encerrar_recorrencia(self, recorrencia_id: int, data_fim: str) -> ResultadoOperacao:
+        """
+        Encerra uma conta recorrente: data_fim passa a ser o último
+        vencimento e as contas pendentes já geradas depois dele são excluídas.
+        """
+        try:
+            excluidas = self.recorrencia_repo.encerrar(recorrencia_id, data_fim)
+            return ResultadoOperacao(
+                True,
+                f"Recorrência encerrada! {excluidas} conta(s) futura(s) excluída(s).",
+                {'contas_excluidas': excluidas}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao encerrar a recorrência: {str(e)}")
+    
+    @orcamento_consultas(7)
+    def atualizar_recorrencia(self, recorrencia_id: int, a_partir_de: str,
+                              dados: DadosConta) -> ResultadoOperacao:
+        """
+        Altera uma conta recorrente daqui em diante: a regra recebe a
+        descrição, o valor, a categoria, a observação, o pagador e a divisão
+        de dados, copiados também para as contas pendentes que ela já gerou
+        com vencimento a partir de a_partir_de.
+        """
+        validacao = self._validar_dados_conta(dados)
+        if not validacao.sucesso:
+            return validacao
+        
+        try:
+            with self.recorrencia_repo.db.transacao():
+                self.recorrencia_repo.update(
+                    recorrencia_id,
+                    descricao=dados.descricao.strip(),
+                    valor=dados.valor_total,
+                    categoria_id=dados.categoria_id,
+                    observacao=dados.observacao,
+                    pagador_id=dados.pagador_id
+                )
+                self.recorrencia_repo.replace_divisoes(
+                    recorrencia_id, [div for div in dados.divisoes if div.get('valor', 0) > 0]
+                )
+                alteradas = self.recorrencia_repo.atualizar_geradas(recorrencia_id, a_partir_de)
+            
+            return ResultadoOperacao(
+                True, "Recorrência atualizada com sucesso", {'contas_alteradas': alteradas}
+            )
+        except Exception as e:
+            return ResultadoOperacao(False, f"Erro ao atualizar a recorrência: {str(e)}")
+    
+    @orcamento_consultas(1)
     def obter_parcelas_grupo(self, grupo_id: str) -> List[dict]:
         """Obtém todas as parcelas de um grupo."""
         return self.conta_repo.get_by_grupo(grupo_id)
     
+    @orcamento_consultas(1)
     def get_divisoes_conta(self, conta_id: int) -> List[dict]:
         """Obtém as divisões de uma conta."""
         return self.divisao_repo.get_by_conta(conta_id)
+    
+    @orcamento_consultas(1)
+    def get_divisoes_contas(self, conta_ids: List[int]) -> Dict[int, List[dict]]:
+        """Obtém as divisões de várias contas (ex: uma página) de uma vez."""
+        return self.divisao_repo.get_by_contas(conta_ids)
@@ -0,0 +1,56 @@
+"""
+Serviço de diagnóstico - métricas das consultas ao banco de dados.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from src.config.settings import Settings, settings
+from src.data import get_database
+from src.data.instrumentacao import orcamento_consultas
+from src.services.conta_service import ResultadoOperacao
+
+
+class DiagnosticoService:
+    """Serviço para consultar e exportar as métricas de consulta."""
+    
+    def __init__(self):
+        self.db = get_database()
+    
+    @property
+    def ativo(self) -> bool:
+        """Indica se as consultas estão sendo medidas (settings.database)."""
+        return settings.database.instrumentar
+    
+    @orcamento_consultas(0)
+    def get_resumo(self, limite: int = 30) -> dict:
+        """
+        Retorna os totais, os comandos de maior tempo total e as consultas
+        lentas mais recentes primeiro.
+        """
+        estatisticas = self.db.estatisticas
+        return {
+            'totais': estatisticas.totais(),
+            'consultas': estatisticas.resumo()[:limite],
+            'lentas': list(reversed(estatisticas.lentas)),
+        }
+    
+    @orcamento_consultas(0)
+    def zerar(self) -> ResultadoOperacao:
+        """Zera as métricas coletadas."""
+        self.db.estatisticas.limpar()
+        return ResultadoOperacao(sucesso=True, mensagem="Métricas zeradas")
+    
+    @orcamento_consultas(0)
+    def exportar_json(self, caminho: Optional[Path] = None) -> ResultadoOperacao:
+        """Grava as métricas em JSON (por padrão, no diretório de dados)."""
+        if caminho is None:
+            nome = f"diagnostico_consultas_{datetime.now():%Y%m%d_%H%M%S}.json"
+            caminho = Settings.get_data_dir() / nome
+        
+        try:
+            self.db.estatisticas.exportar_json(caminho)
+            return ResultadoOperacao(sucesso=True, mensagem=f"Métricas salvas em {caminho}", dados=caminho)
+        except OSError as e:
+            return ResultadoOperacao(sucesso=False, mensagem=f"Erro ao salvar métricas: {e}")
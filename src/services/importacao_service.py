@@ -21,6 +21,7 @@ try:
 except ImportError:
     pd = None
 
+from src.data.instrumentacao import orcamento_consultas
 from src.services.conta_service import ContaService, DadosConta, ResultadoOperacao
 
 
@@ -408,10 +409,12 @@ class ImportacaoService:
             GenericoParser(),  # Sempre por último
         ]
     
+    @orcamento_consultas(0)
     def listar_bancos_suportados(self) -> List[str]:
         """Retorna lista de bancos suportados."""
         return [p.nome_banco for p in self.parsers if p.nome_banco != "Genérico"]
     
+    @orcamento_consultas(0)
     def verificar_dependencias(self) -> Dict[str, bool]:
         """Verifica se as dependências estão instaladas."""
         return {
@@ -419,6 +422,7 @@ class ImportacaoService:
             'pandas': pd is not None,
         }
     
+    @orcamento_consultas(0)
     def importar_arquivo(
         self, 
         caminho: str,
@@ -473,6 +477,7 @@ class ImportacaoService:
         
         return None
     
+    @orcamento_consultas(5)
     def salvar_transacoes(
         self,
         transacoes: List[TransacaoImportada],
@@ -481,7 +486,8 @@ class ImportacaoService:
         gerar_parcelas_futuras: bool = False
     ) -> ResultadoOperacao:
         """
-        Salva as transações importadas no banco de dados.
+        Salva as transações importadas no banco de dados, todas em um
+        único lote (ContaService.criar_contas).
         
         Args:
             transacoes: Lista de transações a salvar
@@ -492,49 +498,42 @@ class ImportacaoService:
         Returns:
             ResultadoOperacao da operação
         """
-        salvas = 0
-        erros = []
+        contas = []
         
         for transacao in transacoes:
-            try:
-                # O valor da transação importada já é o valor da parcela/fatura
-                # Não devemos multiplicar pelo total de parcelas, pois o ContaService
-                # espera o valor da parcela individual para contas parceladas.
-                
-                # Só geramos parcelas futuras se o usuário solicitou E a transação é parcelada
-                gerar_futuras = gerar_parcelas_futuras and transacao.eh_parcelada
-                
-                # Converter data para string no formato esperado (YYYY-MM-DD)
-                data_vencimento_str = None
-                if isinstance(transacao.data, (datetime, date)):
-                    data_vencimento_str = transacao.data.strftime('%Y-%m-%d')
-                else:
-                    # Tenta usar como string ou pega data atual se falhar
-                    data_vencimento_str = str(transacao.data) if transacao.data else datetime.now().strftime('%Y-%m-%d')
-                
-                dados = DadosConta(
-                    descricao=transacao.descricao,
-                    valor_total=transacao.valor,
-                    parcela_atual=transacao.parcela_atual,
-                    total_parcelas=transacao.total_parcelas,
-                    data_vencimento=data_vencimento_str,
-                    categoria_id=categoria_id,
-                    gerar_parcelas_futuras=gerar_futuras,
-                    divisoes=divisoes or []
-                )
-                
-                resultado = self.conta_service.criar_conta(dados)
-                
-                if resultado.sucesso:
-                    salvas += 1
-                else:
-                    erros.append(f"{transacao.descricao}: {resultado.mensagem}")
-                    
-            except Exception as e:
-                erros.append(f"{transacao.descricao}: {str(e)}")
+            # O valor da transação importada já é o valor da parcela/fatura
+            # Não devemos multiplicar pelo total de parcelas, pois o ContaService
+            # espera o valor da parcela individual para contas parceladas.
+            
+            # Só geramos parcelas futuras se o usuário solicitou E a transação é parcelada
+            gerar_futuras = gerar_parcelas_futuras and transacao.eh_parcelada
+            
+            # Converter data para string no formato esperado (YYYY-MM-DD)
+            data_vencimento_str = None
+            if isinstance(transacao.data, (datetime, date)):
+                data_vencimento_str = transacao.data.strftime('%Y-%m-%d')
+            else:
+                # Tenta usar como string ou pega data atual se falhar
+                data_vencimento_str = str(transacao.data) if transacao.data else datetime.now().strftime('%Y-%m-%d')
+            
+            contas.append(DadosConta(
+                descricao=transacao.descricao,
+                valor_total=transacao.valor,
+                parcela_atual=transacao.parcela_atual,
+                total_parcelas=transacao.total_parcelas,
+                data_vencimento=data_vencimento_str,
+                categoria_id=categoria_id,
+                gerar_parcelas_futuras=gerar_futuras,
+                divisoes=divisoes or []
+            ))
+        
+        resultado = self.conta_service.criar_contas(contas)
+        
+        if not resultado.sucesso:
+            return ResultadoOperacao(sucesso=False, mensagem=f"Nenhuma transação salva. Erros: {resultado.mensagem}")
         
-        if salvas == 0:
-            return ResultadoOperacao(sucesso=False, mensagem=f"Nenhuma transação salva. Erros: {'; '.join(erros)}")
+        salvas = resultado.dados['criadas']
+        erros = resultado.dados['erros']
         
         mensagem = f"{salvas} transação(ões) importada(s) com sucesso!"
         if erros:
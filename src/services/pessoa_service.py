@@ -6,6 +6,8 @@ from typing import List, Optional
 from dataclasses import dataclass
 
 from src.data.repositories import PessoaRepository
+from src.data.referencias import get_referencias
+from src.data.instrumentacao import orcamento_consultas
 from src.core.entities import Pessoa
 from src.config.constants import CORES_PADRAO
 
@@ -23,15 +25,19 @@ class PessoaService:
     
     def __init__(self):
         self.repository = PessoaRepository()
+        self.referencias = get_referencias()
     
+    @orcamento_consultas(1)
     def listar_todas(self, apenas_ativas: bool = True) -> List[dict]:
         """Lista todas as pessoas cadastradas."""
-        return self.repository.get_all(apenas_ativas)
+        return self.referencias.pessoas(apenas_ativas)
     
+    @orcamento_consultas(1)
     def obter_por_id(self, pessoa_id: int) -> Optional[dict]:
         """Obtém uma pessoa pelo ID."""
-        return self.repository.get_by_id(pessoa_id)
+        return self.referencias.pessoa(pessoa_id)
     
+    @orcamento_consultas(2)
     def criar(self, nome: str, cor: str = None) -> ResultadoOperacao:
         """Cria uma nova pessoa."""
         # Validações
@@ -41,15 +47,12 @@ class PessoaService:
         nome = nome.strip()
         
         # Verificar duplicidade
-        existente = self.repository.get_by_nome(nome)
-        if existente:
+        if self.referencias.id_pessoa(nome) is not None:
             return ResultadoOperacao(False, f"Já existe uma pessoa com o nome '{nome}'")
         
         # Cor padrão se não informada
         if not cor:
-            pessoas = self.repository.get_all(apenas_ativas=False)
-            indice = len(pessoas) % len(CORES_PADRAO)
-            cor = CORES_PADRAO[indice]
+            cor = self.sugerir_cor()
         
         try:
             pessoa_id = self.repository.create(nome, cor)
@@ -61,6 +64,7 @@ class PessoaService:
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao criar pessoa: {str(e)}")
     
+    @orcamento_consultas(2)
     def atualizar(self, pessoa_id: int, nome: str, cor: str) -> ResultadoOperacao:
         """Atualiza uma pessoa existente."""
         if not nome or not nome.strip():
@@ -69,13 +73,13 @@ class PessoaService:
         nome = nome.strip()
         
         # Verificar se existe
-        pessoa = self.repository.get_by_id(pessoa_id)
+        pessoa = self.referencias.pessoa(pessoa_id)
         if not pessoa:
             return ResultadoOperacao(False, "Pessoa não encontrada")
         
         # Verificar duplicidade (exceto a própria pessoa)
-        existente = self.repository.get_by_nome(nome)
-        if existente and existente['id'] != pessoa_id:
+        existente = self.referencias.id_pessoa(nome)
+        if existente is not None and existente != pessoa_id:
             return ResultadoOperacao(False, f"Já existe uma pessoa com o nome '{nome}'")
         
         try:
@@ -84,9 +88,10 @@ class PessoaService:
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao atualizar pessoa: {str(e)}")
     
+    @orcamento_consultas(2)
     def desativar(self, pessoa_id: int) -> ResultadoOperacao:
         """Desativa uma pessoa (soft delete)."""
-        pessoa = self.repository.get_by_id(pessoa_id)
+        pessoa = self.referencias.pessoa(pessoa_id)
         if not pessoa:
             return ResultadoOperacao(False, "Pessoa não encontrada")
         
@@ -96,6 +101,7 @@ class PessoaService:
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao remover pessoa: {str(e)}")
     
+    @orcamento_consultas(1)
     def reativar(self, pessoa_id: int) -> ResultadoOperacao:
         """Reativa uma pessoa."""
         try:
@@ -104,8 +110,9 @@ class PessoaService:
         except Exception as e:
             return ResultadoOperacao(False, f"Erro ao reativar pessoa: {str(e)}")
     
+    @orcamento_consultas(1)
     def sugerir_cor(self) -> str:
         """Sugere uma cor para nova pessoa."""
-        pessoas = self.repository.get_all(apenas_ativas=False)
+        pessoas = self.referencias.pessoas(apenas_ativas=False)
         indice = len(pessoas) % len(CORES_PADRAO)
         return CORES_PADRAO[indice]
@@ -2,12 +2,22 @@
 Serviço de relatórios e estatísticas.
 """
 
-from typing import List, Dict, Optional
+import inspect
+from collections import OrderedDict
+from typing import Any, Callable, FrozenSet, List, Dict, Optional, Tuple
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
+from functools import wraps
 
-from src.data.repositories import ContaRepository, DivisaoRepository, PessoaRepository
+from src.data import get_database
+from src.data.repositories import ContaRepository, DivisaoRepository
+from src.data.filtros import FiltroContas, CAMPOS_LISTAGEM, intervalo_mes
+from src.data.linhas import tipo_linha
+from src.data.referencias import get_referencias, rotulo_categoria
+from src.data.eventos import Evento, Periodo
+from src.data.instrumentacao import orcamento_consultas
 from src.core.entities import ResumoGeral, ResumoPessoa
+from src.config.constants import TAMANHO_CACHE_RELATORIOS, MESES, MAX_PARCELAS
 
 
 @dataclass
@@ -22,41 +32,287 @@ class RelatorioMensal:
     contas_pagas: List[Dict]
 
 
+@dataclass
+class Pivot:
+    """
+    Tabela cruzada de duas dimensões ('pessoa', 'categoria' ou 'mes'):
+    valores[i][j] é o total da linha i na coluna j. Os rótulos são pares
+    (chave, texto); as chaves são as usadas em get_divisoes_celula.
+    """
+    linhas: str
+    colunas: str
+    rotulos_linhas: List[Tuple[Any, str]]
+    rotulos_colunas: List[Tuple[Any, str]]
+    valores: List[List[float]]
+    totais_linhas: List[float]
+    totais_colunas: List[float]
+    total: float
+
+
+@dataclass
+class Projecao:
+    """
+    Compromissos ainda não pagos de cada mês, a partir do mês atual:
+    contas pendentes (por categoria) e divisões pendentes (por pessoa).
+    Cada série é {'id', 'nome', 'valores' (um por mês), 'total'}, da de
+    maior total para a de menor.
+    """
+    meses: List[Periodo]
+    totais: List[float]
+    por_categoria: List[Dict]
+    por_pessoa: List[Dict]
+
+
+class CacheRelatorios:
+    """
+    Cache LRU dos relatórios, por (relatório, argumentos). Cada entrada
+    guarda os meses de que depende (None: todos) e é descartada quando um
+    evento de alteração atinge um deles. Escritas de outros processos não
+    geram eventos: são detectadas pelo PRAGMA data_version, conferido a
+    cada acerto, e esvaziam o cache.
+    
+    Os resultados são compartilhados entre as chamadas: não devem ser
+    alterados por quem os recebe.
+    """
+    
+    def __init__(self, tamanho: int = TAMANHO_CACHE_RELATORIOS):
+        self.db = get_database()
+        self.tamanho = tamanho
+        self._entradas: OrderedDict = OrderedDict()  # chave -> (periodos, valor)
+        self._versao = None
+        self.acertos = 0
+        self.falhas = 0
+        self.db.eventos.inscrever(Evento, self.invalidar)
+    
+    def obter(self, chave: tuple, periodos: Optional[FrozenSet[Periodo]],
+              calcular: Callable[[], Any]) -> Any:
+        """Retorna o valor em cache ou calcula (e guarda) o valor."""
+        if self.db.alteracoes_pendentes:
+            # Dentro de uma transação os eventos ainda não chegaram: o cache
+            # pode estar desatualizado e o resultado pode ser desfeito
+            return calcular()
+        
+        if chave in self._entradas:
+            versao = self.db.versao_dados()
+            if versao == self._versao:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave][1]
+            self.limpar()
+            self._versao = versao
+        
+        self.falhas += 1
+        if self._versao is None:
+            self._versao = self.db.versao_dados()
+        valor = calcular()
+        self._entradas[chave] = (periodos, valor)
+        if len(self._entradas) > self.tamanho:
+            self._entradas.popitem(last=False)
+        return valor
+    
+    def invalidar(self, evento: Evento):
+        """Descarta as entradas que dependem dos meses alterados."""
+        if evento.periodos is None:
+            self.limpar()
+            return
+        
+        for chave, (periodos, _) in list(self._entradas.items()):
+            if periodos is None or periodos & evento.periodos:
+                del self._entradas[chave]
+    
+    def limpar(self):
+        self._entradas.clear()
+
+
+_cache: Optional[CacheRelatorios] = None
+
+
+def get_cache_relatorios() -> CacheRelatorios:
+    """Retorna o cache único de relatórios (compartilhado pelas páginas)."""
+    global _cache
+    if _cache is None:
+        _cache = CacheRelatorios()
+    return _cache
+
+
+def _periodos_mes(mes: int = None, ano: int = None, **_) -> Optional[FrozenSet[Periodo]]:
+    """Relatório de um mês (sem mês e ano: todos os meses)."""
+    return frozenset({(mes, ano)}) if mes and ano else None
+
+
+def _periodos_ano(ano: int, **_) -> FrozenSet[Periodo]:
+    return frozenset((mes, ano) for mes in range(1, 13))
+
+
+def _meses_intervalo(inicio: Periodo, fim: Periodo) -> List[Periodo]:
+    """Meses (mes, ano) de inicio a fim, inclusive."""
+    (mes, ano), (mes_fim, ano_fim) = inicio, fim
+    meses = []
+    while (ano, mes) <= (ano_fim, mes_fim):
+        meses.append((mes, ano))
+        mes, ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+    return meses
+
+
+def _periodos_intervalo(inicio: Periodo, fim: Periodo, **_) -> FrozenSet[Periodo]:
+    return frozenset(_meses_intervalo(inicio, fim))
+
+
+def _somar_meses(periodo: Periodo, meses: int) -> Periodo:
+    """Mês (mes, ano) que fica `meses` meses depois de periodo."""
+    ano, mes = divmod(periodo[1] * 12 + periodo[0] - 1 + meses, 12)
+    return mes + 1, ano
+
+
+def _periodos_projecao(inicio: Periodo, meses: int, **_) -> FrozenSet[Periodo]:
+    return frozenset(_meses_intervalo(inicio, _somar_meses(inicio, meses - 1)))
+
+
+def em_cache(periodos: Callable[..., Optional[FrozenSet[Periodo]]] = _periodos_mes):
+    """
+    Guarda o resultado do método no cache de relatórios. periodos recebe
+    os argumentos do método (por nome) e diz de quais meses ele depende.
+    """
+    def decorador(metodo):
+        assinatura = inspect.signature(metodo)
+        
+        @wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            argumentos = assinatura.bind(self, *args, **kwargs)
+            argumentos.apply_defaults()
+            valores = dict(list(argumentos.arguments.items())[1:])
+            return self.cache.obter(
+                (metodo.__name__, *valores.values()),
+                periodos(**valores),
+                lambda: metodo(self, *args, **kwargs)
+            )
+        return wrapper
+    return decorador
+
+
 class RelatorioService:
-    """Serviço para geração de relatórios e estatísticas."""
+    """
+    Serviço para geração de relatórios e estatísticas.
+    Os relatórios ficam em cache (CacheRelatorios) até uma alteração
+    atingir os meses de que dependem.
+    """
     
     def __init__(self):
         self.conta_repo = ContaRepository()
         self.divisao_repo = DivisaoRepository()
-        self.pessoa_repo = PessoaRepository()
+        self.referencias = get_referencias()
+        self.cache = get_cache_relatorios()
     
+    @orcamento_consultas(1)
+    @em_cache()
     def get_resumo_geral(self, mes: int = None, ano: int = None) -> dict:
         """Obtém resumo geral das finanças."""
         return self.conta_repo.get_resumo_geral(mes, ano)
     
+    @orcamento_consultas(1)
+    @em_cache()
     def get_total_por_pessoa(self, mes: int = None, ano: int = None) -> List[dict]:
         """Obtém totais por pessoa."""
         return self.divisao_repo.get_total_por_pessoa(mes, ano)
     
+    @orcamento_consultas(1)
+    @em_cache()
     def get_gastos_por_categoria(self, mes: int = None, ano: int = None) -> List[dict]:
         """Obtém gastos agrupados por categoria."""
         return self.conta_repo.get_por_categoria(mes, ano)
     
+    # Colunas das últimas contas exibidas no dashboard
+    CAMPOS_PAINEL = ('descricao', 'valor_total', 'parcela_atual', 'total_parcelas',
+                     'status', 'categoria_icone')
+    
+    @orcamento_consultas(1)
+    @em_cache()
+    def get_painel_mes(self, mes: int, ano: int, limite: int = 5) -> dict:
+        """
+        Dados do dashboard em uma única consulta: o resumo do mês (como em
+        get_resumo_geral), os gastos por categoria com contas no mês (como
+        em get_gastos_por_categoria) e as `limite` contas mais recentes.
+        """
+        painel = self.conta_repo.get_painel(
+            FiltroContas.do_mes(mes, ano), self.CAMPOS_PAINEL, limite
+        )
+        categorias = painel['categorias']
+        
+        valor_total = sum(c['total'] for c in categorias)
+        valor_pago = sum(c['pago'] for c in categorias)
+        resumo = {
+            'total_contas': sum(c['quantidade'] for c in categorias),
+            'valor_total': valor_total,
+            'valor_pago': valor_pago,
+            'valor_pendente': valor_total - valor_pago,
+            'valor_atrasado': sum(c['atrasado'] for c in categorias),
+        }
+        
+        return {
+            'resumo': resumo,
+            'categorias': sorted(
+                (c for c in categorias if c['categoria_id'] is not None),
+                key=lambda c: c['total'], reverse=True
+            ),
+            'contas': painel['contas'],
+        }
+    
+    @orcamento_consultas(3)
+    @em_cache()
     def get_relatorio_mensal(self, mes: int, ano: int) -> RelatorioMensal:
-        """Gera relatório mensal completo."""
-        resumo_dict = self.get_resumo_geral(mes, ano)
-        resumo = ResumoGeral.from_dict(resumo_dict)
+        """
+        Gera relatório mensal completo em uma única passada pelas contas
+        do mês e suas divisões, acumulando todas as seções ao mesmo tempo.
+        """
+        resumo = ResumoGeral()
+        por_categoria: Dict[int, list] = {}  # categoria_id -> [quantidade, total]
+        por_pessoa: Dict[int, list] = {}  # pessoa_id -> [total, pago, pendente]
+        contas_pendentes = []
+        contas_pagas = []
         
+        tipo_conta = tipo_linha(CAMPOS_LISTAGEM)
+        n_campos = len(CAMPOS_LISTAGEM)
+        conta_id = None
+        for linha in self.conta_repo.iterar_com_divisoes(FiltroContas.do_mes(mes, ano)):
+            if linha.id != conta_id:
+                conta_id = linha.id
+                valor = linha.valor_total
+                resumo.total_contas += 1
+                resumo.valor_total += valor
+                if linha.status == 'pago':
+                    resumo.valor_pago += valor
+                    contas_pagas.append(tipo_conta(linha[:n_campos]))
+                else:
+                    resumo.valor_pendente += valor
+                    if linha.status == 'atrasado':
+                        resumo.valor_atrasado += valor
+                    contas_pendentes.append(tipo_conta(linha[:n_campos]))
+                
+                categoria = por_categoria.setdefault(linha.categoria_id, [0, 0])
+                categoria[0] += 1
+                categoria[1] += valor
+            
+            if linha.divisao_pessoa_id is not None:
+                totais = por_pessoa.setdefault(linha.divisao_pessoa_id, [0, 0, 0])
+                totais[0] += linha.divisao_valor
+                totais[1 if linha.divisao_pago else 2] += linha.divisao_valor
+        
+        # Pessoas ativas com divisões no mês, por nome
         totais_pessoa = [
-            ResumoPessoa.from_dict(p) 
-            for p in self.get_total_por_pessoa(mes, ano)
+            ResumoPessoa(p['id'], p['nome'], p['cor'], *por_pessoa[p['id']])
+            for p in self.referencias.pessoas() if p['id'] in por_pessoa
         ]
         
-        categorias = self.get_gastos_por_categoria(mes, ano)
-        
-        contas = self.conta_repo.get_all(mes=mes, ano=ano)
-        contas_pendentes = [c for c in contas if c.get('status') == 'pendente']
-        contas_pagas = [c for c in contas if c.get('status') == 'pago']
+        # Todas as categorias, da de maior gasto para a de menor
+        categorias = sorted(
+            (
+                {'nome': c['nome'], 'icone': c['icone'],
+                 'quantidade': por_categoria.get(c['id'], (0, 0))[0],
+                 'total': por_categoria.get(c['id'], (0, 0))[1]}
+                for c in self.referencias.categorias()
+            ),
+            key=lambda c: c['total'], reverse=True
+        )
         
         return RelatorioMensal(
             mes=mes,
@@ -68,10 +324,12 @@ class RelatorioService:
             contas_pagas=contas_pagas
         )
     
+    @orcamento_consultas(2)
+    @em_cache()
     def get_detalhes_pessoa(self, pessoa_id: int, mes: int = None, 
                              ano: int = None) -> Dict:
         """Obtém detalhes financeiros de uma pessoa."""
-        pessoa = self.pessoa_repo.get_by_id(pessoa_id)
+        pessoa = self.referencias.pessoa(pessoa_id)
         if not pessoa:
             return {}
         
@@ -90,21 +348,25 @@ class RelatorioService:
             'quantidade_contas': len(divisoes)
         }
     
+    @orcamento_consultas(1)
+    @em_cache(_periodos_ano)
     def get_evolucao_mensal(self, ano: int) -> List[Dict]:
-        """Obtém a evolução mensal de um ano."""
-        evolucao = []
+        """Obtém a evolução mensal de um ano (uma consulta agrupada por mês)."""
+        por_mes = {linha['mes']: linha for linha in self.conta_repo.get_evolucao_mensal(ano)}
         
+        evolucao = []
         for mes in range(1, 13):
-            resumo = self.get_resumo_geral(mes, ano)
+            linha = por_mes.get(mes, {})
             evolucao.append({
                 'mes': mes,
-                'total': resumo.get('valor_total', 0),
-                'pago': resumo.get('valor_pago', 0),
-                'pendente': resumo.get('valor_pendente', 0)
+                'total': linha.get('total', 0),
+                'pago': linha.get('pago', 0),
+                'pendente': linha.get('pendente', 0)
             })
         
         return evolucao
     
+    @orcamento_consultas(1)
     def get_comparativo_pessoas(self, mes: int = None, ano: int = None) -> List[Dict]:
         """Obtém comparativo entre pessoas."""
         totais = self.get_total_por_pessoa(mes, ano)
@@ -119,3 +381,154 @@ class RelatorioService:
             })
         
         return sorted(comparativo, key=lambda x: x.get('total', 0), reverse=True)
+    
+    @orcamento_consultas(3)
+    @em_cache(_periodos_intervalo)
+    def get_pivot(self, linhas: str, colunas: str, inicio: Periodo, fim: Periodo,
+                  apenas_pendentes: bool = False) -> Pivot:
+        """
+        Tabela cruzada das divisões de um intervalo de meses (inclusive),
+        com uma única consulta agrupada. A matriz é densa: todos os meses
+        do intervalo e as pessoas/categorias com divisões nele, por nome.
+        """
+        if linhas == colunas:
+            raise ValueError("Linhas e colunas do pivot devem ser dimensões diferentes")
+        
+        filtro = FiltroContas(
+            data_inicio=intervalo_mes(*inicio)[0], data_fim=intervalo_mes(*fim)[1]
+        )
+        celulas = {}
+        for celula in self.divisao_repo.get_pivot(linhas, colunas, filtro, apenas_pendentes):
+            chave = (self._chave_pivot(linhas, celula['linha']),
+                     self._chave_pivot(colunas, celula['coluna']))
+            celulas[chave] = celula['total']
+        
+        rotulos_linhas = self._rotulos_pivot(linhas, {l for l, _ in celulas}, inicio, fim)
+        rotulos_colunas = self._rotulos_pivot(colunas, {c for _, c in celulas}, inicio, fim)
+        valores = [
+            [round(celulas.get((l, c), 0), 2) for c, _ in rotulos_colunas]
+            for l, _ in rotulos_linhas
+        ]
+        totais_colunas = [round(sum(coluna), 2) for coluna in zip(*valores)]
+        
+        return Pivot(
+            linhas=linhas,
+            colunas=colunas,
+            rotulos_linhas=rotulos_linhas,
+            rotulos_colunas=rotulos_colunas,
+            valores=valores,
+            totais_linhas=[round(sum(linha), 2) for linha in valores],
+            totais_colunas=totais_colunas or [0.0] * len(rotulos_colunas),
+            total=round(sum(totais_colunas), 2)
+        )
+    
+    @orcamento_consultas(1)
+    def get_divisoes_celula(self, linhas: str, colunas: str, chave_linha: Any,
+                            chave_coluna: Any, inicio: Periodo, fim: Periodo,
+                            apenas_pendentes: bool = False) -> List[Dict]:
+        """Divisões que compõem uma célula de get_pivot (drill-down)."""
+        criterios = {
+            'data_inicio': intervalo_mes(*inicio)[0], 'data_fim': intervalo_mes(*fim)[1]
+        }
+        sem_categoria = False
+        for dimensao, chave in ((linhas, chave_linha), (colunas, chave_coluna)):
+            if dimensao == 'mes':
+                criterios['data_inicio'], criterios['data_fim'] = intervalo_mes(*chave)
+            elif dimensao == 'pessoa':
+                criterios['pessoa_id'] = chave
+            elif chave is None:
+                sem_categoria = True
+            else:
+                criterios['categorias'] = chave
+        
+        return [
+            d for d in self.divisao_repo.filtrar(FiltroContas(**criterios))
+            if not (sem_categoria and d.categoria_id is not None)
+            and not (apenas_pendentes and d.pago)
+        ]
+    
+    @orcamento_consultas(1)
+    def get_projecao(self, meses: int = 12) -> Projecao:
+        """
+        Projeção de caixa dos próximos `meses` meses (o atual inclusive):
+        parcelas e contas futuras ainda não pagas, por mês, categoria e
+        pessoa, em uma única consulta agrupada (sem percorrer os grupos de
+        parcelas um a um). Os meses que as contas recorrentes ainda vão
+        gerar entram calculados na mesma consulta, sem gravar as contas.
+        """
+        if not 1 <= meses <= MAX_PARCELAS:
+            raise ValueError(f"A projeção vai de 1 a {MAX_PARCELAS} meses")
+        
+        hoje = date.today()
+        return self._projecao((hoje.month, hoje.year), meses)
+    
+    @em_cache(_periodos_projecao)
+    def _projecao(self, inicio: Periodo, meses: int) -> Projecao:
+        periodos = _meses_intervalo(inicio, _somar_meses(inicio, meses - 1))
+        posicoes = {f"{ano:04d}-{mes:02d}": i for i, (mes, ano) in enumerate(periodos)}
+        inicio_mes_final, fim = intervalo_mes(*periodos[-1])
+        
+        por_categoria: Dict[Optional[int], List[float]] = {}
+        por_pessoa: Dict[int, List[float]] = {}
+        nomes = {'categoria': {}, 'pessoa': {}}
+        for linha in self.conta_repo.get_totais_projecao(
+            intervalo_mes(*periodos[0])[0], fim, inicio_mes_final
+        ):
+            series = por_categoria if linha['dimensao'] == 'categoria' else por_pessoa
+            valores = series.setdefault(linha['id'], [0.0] * meses)
+            valores[posicoes[linha['mes']]] += linha['total']
+            nomes[linha['dimensao']][linha['id']] = linha
+        
+        categorias = []
+        for categoria_id, valores in por_categoria.items():
+            categoria = nomes['categoria'][categoria_id]
+            categorias.append(self._serie(
+                categoria_id,
+                rotulo_categoria(categoria) if categoria['nome'] else "Sem categoria",
+                valores
+            ))
+        
+        pessoas = []
+        for pessoa_id, valores in por_pessoa.items():
+            nome = nomes['pessoa'][pessoa_id]['nome']
+            pessoas.append(self._serie(pessoa_id, nome or f"Pessoa {pessoa_id}", valores))
+        
+        return Projecao(
+            meses=periodos,
+            totais=[round(sum(mes), 2) for mes in zip(*por_categoria.values())] or [0.0] * meses,
+            por_categoria=sorted(categorias, key=lambda s: s['total'], reverse=True),
+            por_pessoa=sorted(pessoas, key=lambda s: s['total'], reverse=True)
+        )
+    
+    @staticmethod
+    def _serie(id: Optional[int], nome: str, valores: List[float]) -> Dict:
+        valores = [round(v, 2) for v in valores]
+        return {'id': id, 'nome': nome, 'valores': valores, 'total': round(sum(valores), 2)}
+    
+    @staticmethod
+    def _chave_pivot(dimensao: str, valor: Any) -> Any:
+        """Chave de uma dimensão a partir do valor agrupado no SQL."""
+        if dimensao == 'mes':
+            ano, mes = valor.split('-')
+            return int(mes), int(ano)
+        return valor
+    
+    def _rotulos_pivot(self, dimensao: str, chaves: set, inicio: Periodo,
+                       fim: Periodo) -> List[Tuple[Any, str]]:
+        """Rótulos (chave, texto) de uma dimensão do pivot, na ordem de exibição."""
+        if dimensao == 'mes':
+            return [((m, a), f"{MESES[m-1][:3]}/{a}") for m, a in _meses_intervalo(inicio, fim)]
+        
+        if dimensao == 'pessoa':
+            rotulos = [
+                (p['id'], p['nome'])
+                for p in self.referencias.pessoas(apenas_ativas=False) if p['id'] in chaves
+            ]
+        else:
+            rotulos = [
+                (c['id'], rotulo_categoria(c))
+                for c in self.referencias.categorias() if c['id'] in chaves
+            ]
+            if None in chaves:
+                rotulos.append((None, "Sem categoria"))
+        return rotulos
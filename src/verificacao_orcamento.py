@@ -0,0 +1,325 @@
+"""
+Verificação do orçamento de consultas dos services e das páginas.
+
+Cada método público dos services e o carregar() de cada página declaram
+com @orcamento_consultas quantos comandos SQL podem executar. Este módulo
+cria dados de exemplo dentro de uma simulação (desfeita no final), executa
+cada método/página contando os comandos com Database.contar_consultas() e
+aponta os que passam do orçamento, não declaram orçamento ou não têm
+cenário aqui. Um laço que volte a consultar o banco por linha (N+1)
+estoura o orçamento mesmo com poucos dados, pois os cenários têm várias
+linhas por tela. O cenário de cada método segue o caminho mais caro dele
+(ex: uma parcela virtual, que precisa ser gravada antes de ser alterada).
+
+Os mesmos cenários rodam em tests/test_orcamento_consultas.py, que
+verifica também as páginas, com um customtkinter falso.
+
+As páginas só são verificadas quando a interface gráfica está disponível
+(customtkinter instalado e um display acessível); sem ela a verificação
+falha, a menos que --sem-paginas seja passado.
+
+Uso: python -m src.verificacao_orcamento [--sem-paginas]
+(termina com código 1 se algum orçamento for estourado ou faltar, ou se
+as páginas não puderem ser verificadas sem --sem-paginas)
+"""
+
+import inspect
+import sys
+import tempfile
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.data import get_database
+from src.services import (
+    ContaService, PessoaService, RelatorioService, ImportacaoService, DiagnosticoService,
+    AnaliseService, AcertoService
+)
+from src.services.conta_service import DadosConta
+from src.services.importacao_service import TransacaoImportada
+
+SERVICOS = (
+    ContaService, PessoaService, RelatorioService, ImportacaoService, DiagnosticoService,
+    AnaliseService, AcertoService
+)
+
+# Tamanho dos dados de exemplo (linhas por tela, para expor consultas por linha)
+CONTAS_NO_MES = 8
+PARCELAS = 6
+TRANSACOES_IMPORTADAS = 12  # mais do que o orçamento de salvar_transacoes
+
+
+def _criar_dados(hoje: date) -> SimpleNamespace:
+    """Cria pessoas, contas, parcelas, um plano de parcelas virtuais e uma recorrência."""
+    contas = ContaService()
+    pessoas = PessoaService()
+    
+    ids_pessoas = [pessoas.criar(f"Orçamento {i}").dados['id'] for i in range(3)]
+    divisoes = [{'pessoa_id': p, 'valor': 10.0, 'percentual': 100 / 3} for p in ids_pessoas]
+    vencimento = hoje.replace(day=1).isoformat()
+    categoria_id = contas.listar_categorias()[0]['id']
+    
+    ids_contas = [
+        contas.criar_conta(DadosConta(
+            descricao=f"Conta {i}", valor_total=30.0, data_vencimento=vencimento,
+            categoria_id=categoria_id, divisoes=divisoes
+        )).dados['conta_id']
+        for i in range(CONTAS_NO_MES)
+    ]
+    contas.criar_conta(DadosConta(
+        descricao="Parcelada", valor_total=30.0, total_parcelas=PARCELAS,
+        data_vencimento=vencimento, categoria_id=categoria_id,
+        gerar_parcelas_futuras=True, divisoes=divisoes
+    ))
+    contas.criar_conta(DadosConta(
+        descricao="Plano", valor_total=30.0, total_parcelas=PARCELAS,
+        data_vencimento=vencimento, categoria_id=categoria_id,
+        gerar_parcelas_futuras=True, parcelas_virtuais=True, divisoes=divisoes
+    ))
+    recorrencia_id = contas.criar_conta(DadosConta(
+        descricao="Aluguel", valor_total=30.0, data_vencimento=vencimento,
+        categoria_id=categoria_id, recorrente=True, divisoes=divisoes
+    )).dados['recorrencia_id']
+    
+    listadas = contas.listar_contas(mes=hoje.month, ano=hoje.year)
+    parcela = next(c for c in listadas if c['descricao'] == "Parcelada")
+    virtual = next(c for c in listadas if c['id'] < 0)
+    
+    return SimpleNamespace(
+        pessoa_id=ids_pessoas[0],
+        conta_id=ids_contas[0],
+        grupo_id=parcela['grupo_parcela_id'],
+        grupo_virtual=virtual['grupo_parcela_id'],
+        virtual_id=virtual['id'],
+        recorrencia_id=recorrencia_id,
+        categoria_id=categoria_id,
+        divisoes=divisoes,
+        vencimento=vencimento,
+    )
+
+
+def cenarios_servicos(d: SimpleNamespace, hoje: date,
+                      pasta: Path) -> Dict[Tuple[type, str], Callable]:
+    """Chamada representativa de cada método público dos services."""
+    mes, ano = hoje.month, hoje.year
+    contas = ContaService()
+    pessoas = PessoaService()
+    relatorios = RelatorioService()
+    importacao = ImportacaoService()
+    diagnostico = DiagnosticoService()
+    analise = AnaliseService()
+    acerto = AcertoService()
+    ano_inteiro = ((1, ano), (12, ano))
+    mes_seguinte = (mes % 12 + 1, ano + mes // 12)
+    
+    dados_conta = DadosConta(
+        descricao="Nova", valor_total=30.0, data_vencimento=d.vencimento,
+        categoria_id=d.categoria_id, divisoes=d.divisoes
+    )
+    # Vencimento já passado: criar contas também reavalia as atrasadas
+    vencido = hoje.replace(day=1) - timedelta(days=1)
+    arquivo = pasta / "fatura.csv"
+    arquivo.write_text("date,title,amount\n2024-01-10,Mercado,10.50\n", encoding='utf-8')
+    transacoes = [
+        TransacaoImportada(f"Importada {i}", 10.0, datetime.combine(vencido, datetime.min.time()))
+        for i in range(TRANSACOES_IMPORTADAS)
+    ]
+    lote_contas = [
+        replace(dados_conta, descricao=f"Lote {i}", data_vencimento=vencido.isoformat())
+        for i in range(TRANSACOES_IMPORTADAS)
+    ] + [replace(dados_conta, total_parcelas=PARCELAS, gerar_parcelas_futuras=True)]
+    
+    return {
+        (ContaService, 'listar_contas'): lambda: contas.listar_contas(mes=mes, ano=ano),
+        (ContaService, 'listar_contas_paginado'): lambda: contas.listar_contas_paginado(mes=mes, ano=ano),
+        (ContaService, 'obter_conta'): lambda: contas.obter_conta(d.conta_id),
+        (ContaService, 'listar_categorias'): contas.listar_categorias,
+        (ContaService, 'criar_conta'):
+            lambda: contas.criar_conta(replace(dados_conta, recorrente=True)),
+        (ContaService, 'criar_contas'): lambda: contas.criar_contas(lote_contas),
+        (ContaService, 'atualizar_conta'): lambda: contas.atualizar_conta(d.virtual_id, dados_conta),
+        (ContaService, 'atualizar_grupo'):
+            lambda: contas.atualizar_grupo(d.grupo_virtual, 2, {'valor_total': 40.0}, d.divisoes),
+        (ContaService, 'excluir_conta'): lambda: contas.excluir_conta(d.virtual_id),
+        (ContaService, 'marcar_paga'): lambda: contas.marcar_paga(d.virtual_id),
+        (ContaService, 'marcar_pagas_periodo'): lambda: contas.marcar_pagas_periodo(mes, ano),
+        (ContaService, 'marcar_divisoes_pagas'):
+            lambda: contas.marcar_divisoes_pagas(d.pessoa_id, mes, ano),
+        (ContaService, 'quitar_grupo'): lambda: contas.quitar_grupo(d.grupo_virtual, 3),
+        (ContaService, 'atualizar_atrasadas'): lambda: contas.atualizar_atrasadas(forcar=True),
+        (ContaService, 'materializar_recorrencias'):
+            lambda: contas.materializar_recorrencias(*mes_seguinte),
+        (ContaService, 'listar_recorrencias'): contas.listar_recorrencias,
+        (ContaService, 'atualizar_recorrencia'):
+            lambda: contas.atualizar_recorrencia(d.recorrencia_id, d.vencimento, dados_conta),
+        (ContaService, 'encerrar_recorrencia'):
+            lambda: contas.encerrar_recorrencia(d.recorrencia_id, d.vencimento),
+        (ContaService, 'obter_parcelas_grupo'): lambda: contas.obter_parcelas_grupo(d.grupo_id),
+        (ContaService, 'get_divisoes_conta'): lambda: contas.get_divisoes_conta(d.conta_id),
+        (ContaService, 'get_divisoes_contas'):
+            lambda: contas.get_divisoes_contas([d.conta_id, d.virtual_id]),
+        
+        (PessoaService, 'listar_todas'): pessoas.listar_todas,
+        (PessoaService, 'obter_por_id'): lambda: pessoas.obter_por_id(d.pessoa_id),
+        (PessoaService, 'criar'): lambda: pessoas.criar("Orçamento nova"),
+        (PessoaService, 'atualizar'): lambda: pessoas.atualizar(d.pessoa_id, "Orçamento x", "#000000"),
+        (PessoaService, 'desativar'): lambda: pessoas.desativar(d.pessoa_id),
+        (PessoaService, 'reativar'): lambda: pessoas.reativar(d.pessoa_id),
+        (PessoaService, 'sugerir_cor'): pessoas.sugerir_cor,
+        
+        (RelatorioService, 'get_painel_mes'): lambda: relatorios.get_painel_mes(mes, ano),
+        (RelatorioService, 'get_resumo_geral'): lambda: relatorios.get_resumo_geral(mes, ano),
+        (RelatorioService, 'get_total_por_pessoa'): lambda: relatorios.get_total_por_pessoa(mes, ano),
+        (RelatorioService, 'get_gastos_por_categoria'):
+            lambda: relatorios.get_gastos_por_categoria(mes, ano),
+        (RelatorioService, 'get_relatorio_mensal'): lambda: relatorios.get_relatorio_mensal(mes, ano),
+        (RelatorioService, 'get_detalhes_pessoa'):
+            lambda: relatorios.get_detalhes_pessoa(d.pessoa_id, mes, ano),
+        (RelatorioService, 'get_evolucao_mensal'): lambda: relatorios.get_evolucao_mensal(ano),
+        (RelatorioService, 'get_comparativo_pessoas'):
+            lambda: relatorios.get_comparativo_pessoas(mes, ano),
+        (RelatorioService, 'get_pivot'):
+            lambda: relatorios.get_pivot('pessoa', 'categoria', *ano_inteiro),
+        (RelatorioService, 'get_projecao'): lambda: relatorios.get_projecao(12),
+        (RelatorioService, 'get_divisoes_celula'):
+            lambda: relatorios.get_divisoes_celula(
+                'pessoa', 'mes', d.pessoa_id, (mes, ano), *ano_inteiro
+            ),
+        
+        (ImportacaoService, 'listar_bancos_suportados'): importacao.listar_bancos_suportados,
+        (ImportacaoService, 'verificar_dependencias'): importacao.verificar_dependencias,
+        (ImportacaoService, 'importar_arquivo'): lambda: importacao.importar_arquivo(str(arquivo)),
+        (ImportacaoService, 'salvar_transacoes'):
+            lambda: importacao.salvar_transacoes(transacoes, d.categoria_id, d.divisoes),
+        
+        (DiagnosticoService, 'get_resumo'): diagnostico.get_resumo,
+        (DiagnosticoService, 'zerar'): diagnostico.zerar,
+        (DiagnosticoService, 'exportar_json'):
+            lambda: diagnostico.exportar_json(pasta / "diagnostico.json"),
+        
+        (AnaliseService, 'totais_por_mes'):
+            lambda: analise.totais_por_mes(*ano_inteiro, pessoa_id=d.pessoa_id),
+        (AnaliseService, 'totais_por_categoria'): lambda: analise.totais_por_categoria(*ano_inteiro),
+        (AnaliseService, 'soma_movel_mensal'): lambda: analise.soma_movel_mensal(*ano_inteiro),
+        (AnaliseService, 'percentis_valores'): lambda: analise.percentis_valores(*ano_inteiro),
+        
+        (AcertoService, 'calcular'): lambda: acerto.calcular(mes, ano),
+        (AcertoService, 'quitar'): lambda: acerto.quitar(mes, ano),
+    }
+
+
+def _criar_raiz():
+    """Janela oculta para montar as páginas, ou None sem interface gráfica."""
+    try:
+        import customtkinter as ctk
+        raiz = ctk.CTk()
+    except Exception:
+        return None
+    raiz.withdraw()
+    return raiz
+
+
+def cenarios_paginas(hoje: date, raiz) -> Dict[type, Callable]:
+    """Montagem de cada página (o construtor chama carregar())."""
+    from src.gui.pages import (
+        DashboardPage, ContasPage, PessoasPage, RelatoriosPage, PivotPage, DiagnosticoPage
+    )
+    
+    app = SimpleNamespace(
+        mes_atual=hoje.month,
+        ano_atual=hoje.year,
+        adicionar_conta=lambda: None,
+    )
+    return {
+        pagina: (lambda pagina=pagina: pagina(raiz, app).destroy())
+        for pagina in (
+            DashboardPage, ContasPage, PessoasPage, RelatoriosPage, PivotPage, DiagnosticoPage
+        )
+    }
+
+
+def _metodos_publicos(classe: type) -> List[str]:
+    return [
+        nome for nome, membro in vars(classe).items()
+        if not nome.startswith('_') and inspect.isfunction(membro)
+    ]
+
+
+def verificar_orcamentos() -> Tuple[List[dict], List[dict], bool]:
+    """
+    Executa os cenários e retorna (medições, problemas, paginas_verificadas).
+    Cada medição tem 'alvo', 'consultas', 'conexoes' e 'orcamento'; os
+    problemas trazem também 'motivo' e os comandos executados.
+    """
+    db = get_database()
+    hoje = date.today()
+    medicoes, problemas = [], []
+    raiz = _criar_raiz()
+    
+    def medir(alvo: str, orcamento: Optional[int], chamada: Callable):
+        if orcamento is None:
+            problemas.append({'alvo': alvo, 'motivo': "sem @orcamento_consultas", 'comandos': []})
+            return
+        
+        with db.simulacao():
+            with db.contar_consultas() as contagem:
+                chamada()
+        
+        medicao = {
+            'alvo': alvo,
+            'consultas': contagem.consultas,
+            'conexoes': contagem.conexoes,
+            'orcamento': orcamento,
+        }
+        medicoes.append(medicao)
+        if contagem.consultas > orcamento:
+            problemas.append({**medicao, 'motivo': "orçamento estourado",
+                              'comandos': contagem.comandos})
+    
+    with tempfile.TemporaryDirectory() as pasta, db.simulacao():
+        dados = _criar_dados(hoje)
+        
+        cenarios = cenarios_servicos(dados, hoje, Path(pasta))
+        for servico in SERVICOS:
+            for nome in _metodos_publicos(servico):
+                alvo = f"{servico.__name__}.{nome}"
+                if (servico, nome) not in cenarios:
+                    problemas.append({'alvo': alvo, 'motivo': "sem cenário", 'comandos': []})
+                    continue
+                orcamento = getattr(getattr(servico, nome), 'orcamento_consultas', None)
+                medir(alvo, orcamento, cenarios[(servico, nome)])
+        
+        if raiz is not None:
+            for pagina, chamada in cenarios_paginas(hoje, raiz).items():
+                orcamento = getattr(pagina.carregar, 'orcamento_consultas', None)
+                medir(f"{pagina.__name__}.carregar", orcamento, chamada)
+    
+    if raiz is not None:
+        raiz.destroy()
+    
+    return medicoes, problemas, raiz is not None
+
+
+if __name__ == "__main__":
+    sem_paginas = '--sem-paginas' in sys.argv[1:]
+    medicoes, problemas, com_paginas = verificar_orcamentos()
+    for medicao in medicoes:
+        print(f"{medicao['consultas']:4d}/{medicao['orcamento']:<4d} "
+              f"{medicao['conexoes']:3d} conexão(ões)  {medicao['alvo']}")
+    if not com_paginas:
+        print("\nPáginas não verificadas: interface gráfica indisponível.")
+        if not sem_paginas:
+            problemas.append({
+                'alvo': "páginas",
+                'motivo': "não verificadas (use --sem-paginas para ignorá-las)",
+                'comandos': [],
+            })
+    
+    for problema in problemas:
+        print(f"\n[{problema['alvo']}] {problema['motivo']}")
+        for sql in problema['comandos']:
+            print(f"    {' '.join(sql.split())[:160]}")
+    print(f"\n{len(problemas)} problema(s) de orçamento encontrado(s).")
+    sys.exit(1 if problemas else 0)
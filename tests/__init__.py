@@ -0,0 +1 @@
+"""Testes do Controle de Finanças."""
@@ -0,0 +1,24 @@
+"""
+Configuração comum dos testes: o banco e as configurações ficam em um
+diretório temporário e o customtkinter é trocado pelo falso, para que as
+páginas possam ser montadas sem interface gráfica.
+"""
+
+import sys
+
+import pytest
+
+from tests import ctk_falso
+
+sys.modules['customtkinter'] = ctk_falso
+
+
+@pytest.fixture(scope="session", autouse=True)
+def diretorio_base(tmp_path_factory):
+    """Aponta o diretório base do aplicativo para uma pasta temporária."""
+    from src.config.settings import Settings
+    
+    base = tmp_path_factory.mktemp("base")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Settings, "get_base_dir", staticmethod(lambda: base))
+        yield base
@@ -0,0 +1,165 @@
+"""
+customtkinter falso, para montar as páginas sem interface gráfica.
+Os widgets guardam apenas a árvore de filhos e o valor exibido; os demais
+métodos (pack, grid, bind, create_text...) não fazem nada. Basta para
+medir as consultas feitas por carregar(), que não depende de desenho.
+"""
+
+from itertools import count
+
+_ids = count(1)
+
+
+class _Widget:
+    """Widget genérico: filhos, valor e opções; o resto é ignorado."""
+
+    def __init__(self, master=None, *args, **kwargs):
+        self.master = master
+        self._filhos = []
+        self._opcoes = dict(kwargs)
+        valores = kwargs.get('values')
+        self._valor = valores[0] if valores else ""
+        if isinstance(master, _Widget):
+            master._filhos.append(self)
+
+    def __getattr__(self, nome):
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+        return lambda *args, **kwargs: None
+
+    def winfo_children(self):
+        return list(self._filhos)
+
+    def destroy(self):
+        for filho in list(self._filhos):
+            filho.destroy()
+        if isinstance(self.master, _Widget) and self in self.master._filhos:
+            self.master._filhos.remove(self)
+
+    def after(self, _atraso, _funcao=None, *args):
+        return f"after#{next(_ids)}"
+
+    def after_idle(self, _funcao, *args):
+        return f"after#{next(_ids)}"
+
+    def configure(self, **kwargs):
+        self._opcoes.update(kwargs)
+
+    config = configure
+
+    def cget(self, opcao):
+        return self._opcoes.get(opcao)
+
+    def get(self, *args):
+        return self._valor
+
+    def set(self, valor):
+        self._valor = valor
+
+    def insert(self, _indice, texto):
+        self._valor = f"{self._valor}{texto}"
+
+    def delete(self, *args):
+        self._valor = ""
+
+    def winfo_width(self):
+        return 400
+
+    def winfo_height(self):
+        return 220
+
+    def winfo_screenwidth(self):
+        return 1280
+
+    def winfo_screenheight(self):
+        return 720
+
+
+class CTk(_Widget):
+    pass
+
+
+class CTkToplevel(_Widget):
+    pass
+
+
+class CTkFrame(_Widget):
+    pass
+
+
+class CTkScrollableFrame(_Widget):
+    pass
+
+
+class CTkLabel(_Widget):
+    pass
+
+
+class CTkButton(_Widget):
+    pass
+
+
+class CTkCheckBox(_Widget):
+    pass
+
+
+class CTkSwitch(_Widget):
+    pass
+
+
+class CTkComboBox(_Widget):
+    pass
+
+
+class CTkSegmentedButton(_Widget):
+    pass
+
+
+class CTkEntry(_Widget):
+    pass
+
+
+class CTkTextbox(_Widget):
+    pass
+
+
+class CTkProgressBar(_Widget):
+    pass
+
+
+class CTkCanvas(_Widget):
+    pass
+
+
+class CTkFont:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _Variavel:
+    _padrao = None
+
+    def __init__(self, master=None, value=None, **kwargs):
+        self._valor = self._padrao if value is None else value
+
+    def get(self):
+        return self._valor
+
+    def set(self, valor):
+        self._valor = valor
+
+
+class BooleanVar(_Variavel):
+    _padrao = False
+
+
+class StringVar(_Variavel):
+    _padrao = ""
+
+
+def set_appearance_mode(_modo):
+    pass
+
+
+def set_default_color_theme(_tema):
+    pass
@@ -0,0 +1,70 @@
+"""
+Orçamentos de consultas (@orcamento_consultas): cada método público dos
+serviços e o carregar() de cada página roda o seu cenário de
+src.verificacao_orcamento sob Database.contar_consultas() e não pode
+passar do orçamento declarado.
+"""
+
+from datetime import date
+
+import pytest
+
+from src.data.database import get_database
+from src.verificacao_orcamento import (
+    SERVICOS, _criar_dados, _metodos_publicos, cenarios_paginas, cenarios_servicos
+)
+from tests import ctk_falso
+
+METODOS = [(servico, nome) for servico in SERVICOS for nome in _metodos_publicos(servico)]
+
+
+def _paginas():
+    from src.gui.pages import (
+        DashboardPage, ContasPage, PessoasPage, RelatoriosPage, PivotPage, DiagnosticoPage
+    )
+    return [DashboardPage, ContasPage, PessoasPage, RelatoriosPage, PivotPage, DiagnosticoPage]
+
+
+@pytest.fixture(scope="module")
+def cenarios(tmp_path_factory):
+    """Cenários de serviços e páginas sobre os dados de exemplo (descartados ao final)."""
+    db = get_database()
+    hoje = date.today()
+    with db.simulacao():
+        dados = _criar_dados(hoje)
+        raiz = ctk_falso.CTk()
+        yield {
+            **cenarios_servicos(dados, hoje, tmp_path_factory.mktemp("importacao")),
+            **cenarios_paginas(hoje, raiz),
+        }
+        raiz.destroy()
+
+
+def _verificar(alvo: str, orcamento, chamada):
+    assert orcamento is not None, f"{alvo} sem @orcamento_consultas"
+    
+    db = get_database()
+    with db.simulacao():
+        with db.contar_consultas() as contagem:
+            chamada()
+    
+    comandos = "\n".join(' '.join(sql.split())[:160] for sql in contagem.comandos)
+    assert contagem.consultas <= orcamento, (
+        f"{alvo}: {contagem.consultas} consultas (orçamento {orcamento})\n{comandos}"
+    )
+
+
+@pytest.mark.parametrize(
+    "servico, nome", METODOS, ids=[f"{s.__name__}.{n}" for s, n in METODOS]
+)
+def test_metodo_de_servico_respeita_orcamento(cenarios, servico, nome):
+    alvo = f"{servico.__name__}.{nome}"
+    assert (servico, nome) in cenarios, f"{alvo} sem cenário em verificacao_orcamento"
+    orcamento = getattr(getattr(servico, nome), 'orcamento_consultas', None)
+    _verificar(alvo, orcamento, cenarios[(servico, nome)])
+
+
+@pytest.mark.parametrize("pagina", _paginas(), ids=lambda pagina: pagina.__name__)
+def test_carregar_da_pagina_respeita_orcamento(cenarios, pagina):
+    orcamento = getattr(pagina.carregar, 'orcamento_consultas', None)
+    _verificar(f"{pagina.__name__}.carregar", orcamento, cenarios[pagina])